@@ -0,0 +1,58 @@
+"""
+Compare two benchmark reports
+
+    python -m benchmarks.compare baseline.json bench.json [--threshold 1.25] [--metric median_ms]
+
+Prints the ratio new/old per scale and benchmark and exits with status 1 when
+any ratio exceeds the threshold, so it can gate CI or a pre-merge check.
+"""
+import argparse, json, sys
+
+
+def compare(old, new, threshold=1.25, metric='median_ms', min_ms=0.05):
+    """Rows of (scale, benchmark, old, new, ratio, regressed) for benchmarks present in both reports"""
+    rows = []
+    for scale, new_scale in new['scales'].items():
+        old_scale = old['scales'].get(scale)
+        if not old_scale:
+            continue
+        for bench, r in new_scale['results'].items():
+            before = old_scale['results'].get(bench)
+            if not before:
+                continue
+            a, b = before[metric], r[metric]
+            # Sub-noise timings are reported but never flagged
+            ratio = b / a if a > 0 else float('inf')
+            rows.append((scale, bench, a, b, ratio, ratio > threshold and b > min_ms))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=1.25, help='new/old ratio counted as a regression')
+    parser.add_argument('--metric', default='median_ms', choices=['cold_ms', 'min_ms', 'median_ms', 'p95_ms', 'mean_ms'])
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"{old['environment'].get('commit') or args.old} -> {new['environment'].get('commit') or args.new} ({args.metric})")
+    for scale, new_scale in new['scales'].items():
+        before = old['scales'].get(scale, {}).get('setup', {}).get('model_mode')
+        after = new_scale['setup'].get('model_mode')
+        if before and before != after:
+            print(f"⚠️ {scale}: model mode changed from {before} to {after}, timings are not comparable")
+    rows = compare(old, new, args.threshold, args.metric)
+    for scale, bench, a, b, ratio, regressed in rows:
+        flag = '  ❌ REGRESSION' if regressed else ''
+        print(f"  {scale:8s} {bench:36s} {a:10.2f}ms -> {b:10.2f}ms  x{ratio:5.2f}{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"{regressions} regression(s) over x{args.threshold}" if regressions else "No regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Concurrency stress test for the SQLite database profiles
+
+    python -m benchmarks.db_stress --profiles dev,production --seconds 15 --out stress.json
+
+For each DB_PROFILE a child process generates a synthetic dataset (see
+benchmarks.synthetic) in its own temporary database. It then runs writer processes
+posting ratings to rate_movie against reader processes calling recommendations
+(?explain=1) and explain_batch, all as logged-in users, for a fixed time. The
+report has throughput, latency percentiles and "database is locked" errors per
+operation and profile.
+"""
+import argparse, json, multiprocessing, os, shutil, subprocess, sys, tempfile, time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import OperationalError, connections  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+from core.models import Movie, Rating  # noqa: E402
+from recs import lightfm_pipeline  # noqa: E402
+from recs.views import explain_batch, rate_movie, recommendations  # noqa: E402
+from .run import environment  # noqa: E402
+from .synthetic import SCALES, generate  # noqa: E402
+
+
+def summary(samples, seconds):
+    """Merge (latencies, locked, errors) samples of the workers running one operation"""
+    ms = sorted(x for latencies, _, _ in samples for x in latencies) or [0.0]
+    ops = sum(len(latencies) for latencies, _, _ in samples)
+    return {'ops': ops, 'ops_per_s': round(ops / seconds, 1), 'locked': sum(s[1] for s in samples),
+            'errors': sum(s[2] for s in samples), 'median_ms': round(ms[len(ms) // 2], 2),
+            'p95_ms': round(ms[int(0.95 * (len(ms) - 1))], 2), 'max_ms': round(ms[-1], 2)}
+
+
+def worker(role, n, users, movie_ids, deadline, seed):
+    """One writer or reader process: call its views until the deadline -> {operation: (latencies, locked, errors)}"""
+    rng = np.random.default_rng(seed + n)
+    factory = APIRequestFactory()
+    results = {}
+    i = 0
+    while time.time() < deadline:
+        user = users[rng.integers(len(users))]
+        if role == 'writer':
+            request = factory.post('/api/ratings/', {'movie': int(rng.choice(movie_ids)), 'value': int(rng.integers(1, 6))},
+                                   format='json')
+            view, name = rate_movie, 'rate'
+        elif i % 2:
+            request = factory.get('/api/recommendations/', {'k': 12, 'explain': 1})
+            view, name = recommendations, 'recommendations'
+        else:
+            request = factory.get('/api/explain/batch/', {'movie_ids': ','.join(str(m) for m in rng.choice(movie_ids, 20))})
+            view, name = explain_batch, 'explain_batch'
+        force_authenticate(request, user)
+        latencies, locked, errors = results.setdefault(name, ([], 0, 0))
+        t0 = time.perf_counter()
+        try:
+            ok = view(request).status_code < 400
+        except OperationalError as e:
+            ok = False
+            if 'locked' in str(e):
+                locked += 1
+            else:
+                errors += 1
+        else:
+            if ok:
+                latencies.append((time.perf_counter() - t0) * 1000)
+            else:
+                errors += 1
+        results[name] = (latencies, locked, errors)
+        i += 1
+    connections.close_all()
+    return results
+
+
+def stress(writers, readers, seconds, seed):
+    """Run writer and reader processes against the current database -> summary per operation"""
+    users = list(User.objects.filter(id__in=Rating.objects.values('user_id')))
+    movie_ids = list(Movie.objects.values_list('id', flat=True))
+    # Forked workers inherit the loaded model artifacts but must open their own connections
+    connections.close_all()
+    deadline = time.time() + seconds + 1
+    jobs = [('writer', n, users, movie_ids, deadline, seed) for n in range(writers)]
+    jobs += [('reader', 1000 + n, users, movie_ids, deadline, seed) for n in range(readers)]
+    with multiprocessing.get_context('fork').Pool(len(jobs)) as pool:
+        outputs = pool.starmap(worker, jobs)
+    samples = {}
+    for output in outputs:
+        for name, sample in output.items():
+            samples.setdefault(name, []).append(sample)
+    return {name: summary(samples[name], seconds) for name in ('rate', 'recommendations', 'explain_batch') if name in samples}
+
+
+def child(args):
+    call_command('migrate', interactive=False, verbosity=0)
+    counts = generate(seed=args.seed, **SCALES[args.scale])
+    call_command('rebuild_profiles', verbosity=0)
+    lightfm_pipeline.train_and_save()
+    lightfm_pipeline.load_artifacts()
+    results = stress(args.writers, args.readers, args.seconds, args.seed)
+    with connections['default'].cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal = cursor.fetchone()[0]
+    return {'profile': settings.DB_PROFILE, 'databases': sorted(settings.DATABASES), 'journal_mode': journal,
+            'counts': counts, 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', default='dev,production', help='comma-separated DB_PROFILE values')
+    parser.add_argument('--scale', default='small', choices=list(SCALES))
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='stress.json', help='JSON report path')
+    parser.add_argument('--child', help=argparse.SUPPRESS)  # internal: run one profile, write JSON here
+    args = parser.parse_args(argv)
+
+    if args.child:
+        with open(args.child, 'w') as f:
+            json.dump(child(args), f)
+        return 0
+
+    report = {'environment': environment(), 'writers': args.writers, 'readers': args.readers,
+              'seconds': args.seconds, 'scale': args.scale, 'profiles': {}}
+    for profile in args.profiles.split(','):
+        # Settings are read once per process, so every profile gets its own process and database
+        with tempfile.TemporaryDirectory(prefix='moviewise-stress-') as tmp:
+            out = os.path.join(tmp, 'result.json')
+            env = dict(os.environ, DB_PROFILE=profile, BENCH_DIR=tmp, DJANGO_SETTINGS_MODULE='benchmarks.settings')
+            argv = [sys.executable, '-m', 'benchmarks.db_stress', '--child', out, '--scale', args.scale,
+                    '--writers', str(args.writers), '--readers', str(args.readers),
+                    '--seconds', str(args.seconds), '--seed', str(args.seed)]
+            print(f"\n=== {profile}: {args.writers} writers, {args.readers} readers, {args.seconds}s ===")
+            subprocess.run(argv, env=env, check=True, cwd=settings.BASE_DIR)
+            with open(out) as f:
+                report['profiles'][profile] = result = json.load(f)
+        print(f"  journal_mode={result['journal_mode']}  databases={result['databases']}")
+        for name, r in result['results'].items():
+            print(f"  {name:16s} {r['ops_per_s']:8.1f} ops/s  median {r['median_ms']:9.2f}ms  p95 {r['p95_ms']:9.2f}ms"
+                  f"  max {r['max_ms']:9.2f}ms  locked {r['locked']:5d}  errors {r['errors']}")
+    shutil.rmtree(settings.BENCH_DIR, ignore_errors=True)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Wrote {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Benchmark the Rating queries of the explanation paths before and after the
+rating table migration (core 0007: duplicate compaction, unique (user, movie),
+composite indexes)
+
+    python -m benchmarks.ratings_table --ratings 2000000 --out ratings.json
+
+A temporary database is migrated to core 0006 and bulk-loaded with
+power-law distributed ratings. Drawing the same (user, movie) pair again stands
+in for a re-rate, which the append-only rate_movie stored as a second row. The
+queries are timed, 0007 is applied (timed as well), and they are timed again.
+The report includes SQLite's query plan for each query on both sides.
+"""
+import argparse, json, os, shutil, sys, time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+django.setup()
+
+import numpy as np  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import Max  # noqa: E402
+from core.models import Movie, Rating  # noqa: E402
+from .run import environment, measure  # noqa: E402
+from .synthetic import zipf_weights  # noqa: E402
+
+BEFORE = '0006_tmdb_genres_language_cast'
+AFTER = '0007_rating_unique_indexes'
+
+
+def load(users, movies, ratings, seed):
+    """Bulk-load users, movies and ratings (with repeated pairs) -> row counts"""
+    rng = np.random.default_rng(seed)
+    User.objects.bulk_create([User(username=f'rt{i}', password='!') for i in range(users)], batch_size=5000)
+    user_ids = np.array(User.objects.filter(username__startswith='rt').order_by('id').values_list('id', flat=True))
+    Movie.objects.bulk_create([Movie(tmdb_id=20_000_000 + i, title=f'Movie {i}') for i in range(movies)], batch_size=5000)
+    movie_ids = np.array(Movie.objects.filter(tmdb_id__gte=20_000_000).order_by('id').values_list('id', flat=True))
+
+    user_p = zipf_weights(users, 0.8, rng)
+    movie_p = zipf_weights(movies, 1.0, rng)
+    start = datetime(2024, 1, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for lo in range(0, ratings, 100_000):
+            n = min(100_000, ratings - lo)
+            us = user_ids[rng.choice(users, size=n, p=user_p)]
+            ms = movie_ids[rng.choice(movies, size=n, p=movie_p)]
+            vs = rng.integers(1, 6, size=n)
+            rows = [(int(u), int(m), int(v), str(start + timedelta(seconds=lo + i)))
+                    for i, (u, m, v) in enumerate(zip(us, ms, vs))]
+            cursor.executemany('INSERT INTO core_rating (user_id, movie_id, value, created_at) VALUES (%s, %s, %s, %s)', rows)
+    return {'users': users, 'movies': movies, 'ratings': Rating.objects.count()}
+
+
+def queries(user_ids, movie_ids, watermark):
+    """name -> (function of one user id, query used for the plan) for the explain-path Rating queries"""
+    def by_user(u):
+        return Rating.objects.filter(user_id=u)
+    return {
+        'profile_rebuild': (lambda u: list(by_user(u).order_by('created_at', 'id').values_list('movie_id', 'value')),
+                            by_user(user_ids[0]).order_by('created_at', 'id').values_list('movie_id', 'value')),
+        'profile_hash': (lambda u: list(by_user(u).order_by('movie_id', 'value').values_list('movie_id', 'value')),
+                         by_user(user_ids[0]).order_by('movie_id', 'value').values_list('movie_id', 'value')),
+        'counterfactual_low_rating': (lambda u: by_user(u).filter(value__lte=2).order_by('value').first(),
+                                      by_user(user_ids[0]).filter(value__lte=2).order_by('value')[:1]),
+        'user_ratings_for_cards': (lambda u: list(by_user(u).filter(movie_id__in=movie_ids).values_list('movie_id', 'value')),
+                                   by_user(user_ids[0]).filter(movie_id__in=movie_ids).values_list('movie_id', 'value')),
+        'onboarding_count': (lambda u: by_user(u).count(), by_user(user_ids[0])),
+        'training_watermark': (lambda u: Rating.objects.aggregate(w=Max('created_at')), None),
+        'ratings_since_watermark': (lambda u: list(Rating.objects.filter(created_at__gt=watermark).values_list('user_id', 'movie_id', 'value')),
+                                    Rating.objects.filter(created_at__gt=watermark).values_list('user_id', 'movie_id', 'value')),
+    }
+
+
+def plan(qs):
+    if qs is None:
+        return None
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def time_queries(user_ids, movie_ids, watermark, repeat):
+    results = {}
+    for name, (fn, qs) in queries(user_ids, movie_ids, watermark).items():
+        results[name] = measure(fn, [(u,) for u in user_ids], repeat)
+        results[name]['plan'] = plan(qs)
+        print(f"  {name:28s} median {results[name]['median_ms']:10.3f}ms  p95 {results[name]['p95_ms']:10.3f}ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ratings', type=int, default=2_000_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--movies', type=int, default=20_000)
+    parser.add_argument('--repeat', type=int, default=50, help='timed calls per query (cycling over sampled users)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='ratings.json', help='JSON report path')
+    parser.add_argument('--keep', action='store_true', help=f'keep the temporary data in {settings.BENCH_DIR}')
+    args = parser.parse_args(argv)
+
+    try:
+        call_command('migrate', verbosity=0)
+        call_command('migrate', 'core', BEFORE, verbosity=0)
+        t0 = time.perf_counter()
+        counts = load(args.users, args.movies, args.ratings, args.seed)
+        print(f"📊 Loaded {counts} in {time.perf_counter() - t0:.1f}s")
+
+        rng = np.random.default_rng(args.seed)
+        # Sample users weighted by activity, like requests are
+        active = list(Rating.objects.values_list('user_id', flat=True).order_by('?')[:2000])
+        user_ids = [int(u) for u in rng.choice(active, 20)]
+        movie_ids = [int(m) for m in rng.choice(list(Movie.objects.values_list('id', flat=True)), 12)]
+        watermark = Rating.objects.order_by('-id').values_list('created_at', flat=True)[1000]
+
+        print(f"\n=== before ({BEFORE}) ===")
+        before = time_queries(user_ids, movie_ids, watermark, args.repeat)
+        t0 = time.perf_counter()
+        call_command('migrate', 'core', AFTER, verbosity=0)
+        migrate_s = round(time.perf_counter() - t0, 3)
+        compacted = {'ratings': Rating.objects.count()}
+        print(f"\n🧹 Applied {AFTER} in {migrate_s}s, {counts['ratings'] - compacted['ratings']} duplicate ratings removed")
+        print(f"\n=== after ({AFTER}) ===")
+        after = time_queries(user_ids, movie_ids, watermark, args.repeat)
+    finally:
+        if not args.keep:
+            shutil.rmtree(settings.BENCH_DIR, ignore_errors=True)
+
+    for name in before:
+        ratio = after[name]['median_ms'] / before[name]['median_ms'] if before[name]['median_ms'] else float('inf')
+        print(f"  {name:28s} {before[name]['median_ms']:10.3f}ms -> {after[name]['median_ms']:10.3f}ms  x{ratio:6.3f}")
+    report = {'environment': environment(), 'repeat': args.repeat, 'seed': args.seed, 'counts': counts,
+              'compacted': compacted, 'migrate_s': migrate_s, 'before': before, 'after': after}
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\n💾 Wrote {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Benchmark the recommendation and explanation hot paths on synthetic data
+
+    python -m benchmarks.run --scales small,medium --out bench.json
+    python -m benchmarks.compare baseline.json bench.json
+
+Each scale gets a freshly generated dataset (see benchmarks.synthetic) in a
+temporary SQLite database, so runs never touch db.sqlite3 or models/. Every
+benchmark records the first (cold) call separately from the warm calls, which
+are summarised as min / median / p95 / mean milliseconds.
+"""
+import argparse, json, os, platform, shutil, statistics, subprocess, sys, time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db.models import Max  # noqa: E402
+from core.catalog_stats import touch  # noqa: E402
+from core.models import Movie, Rating  # noqa: E402
+from recs import lightfm_pipeline, rec_cache  # noqa: E402
+from recs.content_engine import content_engine  # noqa: E402
+from recs.topn_store import TOPN  # noqa: E402
+from recs.views import _user_specific_explain, _user_specific_explain_batch  # noqa: E402
+from recs.xai_explainer import get_comprehensive_xai_explanation  # noqa: E402
+from rag.embeddings import store  # noqa: E402
+from .synthetic import SCALES, generate  # noqa: E402
+
+
+def measure(fn, args, repeat):
+    """Call fn(*args[i % len(args)]) once cold, then repeat times warm"""
+    timings = []
+    for i in range(repeat + 1):
+        t0 = time.perf_counter()
+        fn(*args[i % len(args)])
+        timings.append((time.perf_counter() - t0) * 1000)
+    cold, warm = timings[0], sorted(timings[1:]) or timings[:1]
+    return {
+        'calls': len(warm),
+        'cold_ms': round(cold, 3),
+        'min_ms': round(warm[0], 3),
+        'median_ms': round(statistics.median(warm), 3),
+        'p95_ms': round(warm[min(len(warm) - 1, int(0.95 * len(warm)))], 3),
+        'mean_ms': round(statistics.fmean(warm), 3),
+    }
+
+
+def reset():
+    call_command('flush', interactive=False, verbosity=0)
+    touch()
+    for path in (lightfm_pipeline.ART, TOPN):
+        if os.path.exists(path):
+            os.remove(path)
+    content_engine.invalidate()
+
+
+def run_scale(name, sizes, repeat, seed):
+    print(f"\n=== {name}: {sizes} ===")
+    reset()
+    t0 = time.perf_counter()
+    counts = generate(seed=seed, **sizes)
+    setup = {'generate_s': round(time.perf_counter() - t0, 3)}
+    print(f"📊 Generated {counts} in {setup['generate_s']}s")
+    # bulk_create skips the rating signals, so build the user profiles up front
+    t0 = time.perf_counter()
+    call_command('rebuild_profiles', verbosity=0)
+    setup['profiles_s'] = round(time.perf_counter() - t0, 3)
+
+    rng = np.random.default_rng(seed)
+    user_ids = [int(u) for u in rng.choice(list(Rating.objects.values_list('user_id', flat=True).distinct()), 20)]
+    movie_ids = [int(m) for m in rng.choice(list(Movie.objects.values_list('id', flat=True)), 20)]
+    movies = Movie.objects.in_bulk(movie_ids)
+    user_movie = [(u, m) for u, m in zip(user_ids, movie_ids)]
+    queries = [(f"{movies[m].title} {movies[m].overview}", ) for m in movie_ids]
+    max_popularity = Movie.objects.aggregate(Max('popularity'))['popularity__max'] or 1.0
+
+    results = {}
+    results['train_and_save'] = measure(lightfm_pipeline.train_and_save, [()], repeat=0)
+    artifacts = lightfm_pipeline.load_artifacts()
+    setup['model_mode'] = artifacts.get('mode')
+    if lightfm_pipeline.precompute_recommendations():
+        results['topn_for_user'] = measure(lightfm_pipeline.topn_for_user, [(u, 12) for u in user_ids], repeat)
+        os.remove(TOPN)
+    results['topn_for_user_live'] = measure(lightfm_pipeline.topn_for_user, [(u, 12) for u in user_ids], repeat)
+    if setup['model_mode'] == 'lightfm':
+        # rec_cache only caches LightFM rankings; in fallback mode these calls would not be hits
+        for u in user_ids:
+            rec_cache.topn(u, 12)  # warm, so the calls below measure cache hits
+        results['rec_cache_topn_hit'] = measure(rec_cache.topn, [(u, 12) for u in user_ids], repeat)
+    results['content_based_recommendations'] = measure(lightfm_pipeline.content_based_recommendations,
+                                                       [(u, 12) for u in user_ids], repeat)
+    results['store_build'] = measure(store.build, [()], repeat=min(repeat, 2))
+    results['store_search'] = measure(store.search, queries, repeat)
+
+    model = artifacts.get('model') if artifacts.get('mode') == 'lightfm' else None
+    xai_args = [(u, m, model, artifacts.get('items'), artifacts.get('user_index'), artifacts.get('item_index'))
+                for u, m in user_movie]
+    results['get_comprehensive_xai_explanation'] = measure(get_comprehensive_xai_explanation, xai_args, repeat)
+    results['user_specific_explain'] = measure(_user_specific_explain,
+                                               [(movies[m], u, max_popularity) for u, m in user_movie], repeat)
+    results['user_specific_explain_batch'] = measure(_user_specific_explain_batch,
+                                                     [(list(movies.values()), u, max_popularity) for u in user_ids], repeat)
+
+    for bench, r in results.items():
+        print(f"  {bench:36s} cold {r['cold_ms']:10.2f}ms  median {r['median_ms']:10.2f}ms  p95 {r['p95_ms']:10.2f}ms")
+    return {'sizes': sizes, 'counts': counts, 'setup': setup, 'results': results}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=settings.BASE_DIR).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'django': django.get_version(), 'machine': platform.machine(), 'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default='small,medium', help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument('--repeat', type=int, default=20, help='warm calls per benchmark')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='bench.json', help='JSON report path')
+    parser.add_argument('--keep', action='store_true', help=f'keep the temporary data in {settings.BENCH_DIR}')
+    args = parser.parse_args(argv)
+
+    call_command('migrate', interactive=False, verbosity=0)
+    report = {'environment': environment(), 'repeat': args.repeat, 'seed': args.seed, 'scales': {}}
+    try:
+        for name in args.scales.split(','):
+            report['scales'][name] = run_scale(name, SCALES[name], args.repeat, args.seed)
+    finally:
+        if not args.keep:
+            shutil.rmtree(settings.BENCH_DIR, ignore_errors=True)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Wrote {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
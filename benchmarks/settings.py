@@ -0,0 +1,11 @@
+"""Project settings pointed at a throwaway database and model directory for benchmark runs"""
+import os, tempfile
+from project.settings import *  # noqa: F401,F403
+
+BENCH_DIR = os.getenv('BENCH_DIR') or tempfile.mkdtemp(prefix='moviewise-bench-')
+DATABASES = sqlite_databases(os.path.join(BENCH_DIR, 'bench.sqlite3'))  # noqa: F405 (DB_PROFILE applies)
+MODEL_DIR = os.path.join(BENCH_DIR, 'models'); os.makedirs(MODEL_DIR, exist_ok=True)
+RAG_INDEX_DIR = os.path.join(MODEL_DIR, 'rag_index')
+TMDB_CACHE_DB = ''
+EXPLAIN_PRECOMPUTE_TOP = 0
+DEBUG = False
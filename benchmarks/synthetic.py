@@ -0,0 +1,100 @@
+"""
+Deterministic synthetic catalog, users and ratings
+
+Movies get genre-flavoured titles and overviews built from small phrase banks,
+so TF-IDF, the RAG index and the genre keyword matching in the XAI code see
+text that behaves like TMDB overviews. Movie popularity and user activity both
+follow a Zipf-like power law, so a few titles and users account for most of the
+ratings, as in real rating logs. The same seed always produces the same data.
+"""
+import numpy as np
+from django.contrib.auth.models import User
+from core.catalog_stats import touch
+from core.features import fill
+from core.models import Movie, Rating
+
+GENRES = {
+    'action': (['explosive', 'relentless', 'rogue', 'high-stakes'], ['agent', 'mercenary', 'cop', 'soldier'],
+               ['stop a terrorist plot', 'survive a deadly chase', 'take down a crime syndicate', 'rescue a hostage']),
+    'comedy': (['hilarious', 'awkward', 'chaotic', 'lovable'], ['roommate', 'best man', 'slacker', 'family'],
+               ['plan a disastrous wedding', 'win back an ex', 'survive a road trip', 'fake a successful career']),
+    'drama': (['quiet', 'moving', 'intimate', 'haunting'], ['widow', 'teacher', 'father', 'young woman'],
+              ['rebuild a broken family', 'face a terminal diagnosis', 'confront a painful past', 'fight for justice']),
+    'horror': (['terrifying', 'cursed', 'isolated', 'sinister'], ['babysitter', 'priest', 'group of friends', 'new tenant'],
+               ['escape a haunted house', 'outrun a masked killer', 'break an ancient curse', 'survive the night']),
+    'romance': (['tender', 'unlikely', 'bittersweet', 'charming'], ['baker', 'musician', 'architect', 'pen pal'],
+                ['fall in love in Paris', 'choose between two suitors', 'reunite with a first love', 'find love again']),
+    'science fiction': (['distant', 'dystopian', 'interstellar', 'mind-bending'], ['astronaut', 'android', 'pilot', 'scientist'],
+                        ['explore a dying planet', 'stop an alien invasion', 'travel through time', 'escape a space station']),
+    'thriller': (['tense', 'paranoid', 'twisting', 'deadly'], ['detective', 'journalist', 'witness', 'hacker'],
+                 ['expose a conspiracy', 'catch a serial killer', 'uncover a spy', 'clear their own name']),
+    'animation': (['colorful', 'magical', 'heartwarming', 'adventurous'], ['young dragon', 'robot', 'princess', 'talking fox'],
+                  ['save their kingdom', 'find their way home', 'learn the value of friendship', 'stop an evil witch']),
+    'documentary': (['revealing', 'award-winning', 'intimate', 'shocking'], ['filmmaker', 'athlete', 'community', 'scientist'],
+                    ['document a true story', 'investigate a scandal', 'follow a historic expedition', 'chronicle a real life']),
+}
+SETTINGS = ['in a small town', 'across war-torn Europe', 'in near-future Tokyo', 'on a remote island',
+            'in 1970s New York', 'deep in the jungle', 'aboard a luxury train', 'in a crumbling mansion']
+CODAS = ['Nothing will ever be the same.', 'Based on a true story.', 'Time is running out.',
+         'A story of courage and sacrifice.', 'Secrets are revealed along the way.', 'An unforgettable journey.']
+NOUNS = ['Storm', 'Shadow', 'Promise', 'Horizon', 'Echo', 'Garden', 'Signal', 'Heart', 'Night', 'Frontier']
+
+SCALES = {
+    'small': dict(users=200, movies=2000, ratings=20000),
+    'medium': dict(users=1000, movies=10000, ratings=100000),
+    'large': dict(users=5000, movies=50000, ratings=500000),
+}
+
+
+def zipf_weights(n, exponent, rng):
+    """Power-law weights over n items, assigned to items in random order"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def movie_text(rng, index):
+    genres = rng.choice(list(GENRES), size=rng.integers(1, 3), replace=False)
+    adjectives, heroes, goals = GENRES[genres[0]]
+    title = f"The {rng.choice(adjectives).title()} {rng.choice(NOUNS)} {index}"
+    sentences = [f"A {rng.choice(adjectives)} {genre} about a {rng.choice(GENRES[genre][1])} who must "
+                 f"{rng.choice(GENRES[genre][2])} {rng.choice(SETTINGS)}." for genre in genres]
+    sentences.append(f"When a {rng.choice(heroes)} tries to {rng.choice(goals)}, everything changes.")
+    sentences.append(str(rng.choice(CODAS)))
+    return title, ' '.join(sentences)
+
+
+def generate(users=200, movies=2000, ratings=20000, seed=42, movie_exponent=1.0, user_exponent=0.8):
+    """Create the synthetic dataset in the current database -> dict of actual row counts"""
+    rng = np.random.default_rng(seed)
+
+    User.objects.bulk_create([User(username=f'bench{i}', password='!') for i in range(users)], batch_size=2000)
+    user_ids = np.array(User.objects.filter(username__startswith='bench').order_by('id').values_list('id', flat=True))
+
+    movie_p = zipf_weights(movies, movie_exponent, rng)
+    quality = np.clip(rng.normal(6.5, 1.2, movies), 1.0, 9.8)
+    popularity = movie_p / movie_p.max() * 500 * rng.lognormal(0, 0.3, movies)
+    rows = []
+    for i in range(movies):
+        title, overview = movie_text(rng, i)
+        rows.append(fill(Movie(tmdb_id=10_000_000 + i, title=title[:255], overview=overview, year=str(rng.integers(1960, 2025)),
+                               popularity=round(float(popularity[i]), 3), vote=round(float(quality[i]), 1))))
+    Movie.objects.bulk_create(rows, batch_size=2000)
+    touch()
+    movie_ids = np.array(Movie.objects.filter(tmdb_id__gte=10_000_000).order_by('tmdb_id').values_list('id', flat=True))
+
+    # Every user rates at least 5 movies; the rest of the budget follows the activity power law
+    user_p = zipf_weights(users, user_exponent, rng)
+    per_user = 5 + rng.multinomial(max(ratings - 5 * users, 0), user_p)
+    user_bias = rng.normal(0, 0.6, users)
+    rows = []
+    for u in range(users):
+        n = min(per_user[u], movies)
+        picked = rng.choice(movies, size=n, replace=False, p=movie_p)
+        values = np.clip(np.rint((quality[picked] - 6.5) / 1.2 + 3.4 + user_bias[u] + rng.normal(0, 0.8, n)), 1, 5)
+        rows.extend(Rating(user_id=int(user_ids[u]), movie_id=int(movie_ids[m]), value=int(v)) for m, v in zip(picked, values))
+        if len(rows) >= 20000:
+            Rating.objects.bulk_create(rows, batch_size=5000)
+            rows = []
+    Rating.objects.bulk_create(rows, batch_size=5000)
+    return {'users': len(user_ids), 'movies': len(movie_ids), 'ratings': Rating.objects.count()}
@@ -1,3 +1,3 @@
 from django.contrib import admin
-from .models import Movie, Rating, UserOnboarding
-admin.site.register([Movie, Rating, UserOnboarding])
+from .models import Genre, Person, Credit, Movie, Rating, UserOnboarding, ExplanationCache, UserProfile
+admin.site.register([Genre, Person, Credit, Movie, Rating, UserOnboarding, ExplanationCache, UserProfile])
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        # explain_cache registers its hit/miss stats with core.metrics on import; db tunes SQLite connections
+        from . import signals, explain_cache, db  # noqa: F401
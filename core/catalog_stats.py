@@ -0,0 +1,100 @@
+"""
+Columnar in-memory snapshot of the movie catalog
+
+Scoring and explanation paths need catalog-wide numbers (maximum popularity,
+average vote and popularity) and per-movie vote/popularity columns. Instead of
+running aggregates over the Movie table on every request, they read a
+CatalogSnapshot: NumPy arrays of id, vote, popularity and year with the
+aggregates and a popularity ranking computed once.
+
+Writers call touch() (Movie saves do so through core.signals, bulk ingests
+explicitly), which bumps the mtime of a stamp file in MODEL_DIR. Readers in any
+process compare it with one os.stat() and rebuild the snapshot when it moved,
+so a cached read costs no queries.
+"""
+import os, threading, time
+import numpy as np
+from django.conf import settings
+from .models import Movie
+
+
+def stamp_path():
+    return os.path.join(settings.MODEL_DIR, 'catalog.stamp')
+
+
+def touch():
+    """Mark the catalog as changed for every process"""
+    path = stamp_path()
+    now = time.time_ns()
+    try:
+        os.utime(path, ns=(now, now))
+    except FileNotFoundError:
+        with open(path, 'a'):
+            pass
+        os.utime(path, ns=(now, now))
+
+
+def stamp():
+    """Current catalog version (stamp file mtime, 0 before the first touch)"""
+    try:
+        return os.stat(stamp_path()).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+class CatalogSnapshot:
+    """Immutable catalog columns and aggregates (swapped as a whole on refresh)"""
+
+    def __init__(self, ids, vote, popularity, year, stamp):
+        self.ids = ids                # np.int64, ascending
+        self.vote = vote              # np.float64 TMDB vote average per movie
+        self.popularity = popularity  # np.float64 TMDB popularity per movie
+        self.year = year              # np.int32, 0 when unknown
+        self.stamp = stamp
+        self.size = len(ids)
+        self.max_popularity = float(popularity.max()) if self.size else 0.0
+        self.avg_vote = float(vote.mean()) if self.size else None
+        self.avg_popularity = float(popularity.mean()) if self.size else None
+        # Row order by popularity, most popular first (ties by id)
+        self.by_popularity = np.lexsort((ids, -popularity))
+
+    def top_popular(self, k):
+        return [int(i) for i in self.ids[self.by_popularity[:k]]]
+
+    def fallback_scores(self):
+        """Non-personalized score per row: 0.6 * vote/10 + 0.4 * popularity/max"""
+        return 0.6 * (self.vote / 10.0) + 0.4 * (self.popularity / (self.max_popularity or 1.0))
+
+
+class Catalog:
+    def __init__(self):
+        self.snapshot = None
+        self._lock = threading.Lock()
+
+    def build(self, stamp):
+        rows = list(Movie.objects.order_by('id').values_list('id', 'vote', 'popularity', 'year'))
+        self.snapshot = CatalogSnapshot(
+            np.array([r[0] for r in rows], dtype=np.int64),
+            np.array([r[1] or 0 for r in rows], dtype=np.float64),
+            np.array([r[2] or 0 for r in rows], dtype=np.float64),
+            np.array([int(r[3]) if (r[3] or '').isdigit() else 0 for r in rows], dtype=np.int32),
+            stamp)
+        return self.snapshot
+
+    def get(self):
+        """The current snapshot, rebuilt if the catalog was touched since it was taken"""
+        current = stamp()
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.stamp == current:
+            return snapshot
+        with self._lock:
+            if self.snapshot is None or self.snapshot.stamp != current:
+                self.build(current)
+            return self.snapshot
+
+    def invalidate(self):
+        self.snapshot = None
+
+
+# Global catalog instance, shared across requests in a worker
+catalog = Catalog()
@@ -0,0 +1,71 @@
+"""
+SQLite connection tuning and read/write routing
+
+With DB_PROFILE=production (see project.settings) every SQLite connection gets
+the SQLITE_PRAGMAS on connect: WAL journaling lets readers keep going while
+rate_movie commits, synchronous=NORMAL is safe under WAL, and mmap/cache_size
+keep hot pages in memory. The settings also add a READ_ALIAS connection to the
+same file, opened with query_only.
+
+Reads made inside reading() (or a @read_only view) go to READ_ALIAS, so the
+recommendation and explanation endpoints never hold the write connection.
+Writes, reads inside a transaction on the default connection (they must see its
+uncommitted rows) and everything outside reading() stay on 'default'. Without
+the READ_ALIAS database the router is a no-op.
+"""
+import contextvars, functools
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+READ_ALIAS = 'readonly'
+
+_reading = contextvars.ContextVar('reading', default=False)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name}={value}')
+    if connection.alias == READ_ALIAS:
+        connection.connection.execute('PRAGMA query_only=1')
+
+
+@contextmanager
+def reading():
+    """Route the ORM reads in this context (and contexts copied from it) to READ_ALIAS"""
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+def read_only(view):
+    """View decorator: run the view inside reading()"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with reading():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReadWriteRouter:
+    def db_for_read(self, model, **hints):
+        if _reading.get() and READ_ALIAS in settings.DATABASES and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return READ_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also for instances loaded through READ_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == READ_ALIAS else None
@@ -0,0 +1,127 @@
+"""
+Cache for LLM-generated explanations
+
+An explanation depends on the user and their ratings, the movie, the LLM model
+and the prompt template, so the key is a digest of exactly those: the user, the
+movie, their rating watermark (core.profiles.watermark, one indexed profile read
+instead of hashing every rating), the model name and PROMPT_VERSION. Entries are
+kept in the ExplanationCache table (shared by every worker, bounded by
+EXPLANATION_CACHE_MAX_ROWS, least recently used rows evicted first) with a small
+in-process LRU in front. A new rating moves the watermark, and the Rating
+signals in core.signals also drop the user's rows.
+
+A lookup stays a read: hits are counted in memory and written together with
+used_at, at most every TOUCH_INTERVAL per row (or when HIT_FLUSH_ROWS rows have
+pending hits). used_at only has to be accurate enough for eviction.
+"""
+import hashlib, threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .cache import LRUCache
+from .metrics import register_cache
+from .models import ExplanationCache
+from .profiles import watermark
+
+memory = LRUCache(settings.EXPLANATION_CACHE_MEMORY, name='explanations')
+counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0}
+
+TOUCH_INTERVAL = timedelta(minutes=5)
+HIT_FLUSH_ROWS = 256
+_pending_hits = {}  # row pk -> hits not yet written
+_hits_lock = threading.Lock()
+
+
+def profile_hash(user_id):
+    """Key part for the user's rating history (changes with every rating write)"""
+    return watermark(user_id)
+
+
+def cache_key(user_id, movie_key, profile, llm_model, prompt_version):
+    # The watermark alone is not per user ('0' for every user without a profile)
+    return hashlib.sha256(f"{user_id}|{movie_key}|{profile}|{llm_model}|{prompt_version}".encode()).hexdigest()
+
+
+def get(user_id, key):
+    payload = memory.get((user_id, key))
+    if payload is None:
+        row = ExplanationCache.objects.filter(key=key).only('payload', 'used_at').first()
+        if row is not None:
+            payload = row.payload
+            memory.set((user_id, key), payload)
+            _record_hit(row)
+    counters['hits' if payload is not None else 'misses'] += 1
+    return payload
+
+
+def _record_hit(row):
+    """Count a DB hit; write it (with used_at) only when the row's used_at is stale or many rows are pending"""
+    with _hits_lock:
+        _pending_hits[row.pk] = _pending_hits.get(row.pk, 0) + 1
+        if len(_pending_hits) >= HIT_FLUSH_ROWS:
+            pending = dict(_pending_hits)
+            _pending_hits.clear()
+        elif row.used_at is None or timezone.now() - row.used_at >= TOUCH_INTERVAL:
+            pending = {row.pk: _pending_hits.pop(row.pk)}
+        else:
+            return
+    flush_hits(pending)
+
+
+def flush_hits(pending=None):
+    """Write pending hit counts and refresh used_at of those rows"""
+    if pending is None:
+        with _hits_lock:
+            pending = dict(_pending_hits)
+            _pending_hits.clear()
+    if not pending:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        for pk, hits in pending.items():
+            ExplanationCache.objects.filter(pk=pk).update(hits=F('hits') + hits, used_at=now)
+
+
+def contains(user_id, key):
+    """Whether key is cached, without touching counters or recency"""
+    return memory.peek((user_id, key)) is not None or ExplanationCache.objects.filter(key=key).exists()
+
+
+def put(user_id, key, payload, movie_key, llm_model, prompt_version):
+    try:
+        ExplanationCache.objects.update_or_create(key=key, defaults=dict(
+            user_id=user_id, movie_key=movie_key, llm_model=llm_model, prompt_version=prompt_version, payload=payload))
+    except Exception as e:
+        print(f"⚠️ Explanation cache write failed: {e}")
+        return
+    memory.set((user_id, key), payload)
+    counters['stores'] += 1
+    _evict()
+
+
+def _evict():
+    limit = settings.EXPLANATION_CACHE_MAX_ROWS
+    if ExplanationCache.objects.count() <= limit:
+        return
+    # Trim to 90% so a full table is not pruned on every insert
+    stale = ExplanationCache.objects.order_by('-used_at').values_list('pk', flat=True)[int(limit * 0.9):]
+    deleted, _ = ExplanationCache.objects.filter(pk__in=list(stale)).delete()
+    counters['evictions'] += deleted
+
+
+def invalidate_user(user_id):
+    deleted, _ = ExplanationCache.objects.filter(user_id=user_id).delete()
+    dropped = memory.discard_where(lambda k: k[0] == user_id)
+    counters['invalidations'] += max(deleted, dropped)
+
+
+def stats():
+    lookups = counters['hits'] + counters['misses']
+    return dict(counters, rows=ExplanationCache.objects.count(), memory=memory.stats(),
+                hit_ratio=round(counters['hits'] / lookups, 4) if lookups else 0.0)
+
+
+register_cache('explanations', lambda: dict(counters, size=ExplanationCache.objects.count()))
+register_cache('explanations_memory', memory.stats)
@@ -0,0 +1,136 @@
+"""
+Precomputed per-movie text features
+
+Movies store their significant words (longer than 3 characters, from title and
+overview) as a sorted array of 64-bit token codes, (len << 32) | crc32(word),
+and their keyword genres as a bitmask. Both are filled whenever a Movie is
+saved (see core.signals) and by the bulk ingest paths, so explanations compare
+words and genres with integer set and bitwise operations instead of
+re-tokenizing overviews on every request. Since the length sits in the high
+bits, "words longer than n" is a single comparison on the codes.
+"""
+import zlib
+import numpy as np
+
+GENRE_KEYWORDS = {
+    'action': ['action', 'fight', 'battle', 'war', 'combat', 'violence'],
+    'comedy': ['funny', 'humor', 'comedy', 'laugh', 'comic', 'hilarious'],
+    'drama': ['drama', 'emotional', 'family', 'relationship', 'life', 'drama'],
+    'thriller': ['suspense', 'mystery', 'crime', 'detective', 'killer', 'threat'],
+    'romance': ['romance', 'love', 'romantic', 'heart', 'wedding', 'couple'],
+    'horror': ['horror', 'scary', 'frightening', 'monster', 'ghost', 'death']
+}
+GENRES = list(GENRE_KEYWORDS)  # bit i of a genre mask is GENRES[i]
+
+_EMPTY = np.zeros(0, dtype=np.uint64)
+
+
+def movie_text(title, overview):
+    return f"{title} {overview or ''}".lower()
+
+
+def text_tokens(text):
+    """Distinct significant words (longer than 3 characters)"""
+    return {w for w in (text or '').lower().split() if len(w) > 3}
+
+
+def keyword_genres(text):
+    """Keyword genres whose words appear anywhere in text, in GENRE_KEYWORDS order"""
+    text = (text or '').lower()
+    return [genre for genre, keywords in GENRE_KEYWORDS.items() if any(k in text for k in keywords)]
+
+
+def token_code(word):
+    return (len(word) << 32) | zlib.crc32(word.encode())
+
+
+def min_code(length):
+    """Smallest code of a word with at least length characters"""
+    return length << 32
+
+
+def token_codes(text):
+    """Sorted unique token codes of the significant words in text"""
+    return np.unique(np.fromiter((token_code(w) for w in text_tokens(text)), dtype=np.uint64))
+
+
+def genre_mask(text):
+    return sum(1 << GENRES.index(genre) for genre in keyword_genres(text))
+
+
+def mask_genres(mask):
+    """Genre names of a mask, in GENRE_KEYWORDS order"""
+    return [genre for i, genre in enumerate(GENRES) if mask >> i & 1]
+
+
+def fill(movie):
+    """Compute and set movie.token_codes and movie.genre_mask from its title and overview"""
+    text = movie_text(movie.title, movie.overview)
+    movie.token_codes = token_codes(text).tobytes()
+    movie.genre_mask = genre_mask(text)
+    return movie
+
+
+def movie_features(movie):
+    """(token codes, genre mask) of a movie; computed on the fly for unsaved or not yet backfilled movies"""
+    if movie.genre_mask is None:
+        fill(movie)
+    return np.frombuffer(bytes(movie.token_codes or b''), dtype=np.uint64), movie.genre_mask
+
+
+def real_genres(movie_ids):
+    """{movie id: lowercase TMDB genre names in TMDB order} for ingested movies that have genres"""
+    from .models import Movie
+    genres = {}
+    for movie_id, name in (Movie.genres.through.objects.filter(movie_id__in=movie_ids).order_by('id')
+                           .values_list('movie_id', 'genre__name')):
+        genres.setdefault(movie_id, []).append(name.lower())
+    return genres
+
+
+# Per-profile term counts: sorted codes plus the number of liked movies containing each
+
+def encode_terms(codes, counts):
+    return codes.astype(np.uint64).tobytes() + counts.astype(np.uint32).tobytes()
+
+
+def decode_terms(blob):
+    blob = bytes(blob or b'')
+    n = len(blob) // 12
+    return np.frombuffer(blob[:8 * n], dtype=np.uint64), np.frombuffer(blob[8 * n:], dtype=np.uint32)
+
+
+def add_terms(terms, codes):
+    """terms with 1 added to a code's count for every occurrence in codes"""
+    known, counts = terms
+    if not len(codes):
+        return known, counts
+    codes = np.asarray(codes, dtype=np.uint64)
+    merged = np.concatenate([known, codes])
+    weights = np.concatenate([counts, np.ones(len(codes), dtype=np.uint32)])
+    merged, inverse = np.unique(merged, return_inverse=True)
+    return merged, np.bincount(inverse, weights=weights, minlength=len(merged)).astype(np.uint32)
+
+
+def shared_counts(terms, codes):
+    """Counts in terms of the codes present in both"""
+    known, counts = terms
+    if not len(known) or not len(codes):
+        return counts[:0]
+    idx = np.searchsorted(known, codes)
+    idx[idx == len(known)] = 0
+    return counts[idx[known[idx] == codes]]
+
+
+def max_shared_counts(terms, code_lists):
+    """For each code array, the highest count in terms among its codes (0 if none), in one lookup"""
+    known, counts = terms
+    sizes = [len(codes) for codes in code_lists]
+    best = np.zeros(len(code_lists), dtype=np.int64)
+    if not len(known) or not sum(sizes):
+        return best
+    codes = np.concatenate(code_lists)
+    idx = np.searchsorted(known, codes)
+    idx[idx == len(known)] = 0
+    np.maximum.at(best, np.repeat(np.arange(len(code_lists)), sizes), np.where(known[idx] == codes, counts[idx], 0))
+    return best
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.models import Rating
+from core.profiles import rebuild
+
+class Command(BaseCommand):
+    help = "Rebuild every user's rating profile (e.g. after ratings were bulk-imported)"
+
+    def handle(self, *a, **kw):
+        user_ids = list(Rating.objects.exclude(user=None).values_list('user_id', flat=True).distinct())
+        for uid in user_ids:
+            rebuild(uid)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(user_ids)} user profiles."))
@@ -0,0 +1,226 @@
+"""
+Lightweight in-process tracing and metrics
+
+span(name) / @traced(name) time a block or function into a per-stage latency
+histogram. MetricsMiddleware records request latency per endpoint and the
+number of DB queries each request ran. /api/metrics renders everything, plus
+the hit rates of registered caches, in the Prometheus text format.
+
+Queries are counted by a wrapper installed on every connection of every alias
+(when it is opened, and by the middleware for connections opened earlier). It
+adds to the counter in the current context, so queries run on pool threads that
+copy the request's context (see recs.explain_pipeline) count as well.
+
+Metrics are per process; with several workers, scrape each one.
+"""
+import contextvars, functools, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PREFIX = 'moviewise'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        for label_values, (counts, total, count) in series:
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = ',' if base else ''
+            cumulative = 0
+            for le, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+stage_seconds = Histogram(f'{PREFIX}_stage_seconds', 'Latency of traced stages', ('stage',))
+request_seconds = Histogram(f'{PREFIX}_request_seconds', 'HTTP request latency', ('endpoint', 'method', 'status'))
+request_queries = Histogram(f'{PREFIX}_request_db_queries', 'DB queries run per HTTP request', ('endpoint', 'method'),
+                            buckets=QUERY_BUCKETS)
+HISTOGRAMS = [request_seconds, request_queries, stage_seconds]
+
+# name -> callable returning a stats dict with hits/misses (and optionally size)
+CACHES = {}
+
+
+def register_cache(name, stats):
+    CACHES[name] = stats
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, name)
+
+
+def traced(name):
+    """Decorator form of span()"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+
+_query_counter = contextvars.ContextVar('query_counter', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.add()
+    return execute(sql, params, many, context)
+
+
+def _install(connection):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@receiver(connection_created)
+def count_queries(sender, connection, **kwargs):
+    _install(connection)
+
+
+class MetricsMiddleware:
+    """
+    Per-endpoint latency and DB query count; adds an X-DB-Queries header.
+    A streaming response (SSE) does its work while it is iterated, so it is
+    recorded when the stream ends or is closed, and has no header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = _QueryCounter()
+        for conn in connections.all():
+            _install(conn)
+        token = _query_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            context = contextvars.copy_context() if response.streaming else None
+        finally:
+            _query_counter.reset(token)
+
+        def observe():
+            match = getattr(request, 'resolver_match', None)
+            endpoint = '/' + match.route if match else 'unmatched'
+            request_seconds.observe(time.perf_counter() - started, endpoint, request.method, str(response.status_code))
+            request_queries.observe(counter.count, endpoint, request.method)
+
+        if response.streaming:
+            content = response.streaming_content
+            response.streaming_content = (_observed_async(content, counter, observe) if response.is_async
+                                          else _observed(content, context, observe))
+            return response
+        observe()
+        response['X-DB-Queries'] = str(counter.count)
+        return response
+
+
+def _observed(content, context, observe):
+    """Iterate a sync stream in the request's context (which holds its query counter), then observe"""
+    try:
+        while True:
+            try:
+                part = context.run(next, content)
+            except StopIteration:
+                return
+            yield part
+    finally:
+        observe()
+
+
+async def _observed_async(content, counter, observe):
+    token = _query_counter.set(counter)
+    try:
+        async for part in content:
+            yield part
+    finally:
+        try:
+            _query_counter.reset(token)
+        except ValueError:  # closed from another context
+            pass
+        observe()
+
+
+def _cache_lines():
+    lines = []
+    rows = []
+    for name, stats in sorted(CACHES.items()):
+        try:
+            rows.append((name, stats()))
+        except Exception as e:
+            print(f"⚠️ Cache stats for {name} failed: {e}")
+    for metric, kind, key, help in (('cache_hits_total', 'counter', 'hits', 'Cache hits'),
+                                    ('cache_misses_total', 'counter', 'misses', 'Cache misses'),
+                                    ('cache_hit_ratio', 'gauge', 'hit_ratio', 'Hits / lookups since start'),
+                                    ('cache_size', 'gauge', 'size', 'Entries currently cached')):
+        lines += [f"# HELP {PREFIX}_{metric} {help}", f"# TYPE {PREFIX}_{metric} {kind}"]
+        for name, s in rows:
+            if key == 'hit_ratio':
+                lookups = s.get('hits', 0) + s.get('misses', 0)
+                value = s['hits'] / lookups if lookups else 0.0
+            else:
+                value = s.get(key)
+            if value is not None:
+                lines.append(f'{PREFIX}_{metric}{{cache="{name}"}} {value}')
+    return lines
+
+
+def render():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    lines += _cache_lines()
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-17 23:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_explanationcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_ratings', models.IntegerField(default=0)),
+                ('high_ratings', models.IntegerField(default=0)),
+                ('low_ratings', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('liked', models.JSONField(default=list)),
+                ('liked_tokens', models.JSONField(default=dict)),
+                ('liked_genres', models.JSONField(default=dict)),
+                ('centroid', models.BinaryField(default=b'')),
+                ('version', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
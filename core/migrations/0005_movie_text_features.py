@@ -0,0 +1,51 @@
+# Generated by Django 4.2.26 on 2026-10-17 23:59
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from core.features import fill
+    Movie = apps.get_model('core', 'Movie')
+    batch = []
+    for movie in Movie.objects.only('title', 'overview').iterator(chunk_size=2000):
+        batch.append(fill(movie))
+        if len(batch) >= 2000:
+            Movie.objects.bulk_update(batch, ['token_codes', 'genre_mask'])
+            batch = []
+    Movie.objects.bulk_update(batch, ['token_codes', 'genre_mask'])
+    drop_profiles(apps, schema_editor)
+
+
+def drop_profiles(apps, schema_editor):
+    # Profiles hold word counts in the other format; get_profile() rebuilds them on first use
+    apps.get_model('core', 'UserProfile').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_userprofile'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='liked_tokens',
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='genre_mask',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='token_codes',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='liked_terms',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(backfill, drop_profiles),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.26 on 2026-10-18 00:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def compact(apps, schema_editor):
+    # Re-rating used to append rows; keep each user's latest (highest id) rating per movie
+    Rating = apps.get_model('core', 'Rating')
+    latest = Rating.objects.filter(user__isnull=False).values('user', 'movie').annotate(keep=Max('id')).values('keep')
+    Rating.objects.filter(user__isnull=False).exclude(id__in=latest).delete()
+    # Profiles counted the duplicates; get_profile() rebuilds them on first use
+    apps.get_model('core', 'UserProfile').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0006_tmdb_genres_language_cast'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='rating',
+            unique_together={('user', 'movie')},
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['user', 'value'], name='rating_user_value'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['user', 'created_at'], name='rating_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['created_at'], name='rating_created'),
+        ),
+    ]
@@ -1,5 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import User
+class Genre(models.Model):
+    tmdb_id=models.IntegerField(unique=True)
+    name=models.CharField(max_length=64, db_index=True)
+    def __str__(self): return self.name
+
+class Person(models.Model):
+    tmdb_id=models.IntegerField(unique=True)
+    name=models.CharField(max_length=255, db_index=True)
+    def __str__(self): return self.name
+
 class Movie(models.Model):
     tmdb_id=models.IntegerField(unique=True, null=True, blank=True)
     title=models.CharField(max_length=255)
@@ -8,13 +18,35 @@ class Movie(models.Model):
     poster=models.URLField(blank=True)
     popularity=models.FloatField(default=0)
     vote=models.FloatField(default=0)
+    original_language=models.CharField(max_length=8, blank=True, db_index=True)  # ISO 639-1, from TMDB
+    genres=models.ManyToManyField(Genre, blank=True, related_name='movies')
+    cast=models.ManyToManyField(Person, through='Credit', blank=True, related_name='movies')
+    token_codes=models.BinaryField(default=b'', editable=False)  # sorted uint64 word codes, see core.features
+    genre_mask=models.SmallIntegerField(null=True, blank=True, editable=False)  # keyword genre bits; null = not computed
     def __str__(self): return self.title
     
+class Credit(models.Model):
+    """Top-billed cast member of a movie"""
+    movie=models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='credits')
+    person=models.ForeignKey(Person, on_delete=models.CASCADE, related_name='credits')
+    character=models.CharField(max_length=255, blank=True)
+    order=models.SmallIntegerField(default=0)  # TMDB billing order, 0 = top
+    class Meta:
+        unique_together=[('movie', 'person')]
+        ordering=['order']
+
 class Rating(models.Model):
     user=models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     movie=models.ForeignKey(Movie, on_delete=models.CASCADE)
     value=models.IntegerField(default=5)
-    created_at=models.DateTimeField(auto_now_add=True)
+    created_at=models.DateTimeField(auto_now_add=True)  # refreshed when the user re-rates the movie
+    class Meta:
+        unique_together=[('user', 'movie')]  # rate_movie upserts; anonymous (null user) ratings are not unique
+        indexes=[
+            models.Index(fields=['user', 'value'], name='rating_user_value'),  # low/high ratings per user
+            models.Index(fields=['user', 'created_at'], name='rating_user_created'),  # a user's ratings in time order
+            models.Index(fields=['created_at'], name='rating_created'),  # training watermark scans
+        ]
 
 class UserOnboarding(models.Model):
     """Track onboarding completion for users"""
@@ -26,3 +58,48 @@ class UserOnboarding(models.Model):
     
     def __str__(self):
         return f"Onboarding for {self.user.username}"
+
+class ExplanationCache(models.Model):
+    """Generated LLM explanation for a movie and a user's rating profile"""
+    key=models.CharField(max_length=64, unique=True)  # sha256 of user, movie, profile watermark, LLM model, prompt version
+    user=models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    movie_key=models.CharField(max_length=32)
+    llm_model=models.CharField(max_length=64)
+    prompt_version=models.IntegerField()
+    payload=models.JSONField()
+    hits=models.IntegerField(default=0)
+    created_at=models.DateTimeField(auto_now_add=True)
+    used_at=models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Explanation {self.movie_key} for user {self.user_id}"
+
+class UserProfile(models.Model):
+    """Aggregates of a user's ratings, updated by core.profiles on every rating write"""
+    user=models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
+    total_ratings=models.IntegerField(default=0)
+    high_ratings=models.IntegerField(default=0)  # value >= 4, i.e. liked
+    low_ratings=models.IntegerField(default=0)  # value <= 2
+    rating_sum=models.IntegerField(default=0)
+    liked=models.JSONField(default=list)  # [movie_id, value] per liked rating, oldest first
+    liked_terms=models.BinaryField(default=b'')  # word codes and the number of liked movies containing each
+    liked_genres=models.JSONField(default=dict)  # keyword genre -> number of liked movies matching it
+    centroid=models.BinaryField(default=b'')  # summed hashed term counts of liked movies (RAG featurizer)
+    version=models.IntegerField(default=0)
+    updated_at=models.DateTimeField(auto_now=True)
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.total_ratings if self.total_ratings else 0.0
+
+    @property
+    def terms(self):
+        from .features import decode_terms
+        return decode_terms(self.liked_terms)
+
+    @property
+    def liked_ids(self):
+        return [movie_id for movie_id, _ in self.liked]
+
+    def __str__(self):
+        return f"Profile for user {self.user_id}"
@@ -0,0 +1,131 @@
+"""
+Materialized per-user rating profiles
+
+The explanation and recommendation paths all need the same facts about a user:
+how many ratings they made (high/low/total) and their average, which movies
+they liked, the words those liked movies contain, their genres (TMDB genres
+where ingested, keyword genres otherwise), and a term centroid of them.
+UserProfile keeps these in one row, so readers do one query instead of walking
+Rating -> Movie and re-tokenizing overviews. Words and keyword genres come from
+the movies' precomputed core.features.
+
+A new rating is folded in incrementally. Edits and deletions rebuild the row
+from the user's ratings. get_profile() builds a missing profile on first use,
+which also covers ratings written with bulk_create (no signals).
+"""
+import numpy as np
+import scipy.sparse as sp
+from django.db import transaction
+from .features import add_terms, encode_terms, mask_genres, movie_features, real_genres
+from .models import Movie, Rating, UserProfile
+
+LIKED = 4  # ratings >= LIKED count as liked / high
+DISLIKED = 2  # ratings <= DISLIKED count as low
+CENTROID_TERMS = 1024  # strongest terms kept in the stored centroid
+
+_featurizer = None
+
+
+def _term_counts(docs):
+    """Summed hashed term counts (RAG featurizer) of docs, as a 1 x n_features CSR row"""
+    global _featurizer
+    if _featurizer is None:
+        from rag.index import make_featurizer
+        _featurizer = make_featurizer()
+    return sp.csr_matrix(_featurizer.transform(docs).sum(axis=0), dtype=np.float32)
+
+
+def encode_centroid(row):
+    row = sp.csr_matrix(row, dtype=np.float32)
+    if row.nnz > CENTROID_TERMS:
+        keep = np.argpartition(-row.data, CENTROID_TERMS - 1)[:CENTROID_TERMS]
+        row = sp.csr_matrix((row.data[keep], (np.zeros(len(keep), dtype=np.int32), row.indices[keep])), shape=row.shape)
+    return row.indices.astype(np.int32).tobytes() + row.data.astype(np.float32).tobytes()
+
+
+def decode_centroid(blob, n_features):
+    blob = bytes(blob or b'')
+    nnz = len(blob) // 8
+    indices = np.frombuffer(blob[:4 * nnz], dtype=np.int32)
+    data = np.frombuffer(blob[4 * nnz:], dtype=np.float32)
+    return sp.csr_matrix((data, indices, [0, nnz]), shape=(1, n_features))
+
+
+def _fold_liked(profile, pairs):
+    """Add liked (movie_id, value) ratings to the term/genre counts and centroid"""
+    if not pairs:
+        return
+    movies = Movie.objects.only('title', 'overview', 'token_codes', 'genre_mask').in_bulk({m for m, _ in pairs})
+    pairs = [(m, v) for m, v in pairs if m in movies]
+    codes = []
+    genres = real_genres(movies)
+    for movie_id, value in pairs:
+        movie_codes, mask = movie_features(movies[movie_id])
+        codes.append(movie_codes)
+        # TMDB genres when ingested, keyword genres otherwise
+        for genre in genres.get(movie_id) or mask_genres(mask):
+            profile.liked_genres[genre] = profile.liked_genres.get(genre, 0) + 1
+        profile.liked.append([movie_id, value])
+    terms = add_terms(profile.terms, np.concatenate(codes) if codes else codes)
+    profile.liked_terms = encode_terms(*terms)
+    from rag.embeddings import movie_document
+    counts = _term_counts([movie_document(movies[m].title, movies[m].overview) for m, _ in pairs])
+    if profile.centroid:
+        counts = counts + decode_centroid(profile.centroid, counts.shape[1])
+    profile.centroid = encode_centroid(counts)
+
+
+def rebuild(user_id):
+    """Recompute a user's profile from their ratings"""
+    ratings = list(Rating.objects.filter(user_id=user_id).order_by('created_at', 'id').values_list('movie_id', 'value'))
+    with transaction.atomic():
+        previous = UserProfile.objects.select_for_update().filter(user_id=user_id).first()
+        profile = UserProfile(user_id=user_id)
+        if previous is not None:
+            profile.pk, profile.version = previous.pk, previous.version
+        elif not ratings:
+            return profile  # nothing to store (the user may not even exist)
+        profile.liked, profile.liked_terms, profile.liked_genres, profile.centroid = [], b'', {}, b''
+        profile.total_ratings = len(ratings)
+        profile.rating_sum = sum(v for _, v in ratings)
+        profile.high_ratings = sum(1 for _, v in ratings if v >= LIKED)
+        profile.low_ratings = sum(1 for _, v in ratings if v <= DISLIKED)
+        _fold_liked(profile, [(m, v) for m, v in ratings if v >= LIKED])
+        profile.version += 1
+        profile.save()
+    return profile
+
+
+def apply_rating(user_id, movie_id, value):
+    """Fold one newly created rating into the user's profile"""
+    with transaction.atomic():
+        profile = UserProfile.objects.select_for_update().filter(user_id=user_id).first()
+        if profile is None:
+            return rebuild(user_id)  # the new rating is already in the table
+        profile.total_ratings += 1
+        profile.rating_sum += value
+        profile.high_ratings += value >= LIKED
+        profile.low_ratings += value <= DISLIKED
+        if value >= LIKED:
+            _fold_liked(profile, [(movie_id, value)])
+        profile.version += 1
+        profile.save()
+    return profile
+
+
+def get_profile(user_id, only=None):
+    """The user's profile in one query; built on first use. only limits the loaded fields."""
+    profiles = UserProfile.objects.only('user_id', 'version', *only) if only else UserProfile.objects
+    profile = profiles.filter(user_id=user_id).first()
+    return profile if profile is not None else rebuild(user_id)
+
+
+def watermark(user_id):
+    """
+    Token that changes with every write to the user's ratings: the profile
+    version plus its updated_at ('0' without a profile). The version alone
+    restarts when a profile is dropped and rebuilt; updated_at keeps the token
+    from repeating.
+    """
+    row = UserProfile.objects.filter(user_id=user_id).values_list('version', 'updated_at').first()
+    return f"{row[0]}-{row[1].timestamp():.6f}" if row else '0'
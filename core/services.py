@@ -1,17 +1,29 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
+import time
+from collections import deque
+from .metrics import span, stage_seconds
+
+# Bump whenever the prompt template below changes; cached explanations are keyed on it
+PROMPT_VERSION = 1
 
 class OllamaService:
     def __init__(self):
-        self.base_url = "http://localhost:11434"
-        self.model = "llama3.2"  # Change to "phi3.5" or "mistral" if you downloaded those
+        self.base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
+        self.model = os.getenv("OLLAMA_MODEL", "llama3.2")  # Change to "phi3.5" or "mistral" if you downloaded those
+        self.ttft_ms = deque(maxlen=500)  # time to first token of recent streamed explanations
+        # One pooled session so concurrent explanations reuse keep-alive connections. It is a
+        # blocking client: the explanation views and pipeline threads are synchronous, and the
+        # project has no async HTTP client dependency.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=int(os.getenv("OLLAMA_POOL_SIZE", "16")))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
-    def generate_explanation(self, user_context, movie_context):
-        """Generate a natural language explanation using local Ollama LLM"""
-        
-        # Create context-aware prompt
-        prompt = f"""You are a helpful movie recommendation assistant. Based on the user's movie preferences, explain why they might enjoy this specific movie.
+    def build_prompt(self, user_context, movie_context):
+        return f"""You are a helpful movie recommendation assistant. Based on the user's movie preferences, explain why they might enjoy this specific movie.
 
 User's rating history and preferences:
 {user_context}
@@ -20,23 +32,51 @@ Movie information:
 {movie_context}
 
 Provide a complete, natural explanation of why this movie would appeal to this user in exactly 40 words. Be conversational and personal, as if you know their taste well, focusing on patterns in their ratings and what makes this movie a good match. End with proper punctuation."""
-        
-        payload = {
+    
+    def build_payload(self, user_context, movie_context, stream):
+        return {
             "model": self.model,
-            "prompt": prompt,
-            "stream": False,
+            "prompt": self.build_prompt(user_context, movie_context),
+            "stream": stream,
             "options": {
                 "temperature": 0.7,
                 "num_predict": 80  # Max tokens to generate
             }
         }
+    
+    def postprocess(self, explanation):
+        """Enforce the ~40-word length and a closing punctuation mark"""
+        words = explanation.split()
+        if len(words) > 45:
+            # Truncate to 40 words
+            explanation = " ".join(words[:40])
+            # Try to end at a sentence boundary
+            if '.' in explanation:
+                last_period = explanation.rfind('.')
+                if last_period > len(explanation) * 0.7:
+                    explanation = explanation[:last_period + 1]
+            else:
+                explanation += "..."
+        
+        # Ensure it ends with punctuation
+        if not explanation.endswith(('.', '!', '?', '...')):
+            explanation += "."
+        return explanation
+    
+    def generate_explanation(self, user_context, movie_context):
+        """Generate a natural language explanation using local Ollama LLM"""
+        with span('llm.generate'):
+            return self._generate(user_context, movie_context)
+    
+    def _generate(self, user_context, movie_context):
+        payload = self.build_payload(user_context, movie_context, stream=False)
         
         try:
             print(f"🔍 Calling local Ollama LLM...")
             print(f"🌐 Ollama URL: {self.base_url}/api/generate")
             print(f"🤖 Model: {self.model}")
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/generate",
                 json=payload,
                 timeout=60  # Ollama can be slower on first run
@@ -55,23 +95,7 @@ Provide a complete, natural explanation of why this movie would appeal to this u
                 explanation = data['response'].strip()
                 print(f"✅ LLM raw response: {explanation[:200]}...")
                 
-                # Post-process to enforce ~40-word count
-                words = explanation.split()
-                if len(words) > 45:
-                    # Truncate to 40 words
-                    explanation = " ".join(words[:40])
-                    # Try to end at a sentence boundary
-                    if '.' in explanation:
-                        last_period = explanation.rfind('.')
-                        if last_period > len(explanation) * 0.7:
-                            explanation = explanation[:last_period + 1]
-                    else:
-                        explanation += "..."
-                
-                # Ensure it ends with punctuation
-                if not explanation.endswith(('.', '!', '?', '...')):
-                    explanation += "."
-                
+                explanation = self.postprocess(explanation)
                 word_count = len(explanation.split())
                 print(f"✅ Final explanation ({word_count} words): {explanation}")
                 return explanation
@@ -95,6 +119,57 @@ Provide a complete, natural explanation of why this movie would appeal to this u
             import traceback
             traceback.print_exc()
             return None
+    
+    def stream_explanation(self, user_context, movie_context):
+        """
+        Stream the explanation as Ollama generates it (NDJSON, one chunk per line).
+        Yields ("token", text) for every chunk, then one ("done", info) where info
+        holds the post-processed explanation (None on failure), ttft_ms and total_ms.
+        """
+        payload = self.build_payload(user_context, movie_context, stream=True)
+        started = time.perf_counter()
+        ttft = None
+        parts = []
+        
+        try:
+            print(f"🔍 Streaming from local Ollama LLM ({self.model})...")
+            with self.session.post(f"{self.base_url}/api/generate", json=payload, stream=True, timeout=(5, 60)) as response:
+                if response.status_code != 200:
+                    print(f"❌ Ollama API error: {response.status_code}")
+                    print(f"❌ Error details: {response.text}")
+                else:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get('error'):
+                            print(f"❌ Ollama stream error: {chunk['error']}")
+                            break
+                        token = chunk.get('response', '')
+                        if token:
+                            if ttft is None:
+                                ttft = (time.perf_counter() - started) * 1000
+                                self.ttft_ms.append(ttft)
+                                stage_seconds.observe(ttft / 1000, 'llm.first_token')
+                                print(f"⚡ First token after {ttft:.0f}ms")
+                            parts.append(token)
+                            yield "token", token
+                        if chunk.get('done'):
+                            break
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"❌ Ollama streaming failed: {type(e).__name__}: {str(e)}")
+        
+        text = "".join(parts).strip()
+        explanation = self.postprocess(text) if text else None
+        total = (time.perf_counter() - started) * 1000
+        stage_seconds.observe(total / 1000, 'llm.stream')
+        if explanation:
+            print(f"✅ Streamed explanation ({len(explanation.split())} words) in {total:.0f}ms")
+        yield "done", {
+            "explanation": explanation,
+            "ttft_ms": round(ttft, 1) if ttft is not None else None,
+            "total_ms": round(total, 1)
+        }
 
 # Global instance - using Ollama instead of OpenRouter
-openrouter_service = OllamaService()  # Keep same name so views.py doesn't need changes
\ No newline at end of file
+openrouter_service = OllamaService()  # Keep same name so views.py doesn't need changes
\ No newline at end of file
@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from .features import fill
+from .models import Movie, Rating
+
+
+@receiver(pre_save, sender=Movie)
+def movie_saving(sender, instance, **kwargs):
+    # Keep the precomputed text features in step with title/overview
+    fill(instance)
+
+
+@receiver([post_save, post_delete], sender=Movie)
+def movie_changed(sender, instance, **kwargs):
+    from .catalog_stats import touch
+    touch()
+
+
+def ratings_changed(user_id, added=None):
+    """
+    Follow-up work after a user's ratings change: update their profile (in place
+    for one new (movie, value), rebuilt otherwise), drop their cached explanations
+    and rankings, and queue explanations for their new top cards once the write
+    commits. Writes that skip the Rating signals (bulk upserts) call it once per batch.
+    """
+    from . import profiles
+    from .explain_cache import invalidate_user
+    from recs import rec_cache
+    from recs.explain_worker import worker
+    if added is not None:
+        profiles.apply_rating(user_id, *added)
+    else:
+        profiles.rebuild(user_id)
+    # A user's explanations and cached rankings were made for their previous rating profile
+    invalidate_user(user_id)
+    rec_cache.invalidate_user(user_id)
+    transaction.on_commit(lambda: worker.enqueue_top(user_id))
+
+
+@receiver([post_save, post_delete], sender=Rating)
+def rating_changed(sender, instance, created=False, **kwargs):
+    if instance.user_id is not None:
+        ratings_changed(instance.user_id, (instance.movie_id, instance.value) if created else None)
@@ -0,0 +1,17 @@
+"""
+SQLite backend whose transactions take the write lock up front (BEGIN IMMEDIATE)
+
+Django opens transactions with a plain (deferred) BEGIN. A deferred transaction
+that reads and then writes, as update_or_create and the profile updates do,
+fails with "database is locked" without waiting for the busy timeout when
+another connection committed in between. BEGIN IMMEDIATE waits for the lock
+instead. The read-only alias keeps deferred transactions. The production
+DB_PROFILE uses this engine.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        from core.db import READ_ALIAS
+        self.cursor().execute('BEGIN' if self.alias == READ_ALIAS else 'BEGIN IMMEDIATE')
@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from . import explain_cache
+from .models import Movie, UserProfile
+
+
+class ExplanationCacheKeyTests(TestCase):
+    def key_for(self, user, movie_key):
+        # Built the way natural_explanation and the precompute worker build it
+        return explain_cache.cache_key(user.id, movie_key, explain_cache.profile_hash(user.id), 'model', 1)
+
+    def test_users_without_profiles_do_not_share_explanations(self):
+        movie = Movie.objects.create(tmdb_id=1, title='Heat')
+        alice, bob = User.objects.create(username='alice'), User.objects.create(username='bob')
+        self.assertFalse(UserProfile.objects.filter(user__in=[alice, bob]).exists())
+        movie_key = f"movie:{movie.id}"
+
+        explain_cache.put(alice.id, self.key_for(alice, movie_key), {'explanation': 'for alice'}, movie_key, 'model', 1)
+        explain_cache.memory.clear()
+
+        self.assertNotEqual(self.key_for(alice, movie_key), self.key_for(bob, movie_key))
+        self.assertIsNone(explain_cache.get(bob.id, self.key_for(bob, movie_key)))
+        self.assertFalse(explain_cache.contains(bob.id, self.key_for(bob, movie_key)))
+        self.assertEqual(explain_cache.get(alice.id, self.key_for(alice, movie_key)), {'explanation': 'for alice'})
@@ -0,0 +1,7 @@
+from django.http import HttpResponse
+from . import metrics
+
+
+def metrics_view(request):
+    """Prometheus text exposition of this process's metrics"""
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -7,15 +7,36 @@ SECRET_KEY=os.getenv("SECRET_KEY","dev")
 DEBUG=bool(int(os.getenv("DEBUG","1")))
 ALLOWED_HOSTS=[h.strip() for h in os.getenv("ALLOWED_HOSTS","").split(",") if h]
 INSTALLED_APPS=['django.contrib.admin','django.contrib.auth','django.contrib.contenttypes','django.contrib.sessions','django.contrib.messages','django.contrib.staticfiles','rest_framework','channels','accounts','core','recs','rag','ui']
-MIDDLEWARE=['django.middleware.security.SecurityMiddleware','django.contrib.sessions.middleware.SessionMiddleware','django.middleware.common.CommonMiddleware','django.middleware.csrf.CsrfViewMiddleware','django.contrib.auth.middleware.AuthenticationMiddleware','django.contrib.messages.middleware.MessageMiddleware','django.middleware.clickjacking.XFrameOptionsMiddleware']
+MIDDLEWARE=['core.metrics.MetricsMiddleware','django.middleware.security.SecurityMiddleware','django.contrib.sessions.middleware.SessionMiddleware','django.middleware.common.CommonMiddleware','django.middleware.csrf.CsrfViewMiddleware','django.contrib.auth.middleware.AuthenticationMiddleware','django.contrib.messages.middleware.MessageMiddleware','django.middleware.clickjacking.XFrameOptionsMiddleware']
 ROOT_URLCONF='project.urls'
 TEMPLATES=[{'BACKEND':'django.template.backends.django.DjangoTemplates','DIRS':[BASE_DIR/'templates'],'APP_DIRS':True,'OPTIONS':{'context_processors':['django.template.context_processors.debug','django.template.context_processors.request','django.contrib.auth.context_processors.auth','django.contrib.messages.context_processors.messages']}}]
 WSGI_APPLICATION='project.wsgi.application'; ASGI_APPLICATION='project.asgi.application'
-DATABASES={'default': {'ENGINE':'django.db.backends.sqlite3','NAME': BASE_DIR/'db.sqlite3'}}
+DB_PROFILE=os.getenv('DB_PROFILE','dev')  # 'production': WAL and tuned pragmas, busy timeout, persistent connections, read-only alias (core.db)
+SQLITE_PRAGMAS={'journal_mode':'wal','synchronous':'normal','mmap_size':int(os.getenv('SQLITE_MMAP_MB','256'))*2**20,'cache_size':-int(os.getenv('SQLITE_CACHE_MB','64'))*1024,'temp_store':'memory'} if DB_PROFILE=='production' else {}
+def sqlite_databases(name):
+    """DATABASES for one SQLite file under DB_PROFILE"""
+    db={'ENGINE':'django.db.backends.sqlite3','NAME': name}
+    if DB_PROFILE!='production': return {'default': db}
+    db.update(ENGINE='core.sqlite_backend', OPTIONS={'timeout':float(os.getenv('SQLITE_BUSY_TIMEOUT','20'))}, CONN_MAX_AGE=int(os.getenv('DB_CONN_MAX_AGE','600')), CONN_HEALTH_CHECKS=True)
+    return {'default': db, 'readonly': {**db,'TEST':{'MIRROR':'default'}}}  # same file, opened query_only
+DATABASES=sqlite_databases(BASE_DIR/'db.sqlite3'); DATABASE_ROUTERS=['core.db.ReadWriteRouter']
 AUTH_PASSWORD_VALIDATORS=[]; LANGUAGE_CODE='en-us'; TIME_ZONE='Asia/Kolkata'; USE_I18N=True; USE_TZ=True
 STATIC_URL='/static/'; STATICFILES_DIRS=[BASE_DIR/'static']; DEFAULT_AUTO_FIELD='django.db.models.BigAutoField'
 REST_FRAMEWORK={'DEFAULT_PERMISSION_CLASSES':['rest_framework.permissions.AllowAny']}
-TMDB_API_KEY=os.getenv('TMDB_API_KEY',''); MODEL_DIR=str(BASE_DIR/'models'); os.makedirs(MODEL_DIR, exist_ok=True)
+TMDB_API_KEY=os.getenv('TMDB_API_KEY',''); TMDB_BASE_URL=os.getenv('TMDB_BASE_URL','https://api.themoviedb.org/3'); MODEL_DIR=str(BASE_DIR/'models'); os.makedirs(MODEL_DIR, exist_ok=True)
+TMDB_CACHE_SIZE=int(os.getenv('TMDB_CACHE_SIZE','2048')); TMDB_CACHE_DB=os.getenv('TMDB_CACHE_DB', os.path.join(MODEL_DIR,'tmdb_cache.sqlite3'))  # '' disables the on-disk cache
+DISCOVER_SOURCE=os.getenv('DISCOVER_SOURCE','tmdb')  # /api/discover/: tmdb (local catalog on failure), local, or auto (local first)
+EXPLANATION_CACHE_MAX_ROWS=int(os.getenv('EXPLANATION_CACHE_MAX_ROWS','5000')); EXPLANATION_CACHE_MEMORY=int(os.getenv('EXPLANATION_CACHE_MEMORY','512'))
+EXPLAIN_WORKERS=int(os.getenv('EXPLAIN_WORKERS','8')); EXPLAIN_STAGE_TIMEOUTS={'xai':float(os.getenv('EXPLAIN_XAI_TIMEOUT','5')),'rag':float(os.getenv('EXPLAIN_RAG_TIMEOUT','2')),'user':float(os.getenv('EXPLAIN_USER_TIMEOUT','2'))}  # seconds per stage
+EXPLAIN_STAGE_OVERRUNS=int(os.getenv('EXPLAIN_STAGE_OVERRUNS','2'))  # abandoned runs of one stage allowed to keep a pool thread; more skip the stage
+EXPLAIN_PRECOMPUTE_TOP=int(os.getenv('EXPLAIN_PRECOMPUTE_TOP','12')); EXPLAIN_PRECOMPUTE_WORKERS=int(os.getenv('EXPLAIN_PRECOMPUTE_WORKERS','1')); EXPLAIN_PRECOMPUTE_QUEUE=int(os.getenv('EXPLAIN_PRECOMPUTE_QUEUE','500'))  # TOP=0 disables
+EXPLAIN_BATCH_MAX=int(os.getenv('EXPLAIN_BATCH_MAX','100'))  # movies per /api/explain/batch/ request
+REC_CACHE_SIZE=int(os.getenv('REC_CACHE_SIZE','4096')); REC_CACHE_BACKEND=os.getenv('REC_CACHE_BACKEND',''); REC_CACHE_TTL=int(os.getenv('REC_CACHE_TTL','3600'))  # ranked ids per user; BACKEND names a CACHES alias shared by workers ('' = in-process only)
+CHANNEL_LAYERS={'default':{'BACKEND':'channels.layers.InMemoryChannelLayer'}}  # single process; use a shared layer (e.g. channels_redis) for several workers
+RATINGS_WS_DEBOUNCE=float(os.getenv('RATINGS_WS_DEBOUNCE','0.75')); RATINGS_WS_MAX_WAIT=float(os.getenv('RATINGS_WS_MAX_WAIT','3')); RATINGS_WS_MAX_BATCH=int(os.getenv('RATINGS_WS_MAX_BATCH','50'))  # ws/ratings/ batching (seconds, ratings)
+RAG_INDEX_DIR=os.getenv('RAG_INDEX_DIR', os.path.join(MODEL_DIR,'rag_index'))
+RAG_BACKEND=os.getenv('RAG_BACKEND','exact')  # 'exact' or 'ivf' (approximate)
+RAG_IVF={'n_lists':int(os.getenv('RAG_IVF_LISTS','0')) or None,'n_probe':int(os.getenv('RAG_IVF_PROBE','8')),'centroid_terms':int(os.getenv('RAG_IVF_TERMS','256'))}
 LOGIN_REDIRECT_URL='ui:app'
 LOGOUT_REDIRECT_URL = '/'
 
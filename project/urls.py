@@ -2,11 +2,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
 from accounts.views import LogoutGetView
+from core.views import metrics_view
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
+    path('api/metrics', metrics_view),
     path('api/', include('recs.api_urls')),
     path('api/rag/', include('rag.api_urls')),
 
@@ -0,0 +1,189 @@
+"""
+Search backends for the RAG store
+
+`exact` scores every document (brute-force cosine, the default).
+`ivf` is an inverted-file index built with NumPy/SciPy only: documents are
+clustered with spherical k-means whose centroids are truncated to their
+heaviest terms (a sparse coarse quantizer in the original TF-IDF space), and
+a query only re-ranks the documents in the `n_probe` clusters closest to it.
+Re-ranking uses the original rows, so scores are exact; only recall is
+approximate.
+
+Knobs (settings.RAG_IVF):
+    n_lists         number of clusters (default ~4*sqrt(N)); more lists = fewer candidates
+    n_probe         clusters scanned per query; higher = better recall, slower
+    centroid_terms  non-zero terms kept per centroid; higher = better routing, slower
+"""
+import os, json, time
+import numpy as np
+import scipy.sparse as sp
+
+
+class ExactBackend:
+    name = 'exact'
+
+    def fit(self, X):
+        return self
+
+    def candidates(self, qv):
+        return None  # every base row
+
+    def save(self, path):
+        pass
+
+    def load(self, path, n_rows):
+        return True
+
+
+class IVFBackend:
+    name = 'ivf'
+
+    def __init__(self, n_lists=None, n_probe=8, centroid_terms=256, train_size=20000, iters=8, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.centroid_terms = centroid_terms
+        self.train_size = train_size
+        self.iters = iters
+        self.seed = seed
+        self.centroids = None  # CSR, one unit-length sparse row per list
+        self.order = None      # base row ids grouped by list
+        self.offsets = None    # list l spans order[offsets[l]:offsets[l+1]]
+
+    def _truncate(self, C):
+        """Keep the heaviest `centroid_terms` entries of each row and renormalize"""
+        C = sp.csr_matrix(C, dtype=np.float32)
+        m = self.centroid_terms
+        data, indices, indptr = [], [], [0]
+        for r in range(C.shape[0]):
+            lo, hi = C.indptr[r], C.indptr[r + 1]
+            d, ix = C.data[lo:hi], C.indices[lo:hi]
+            if len(d) > m:
+                keep = np.argpartition(-d, m - 1)[:m]
+                d, ix = d[keep], ix[keep]
+            norm = np.linalg.norm(d)
+            data.append(d / norm if norm else d)
+            indices.append(ix)
+            indptr.append(indptr[-1] + len(d))
+        return sp.csr_matrix((np.concatenate(data), np.concatenate(indices), np.array(indptr)), shape=C.shape)
+
+    def _assign(self, X, chunk=20000):
+        out = np.empty(X.shape[0], dtype=np.int64)
+        CT = self.centroids.T.tocsc()
+        for start in range(0, X.shape[0], chunk):
+            out[start:start + chunk] = np.asarray(X[start:start + chunk].dot(CT).argmax(axis=1)).ravel()
+        return out
+
+    def _kmeans(self, X, n_lists):
+        rng = np.random.default_rng(self.seed)
+        # Enough training rows per list for stable centroids
+        size = min(X.shape[0], max(self.train_size, 32 * n_lists))
+        sample = X[np.sort(rng.choice(X.shape[0], size, replace=False))]
+        C = self._truncate(sample[rng.choice(sample.shape[0], n_lists, replace=False)])
+        for _ in range(self.iters):
+            assign = np.asarray(sample.dot(C.T).argmax(axis=1)).ravel()
+            members = sp.csr_matrix((np.ones(len(assign), dtype=np.float32), (assign, np.arange(len(assign)))),
+                                    shape=(n_lists, sample.shape[0]))
+            sums = members.dot(sample).tocsr()
+            empty = np.flatnonzero(np.bincount(assign, minlength=n_lists) == 0)
+            if len(empty):
+                # Re-seed empty lists from random documents
+                sums = sp.lil_matrix(sums)
+                for l, r in zip(empty, rng.choice(sample.shape[0], len(empty))):
+                    sums[l] = sample[r]
+            C = self._truncate(sums)
+        return C
+
+    def fit(self, X):
+        t0 = time.time()
+        n = X.shape[0]
+        n_lists = min(n, self.n_lists or max(1, int(4 * np.sqrt(n))))
+        if n == 0:
+            self.centroids = sp.csr_matrix((0, X.shape[1]), dtype=np.float32)
+            self.order = np.empty(0, dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return self
+        self.centroids = self._kmeans(X, n_lists)
+        assign = self._assign(X)
+        self.order = np.argsort(assign, kind='stable')
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+        print(f"✅ IVF index built: {n} docs, {n_lists} lists in {time.time() - t0:.2f}s")
+        return self
+
+    def candidates(self, qv):
+        n_lists = self.centroids.shape[0]
+        if not n_lists:
+            return np.empty(0, dtype=np.int64)
+        sims = np.asarray(self.centroids.dot(qv.T).todense()).ravel()
+        n_probe = min(self.n_probe, n_lists)
+        probes = np.argpartition(-sims, n_probe - 1)[:n_probe]
+        return np.sort(np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in probes]))
+
+    def save(self, path):
+        C = self.centroids
+        np.save(os.path.join(path, 'ann_centroid_data.npy'), C.data)
+        np.save(os.path.join(path, 'ann_centroid_indices.npy'), C.indices)
+        np.save(os.path.join(path, 'ann_centroid_indptr.npy'), C.indptr)
+        np.save(os.path.join(path, 'ann_order.npy'), self.order)
+        np.save(os.path.join(path, 'ann_offsets.npy'), self.offsets)
+        with open(os.path.join(path, 'ann_meta.json'), 'w') as f:
+            json.dump({'backend': self.name, 'n_lists': int(C.shape[0]), 'n_features': int(C.shape[1]),
+                       'centroid_terms': self.centroid_terms, 'seed': self.seed}, f)
+
+    def load(self, path, n_rows):
+        """Reuse lists saved next to the base segment; False if absent or built with other settings"""
+        try:
+            with open(os.path.join(path, 'ann_meta.json')) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, TypeError):
+            return False
+        if (meta['centroid_terms'], meta['seed']) != (self.centroid_terms, self.seed):
+            return False
+        if self.n_lists and self.n_lists != meta['n_lists']:
+            return False
+        order = np.load(os.path.join(path, 'ann_order.npy'), mmap_mode='r')
+        if len(order) != n_rows:
+            return False
+        parts = [np.load(os.path.join(path, f'ann_centroid_{p}.npy')) for p in ('data', 'indices', 'indptr')]
+        self.centroids = sp.csr_matrix(tuple(parts), shape=(meta['n_lists'], meta['n_features']))
+        self.order = order
+        self.offsets = np.load(os.path.join(path, 'ann_offsets.npy'))
+        return True
+
+
+BACKENDS = {'exact': ExactBackend, 'ivf': IVFBackend}
+
+
+def make_backend(name='exact', **options):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown RAG backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options) if name != 'exact' else ExactBackend()
+
+
+def measure_recall(store, queries, k=5, exact_store=None):
+    """
+    Mean recall@k of `store` against exact search over the same index,
+    plus mean per-query latency (ms) for both.
+    """
+    from .embeddings import Store
+    if exact_store is None:
+        exact_store = Store(path=store.path, backend='exact')
+        exact_store.index, exact_store.version = store.index, store.version
+
+    recalls, t_ann, t_exact = [], 0.0, 0.0
+    for q in queries:
+        t0 = time.perf_counter()
+        truth = {i for i, _ in exact_store.search(q, k=k)}
+        t1 = time.perf_counter()
+        got = {i for i, _ in store.search(q, k=k)}
+        t2 = time.perf_counter()
+        t_exact += t1 - t0; t_ann += t2 - t1
+        if truth:
+            recalls.append(len(truth & got) / len(truth))
+    n = max(1, len(queries))
+    return {
+        'k': k,
+        'queries': len(queries),
+        'recall': round(float(np.mean(recalls)) if recalls else 0.0, 4),
+        'latency_ms': round(1000 * t_ann / n, 3),
+        'exact_latency_ms': round(1000 * t_exact / n, 3),
+    }
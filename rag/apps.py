@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class RagConfig(AppConfig):
+    name = 'rag'
+
+    def ready(self):
+        # Memory-map a prebuilt index at startup so the first search is not a full build
+        from .embeddings import store
+        store.load()
@@ -1,53 +1,150 @@
 """
 Enhanced RAG system with proactive context retrieval
 """
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import NearestNeighbors
-from core.models import Movie
+import threading
 import numpy as np
+from django.conf import settings
+from core.models import Movie
+from .index import RagIndex, current_version
+from .ann import make_backend
+from core.metrics import traced
+
+
+def movie_document(title, overview):
+    return (title or '') + ' ' + (overview or '')
+
 
 class Store:
-    def __init__(self):
-        self.vec = TfidfVectorizer(max_features=20000, ngram_range=(1, 2), stop_words='english')
-        self.nn = None
-        self.ids = []
-        self.X = None
+    def __init__(self, path=None, backend=None, **options):
+        self.path = path or settings.RAG_INDEX_DIR
+        self.index = None
+        self.version = None
+        self._lock = threading.Lock()
+        backend = backend or settings.RAG_BACKEND
+        if backend == 'ivf' and not options:
+            options = settings.RAG_IVF
+        self.backend = make_backend(backend, **options)
+        self._backend_base = None
+    
+    def _attach_backend(self):
+        """(Re)index the base segment in the search backend when it changed"""
+        base_X = self.index.base_X
+        if self._backend_base is base_X:
+            return
+        if not self.backend.load(self.index.source, base_X.shape[0]):
+            self.backend.fit(base_X)
+        self._backend_base = base_X
     
-    def build(self):
+    def _publish(self):
+        self.version = self.index.save(self.path, on_write=self._save_lists)
+    
+    def _save_lists(self, path):
+        """
+        Persist IVF lists for a newly published base segment, whatever backend this
+        process searches with, so IVF workers load them instead of each refitting
+        """
+        backend = self.backend
+        if backend.name != 'ivf':
+            backend = make_backend('ivf', **settings.RAG_IVF).fit(self.index.base_X)
+        backend.save(path)
+    
+    @traced('rag.build')
+    def build(self, save=False):
         """Build the TF-IDF index from all movies"""
-        texts = []
-        ids = []
-        
-        for m in Movie.objects.all():
-            text = (m.title or '') + ' ' + (m.overview or '')
-            texts.append(text)
-            ids.append(m.id)
+        docs = [(mid, movie_document(title, overview))
+                for mid, title, overview in Movie.objects.values_list('id', 'title', 'overview')]
         
-        if not texts:
+        if not docs:
             print("⚠️ No movies found for RAG indexing")
             return
         
         try:
-            self.X = self.vec.fit_transform(texts)
-            self.nn = NearestNeighbors(n_neighbors=min(10, len(texts)), metric='cosine')
-            self.nn.fit(self.X)
-            self.ids = ids
-            print(f"✅ RAG index built with {len(texts)} movies")
+            self.index = RagIndex.build(docs)
+            self._attach_backend()
+            self.version = None
+            if save:
+                self._publish()
+            print(f"✅ RAG index built with {len(docs)} movies")
         except Exception as e:
             print(f"❌ RAG build failed: {e}")
     
+    def load(self):
+        """Memory-map the published on-disk index, if there is one"""
+        try:
+            index, version = RagIndex.load(self.path)
+        except Exception as e:
+            print(f"❌ RAG index load failed: {e}")
+            return False
+        if index is None:
+            return False
+        self.index, self.version = index, version
+        self._attach_backend()
+        print(f"✅ RAG index {version} loaded with {len(index)} movies")
+        return True
+    
+    def refresh(self):
+        """Pick up a newer on-disk version published by another process"""
+        version = current_version(self.path)
+        if version and version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self.load()
+    
+    def upsert(self, movie_ids, save=True):
+        """Add or replace documents for the given movies without a full rebuild"""
+        if self.index is None and not self.load():
+            self.build(save=save)
+            return
+        docs = [(mid, movie_document(title, overview))
+                for mid, title, overview in Movie.objects.filter(id__in=list(movie_ids)).values_list('id', 'title', 'overview')]
+        with self._lock:
+            self.index = self.index.upsert(docs)
+            if save:
+                self._publish()
+        print(f"✅ RAG index updated with {len(docs)} movies")
+    
+    def compact(self):
+        """Merge appended rows into the base segment and re-index it"""
+        with self._lock:
+            self.index = self.index.compact()
+            self._attach_backend()
+            self._publish()
+    
+    def _ensure(self):
+        if self.index is None:
+            with self._lock:
+                if self.index is None and not self.load():
+                    self.build()
+        else:
+            self.refresh()
+        return self.index
+    
+    @traced('rag.search')
     def search(self, q, k=5):
         """Search for similar movies using cosine similarity"""
-        if not self.nn:
-            self.build()
+        return self._search(lambda index: index.transform([q]), k)
+    
+    @traced('rag.search')
+    def search_terms(self, counts, k=5):
+        """Search with a row of hashed term counts (e.g. a UserProfile centroid) instead of text"""
+        return self._search(lambda index: index.weight(counts), k)
+    
+    def _search(self, query_vector, k):
+        index = self._ensure()
         
-        if not self.nn:
+        if index is None or not len(index):
             return []
         
         try:
-            qv = self.vec.transform([q])
-            dist, idx = self.nn.kneighbors(qv, n_neighbors=min(k, len(self.ids)))
-            return [(self.ids[i], 1 - float(d)) for i, d in zip(idx[0], dist[0])]
+            qv = query_vector(index)
+            ids, scores = index.scores(qv, base_rows=self.backend.candidates(qv))
+            if not len(ids):
+                return []
+            k = min(k, len(ids))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            top = top[np.isfinite(scores[top])]  # superseded rows
+            return [(int(ids[i]), float(scores[i])) for i in top]
         except Exception as e:
             print(f"RAG search failed: {e}")
             return []
@@ -94,20 +191,17 @@ class Store:
         Returns movies similar to what the user liked
         """
         try:
-            from core.models import Rating
+            from core.profiles import get_profile, decode_centroid
             
-            user_ratings = Rating.objects.filter(user_id=user_id, value__gte=4)
-            if not user_ratings.exists():
+            profile = get_profile(user_id)
+            if not profile.high_ratings or not profile.centroid:
                 return []
             
-            # Build query from liked movies
-            liked_movies = [r.movie for r in user_ratings[:5]]
-            query_parts = []
-            for movie in liked_movies:
-                query_parts.append(f"{movie.title} {movie.overview or ''}")
-            
-            query = " ".join(query_parts)
-            hits = self.search(query, k=k)
+            # Query with the term centroid of every liked movie
+            index = self._ensure()
+            if index is None:
+                return []
+            hits = self.search_terms(decode_centroid(profile.centroid, index.n_features), k=k)
             
             # Get movie details
             movie_ids = [mid for mid, _ in hits]
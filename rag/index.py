@@ -0,0 +1,215 @@
+"""
+On-disk TF-IDF index for the RAG store
+
+Documents are featurized with a stateless HashingVectorizer, so new or changed
+movies can be added without refitting the corpus. IDF weights are frozen at
+build time; a periodic full rebuild refreshes them.
+
+Layout of the index directory:
+    CURRENT                 name of the live version directory
+    <version>/meta.json     featurizer settings and document counts
+    <version>/idf.npy       frozen IDF weight per hashed feature
+    <version>/base_*.npy    CSR arrays + id map of the last full build
+    <version>/delta_*.npy   rows appended or replaced since that build
+    <version>/ann_*         IVF lists of the base segment (see rag.ann)
+
+Versions are written to a fresh directory and published by atomically
+replacing CURRENT, so readers never see a half-written index. Unchanged
+base segments, and the IVF lists built for them, are hard-linked between
+versions instead of copied.
+"""
+import os, json, time, shutil
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+
+N_FEATURES = 2 ** 18
+FORMAT = 1
+_CSR_PARTS = ('data', 'indices', 'indptr', 'ids')
+
+
+def make_featurizer(n_features=N_FEATURES):
+    return HashingVectorizer(n_features=n_features, ngram_range=(1, 2), stop_words='english',
+                             alternate_sign=False, norm=None)
+
+
+def _normalize(X):
+    X = sp.csr_matrix(X, dtype=np.float32)
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.csr_matrix(sp.diags(1.0 / norms).dot(X), dtype=np.float32)
+
+
+def _empty(n_features):
+    return sp.csr_matrix((0, n_features), dtype=np.float32)
+
+
+class RagIndex:
+    """Immutable base + delta segments; updates return a new RagIndex"""
+
+    def __init__(self, idf, base_ids, base_X, delta_ids=None, delta_X=None, source=None):
+        self.idf = idf
+        self.n_features = idf.shape[0]
+        self.featurizer = make_featurizer(self.n_features)
+        self.base_ids = base_ids
+        self.base_X = base_X
+        self.delta_ids = delta_ids if delta_ids is not None else np.empty(0, dtype=np.int64)
+        self.delta_X = delta_X if delta_X is not None else _empty(self.n_features)
+        self.source = source  # version dir the base segment was loaded from
+        # Base rows whose id was re-indexed in the delta are superseded
+        self.base_alive = ~np.isin(self.base_ids, self.delta_ids)
+
+    def __len__(self):
+        return int(self.base_alive.sum()) + len(self.delta_ids)
+
+    @classmethod
+    def build(cls, docs, n_features=N_FEATURES):
+        """Fit IDF and featurize the full corpus; docs is an iterable of (id, text)"""
+        docs = list(docs)
+        ids = np.array([d[0] for d in docs], dtype=np.int64)
+        counts = make_featurizer(n_features).transform([d[1] for d in docs]).tocsc()
+        df = np.diff(counts.indptr)
+        # Same smoothing as TfidfVectorizer(smooth_idf=True)
+        idf = (np.log((1 + len(docs)) / (1 + df)) + 1).astype(np.float32)
+        X = _normalize(counts.tocsr().dot(sp.diags(idf)))
+        return cls(idf, ids, X)
+
+    def transform(self, texts):
+        """TF-IDF rows (unit length) for texts using the frozen IDF"""
+        return self.weight(self.featurizer.transform(texts))
+
+    def weight(self, counts):
+        """TF-IDF rows (unit length) for raw hashed term counts"""
+        return _normalize(counts.dot(sp.diags(self.idf)))
+
+    def upsert(self, docs):
+        """Return a new index with docs appended, replacing any existing rows for their ids"""
+        docs = list(docs)
+        if not docs:
+            return self
+        new_ids = np.array([d[0] for d in docs], dtype=np.int64)
+        new_X = self.transform([d[1] for d in docs])
+        keep = ~np.isin(self.delta_ids, new_ids)
+        delta_ids = np.concatenate([self.delta_ids[keep], new_ids])
+        delta_X = sp.vstack([self.delta_X[np.flatnonzero(keep)], new_X], format='csr', dtype=np.float32)
+        return RagIndex(self.idf, self.base_ids, self.base_X, delta_ids, delta_X, source=self.source)
+
+    def compact(self):
+        """Fold the delta into the base segment (IDF stays frozen)"""
+        alive = np.flatnonzero(self.base_alive)
+        ids = np.concatenate([self.base_ids[alive], self.delta_ids])
+        X = sp.vstack([self.base_X[alive], self.delta_X], format='csr', dtype=np.float32)
+        return RagIndex(self.idf, ids, X)
+
+    def live_ids(self):
+        return np.concatenate([self.base_ids[self.base_alive], self.delta_ids])
+
+    def ids_and_matrix(self):
+        """Live ids and their rows as one matrix (used by search backends)"""
+        alive = np.flatnonzero(self.base_alive)
+        if len(alive) == len(self.base_ids) and not len(self.delta_ids):
+            return self.base_ids, self.base_X
+        ids = np.concatenate([self.base_ids[alive], self.delta_ids])
+        X = sp.vstack([self.base_X[alive], self.delta_X], format='csr', dtype=np.float32)
+        return ids, X
+
+    def scores(self, qv, base_rows=None):
+        """
+        Cosine similarity of the query row against live documents: every base
+        row, or only `base_rows` when a search backend pre-selected candidates.
+        Delta rows are always scored exactly.
+        """
+        q = np.asarray(qv.todense(), dtype=np.float32).ravel()
+        if base_rows is None:
+            base, base_ids, alive = self.base_X.dot(q), self.base_ids, self.base_alive
+        else:
+            base, base_ids, alive = self.base_X[base_rows].dot(q), self.base_ids[base_rows], self.base_alive[base_rows]
+        base[~alive] = -np.inf
+        ids = np.concatenate([base_ids, self.delta_ids])
+        return ids, np.concatenate([base, self.delta_X.dot(q)])
+
+    # ---- persistence -------------------------------------------------------
+
+    def save(self, root, on_write=None):
+        """
+        Write a new version directory under root and publish it.
+        on_write(path) adds the base segment's search backend lists (ann_*) before
+        publishing. It is skipped when a reused base brings its lists along.
+        """
+        os.makedirs(root, exist_ok=True)
+        version = f"v{time.time_ns()}"
+        path = os.path.join(root, version)
+        os.makedirs(path)
+
+        if self.source and os.path.isdir(self.source):
+            ann = sorted(n for n in os.listdir(self.source) if n.startswith('ann_'))
+            for name in [f"base_{part}.npy" for part in _CSR_PARTS] + ann:
+                os.link(os.path.join(self.source, name), os.path.join(path, name))
+        else:
+            ann = []
+            _save_csr(path, 'base', self.base_ids, self.base_X)
+        _save_csr(path, 'delta', self.delta_ids, self.delta_X)
+        np.save(os.path.join(path, 'idf.npy'), self.idf)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'format': FORMAT, 'n_features': self.n_features, 'base_docs': len(self.base_ids),
+                       'delta_docs': len(self.delta_ids), 'created_at': time.time()}, f)
+        if on_write and not ann:
+            # Linked files share their inode with the source version, so lists are only written fresh
+            on_write(path)
+
+        tmp = os.path.join(root, f"CURRENT.{os.getpid()}")
+        with open(tmp, 'w') as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(root, 'CURRENT'))
+        self.source = path
+        _prune(root, keep={version})
+        return version
+
+    @classmethod
+    def load(cls, root, mmap=True):
+        """Open the published version; base arrays are memory-mapped read-only"""
+        version = current_version(root)
+        if not version:
+            return None, None
+        path = os.path.join(root, version)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        n_features = meta['n_features']
+        mode = 'r' if mmap else None
+        base_ids, base_X = _load_csr(path, 'base', n_features, mode)
+        delta_ids, delta_X = _load_csr(path, 'delta', n_features, None)
+        idf = np.load(os.path.join(path, 'idf.npy'))
+        return cls(idf, base_ids, base_X, delta_ids, delta_X, source=path), version
+
+
+def current_version(root):
+    try:
+        with open(os.path.join(root, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _save_csr(path, prefix, ids, X):
+    X = sp.csr_matrix(X, dtype=np.float32)
+    # indices and indptr must share a dtype or scipy copies them on load
+    idx_dtype = np.int32 if X.nnz < np.iinfo(np.int32).max else np.int64
+    np.save(os.path.join(path, f"{prefix}_data.npy"), X.data.astype(np.float32))
+    np.save(os.path.join(path, f"{prefix}_indices.npy"), X.indices.astype(idx_dtype))
+    np.save(os.path.join(path, f"{prefix}_indptr.npy"), X.indptr.astype(idx_dtype))
+    np.save(os.path.join(path, f"{prefix}_ids.npy"), np.asarray(ids, dtype=np.int64))
+
+
+def _load_csr(path, prefix, n_features, mmap_mode):
+    parts = {p: np.load(os.path.join(path, f"{prefix}_{p}.npy"), mmap_mode=mmap_mode) for p in _CSR_PARTS}
+    X = sp.csr_matrix((parts['data'], parts['indices'], parts['indptr']),
+                      shape=(len(parts['ids']), n_features), copy=False)
+    return np.asarray(parts['ids']), X
+
+
+def _prune(root, keep, retain=2):
+    """Remove old version directories, keeping the newest `retain`"""
+    versions = sorted(d for d in os.listdir(root) if d.startswith('v') and os.path.isdir(os.path.join(root, d)))
+    for old in versions[:-retain]:
+        if old not in keep:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
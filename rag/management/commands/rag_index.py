@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Movie
+from rag.ann import measure_recall
+from rag.embeddings import Store, store, movie_document
+
+
+class Command(BaseCommand):
+    help = "Build or update the on-disk RAG index that workers memory-map at startup"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--update', type=int, nargs='+', metavar='MOVIE_ID',
+                            help='re-index only these movies (append or replace)')
+        parser.add_argument('--new', action='store_true', help='append movies missing from the index')
+        parser.add_argument('--compact', action='store_true', help='fold appended rows into the base segment')
+        parser.add_argument('--eval-recall', type=int, default=0, metavar='N',
+                            help='measure IVF recall@k against exact search on N sampled movies')
+        parser.add_argument('-k', type=int, default=5)
+        parser.add_argument('--probes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+
+    def handle(self, *a, **kw):
+        if kw['eval_recall']:
+            return self.eval_recall(kw['eval_recall'], kw['k'], kw['probes'])
+
+        if not (kw['update'] or kw['new'] or kw['compact']):
+            # Full rebuild also refreshes the IDF weights
+            store.build(save=True)
+            if store.index is None:
+                raise CommandError("No movies to index")
+            self.stdout.write(self.style.SUCCESS(f"Built RAG index {store.version} ({len(store.index)} movies)"))
+            return
+
+        if store.index is None and not store.load():
+            raise CommandError(f"No index at {store.path}; run rag_index without options first")
+
+        ids = list(kw['update'] or [])
+        if kw['new']:
+            indexed = set(int(i) for i in store.index.live_ids())
+            ids += [mid for mid in Movie.objects.values_list('id', flat=True) if mid not in indexed]
+        if ids:
+            store.upsert(ids)
+        if kw['compact']:
+            store.compact()
+        self.stdout.write(self.style.SUCCESS(f"RAG index {store.version}: {len(store.index)} movies ({len(ids)} updated)"))
+
+    def eval_recall(self, n, k, probes):
+        if store.index is None and not store.load():
+            raise CommandError(f"No index at {store.path}; run rag_index without options first")
+        queries = [movie_document(title, overview)
+                   for title, overview in Movie.objects.order_by('?').values_list('title', 'overview')[:n]]
+
+        ivf = Store(path=store.path, backend='ivf')
+        ivf.index, ivf.version = store.index, store.version
+        ivf._attach_backend()
+        self.stdout.write(f"{len(queries)} queries, {ivf.backend.centroids.shape[0]} lists, recall@{k} vs exact:")
+        for n_probe in probes:
+            ivf.backend.n_probe = n_probe
+            r = measure_recall(ivf, queries, k=k)
+            self.stdout.write(f"  n_probe={n_probe:<4} recall={r['recall']:.3f}  "
+                              f"ivf {r['latency_ms']:.2f} ms  exact {r['exact_latency_ms']:.2f} ms")
@@ -5,7 +5,9 @@ from .views import (
     recommendations,
     trending,
     explain_any,
+    explain_batch,
     natural_explanation,
+    natural_explanation_stream,
     complete_onboarding,
     get_user_ratings,
     counterfactual_explanation,
@@ -17,7 +19,9 @@ urlpatterns = [
     path('recommendations/', recommendations),
     path('trending/', trending),
     path('explain/', explain_any),
+    path('explain/batch/', explain_batch),
     path('natural-explanation/', natural_explanation),
+    path('natural-explanation/stream/', natural_explanation_stream),
     path('onboarding/complete/', complete_onboarding),
     path('user-ratings/', get_user_ratings),
     path('counterfactual-explanation/', counterfactual_explanation, name='counterfactual_explanation'),
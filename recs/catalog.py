@@ -0,0 +1,76 @@
+"""
+Local movie catalog: TMDB detail fields and relations, and DB-backed discovery
+
+tmdb_ingest (and rate_movie, for movies created on the fly) store each movie's
+original language, its TMDB genres and its top-billed cast. discover_local()
+answers the /api/discover/ actor / genre / language filters from these indexed
+tables, without calling TMDB.
+"""
+from django.db import transaction
+from core.catalog_stats import catalog
+from core.models import Credit, Genre, Movie, Person
+from .tmdb import IMG
+
+TOP_CAST = 10  # billed cast members stored per movie
+
+
+def movie_fields(det):
+    """Movie columns from a TMDB detail() payload"""
+    return dict(
+        title=det.get('title') or '',
+        overview=det.get('overview') or '',
+        year=(det.get('release_date') or '')[:4],
+        poster=(IMG + det['poster_path']) if det.get('poster_path') else '',
+        popularity=det.get('popularity') or 0.0,
+        vote=det.get('vote_average') or 0.0,
+        original_language=(det.get('original_language') or '')[:8],
+    )
+
+
+def top_cast(det):
+    cast = (det.get('credits') or {}).get('cast') or []
+    return sorted((c for c in cast if c.get('id')), key=lambda c: c.get('order', 0))[:TOP_CAST]
+
+
+def sync_relations(details):
+    """Store genres and top-billed cast for {movie id: TMDB detail payload}, replacing previous ones"""
+    if not details:
+        return
+    genres = {g['id']: g.get('name') or '' for det in details.values() for g in det.get('genres') or [] if g.get('id')}
+    people = {c['id']: c.get('name') or '' for det in details.values() for c in top_cast(det)}
+    Genre.objects.bulk_create([Genre(tmdb_id=i, name=n[:64]) for i, n in genres.items()], update_conflicts=True,
+                              unique_fields=['tmdb_id'], update_fields=['name'])
+    Person.objects.bulk_create([Person(tmdb_id=i, name=n[:255]) for i, n in people.items()], update_conflicts=True,
+                               unique_fields=['tmdb_id'], update_fields=['name'])
+    genre_ids = dict(Genre.objects.filter(tmdb_id__in=genres).values_list('tmdb_id', 'id'))
+    person_ids = dict(Person.objects.filter(tmdb_id__in=people).values_list('tmdb_id', 'id'))
+
+    with transaction.atomic():
+        MovieGenre = Movie.genres.through
+        MovieGenre.objects.filter(movie_id__in=details).delete()
+        MovieGenre.objects.bulk_create([MovieGenre(movie_id=mid, genre_id=genre_ids[g['id']])
+                                        for mid, det in details.items() for g in det.get('genres') or [] if g.get('id')],
+                                       ignore_conflicts=True)
+        Credit.objects.filter(movie_id__in=details).delete()
+        Credit.objects.bulk_create([Credit(movie_id=mid, person_id=person_ids[c['id']], order=c.get('order') or 0,
+                                           character=(c.get('character') or '')[:255])
+                                    for mid, det in details.items() for c in top_cast(det)], ignore_conflicts=True)
+
+
+def discover_local(actor='', genre='', lang='', limit=20):
+    """Movies in the local catalog matching the filters, most popular first"""
+    if not (actor or genre or lang):
+        ids = catalog.get().top_popular(limit)
+        movies = Movie.objects.in_bulk(ids)
+        return [movies[i] for i in ids if i in movies]
+    movies = Movie.objects.all()
+    if actor:
+        people = Person.objects.filter(name__iexact=actor)
+        if not people.exists():
+            people = Person.objects.filter(name__icontains=actor)
+        movies = movies.filter(credits__person__in=people)
+    if genre:
+        movies = movies.filter(genres__name__iexact=genre)
+    if lang:
+        movies = movies.filter(original_language=lang)
+    return list(movies.distinct().order_by('-popularity')[:limit])
@@ -1,3 +1,158 @@
+"""
+Real-time rating channel (ws/ratings/)
+
+Logged-in clients send {"type": "rate", "movie": <id>, "value": 1-5}, or
+{"type": "rate", "ratings": [...]} for several at once. "movie" follows
+rate_movie: a local id, or a TMDB id as a digit string. Ratings are acked as
+queued and held until the user pauses for RATINGS_WS_DEBOUNCE seconds (at most
+RATINGS_WS_MAX_WAIT after the first one, or until RATINGS_WS_MAX_BATCH are
+pending). They are then written as one upsert, followed once by the work the
+Rating signals do for a single rating (core.signals.ratings_changed). Every
+socket of that user gets an "invalidate" message followed by the refreshed
+"recommendations". {"type": "flush"} writes immediately and {"type": "refresh"}
+only pushes recommendations. If a write fails, its ratings go back to pending
+(behind any newer value for the same movie) and the client gets an error; the
+next flush retries them.
+"""
+import asyncio
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from core.models import Movie, Rating
+from core.signals import ratings_changed
+
+
+def save_ratings(user_id, values):
+    """Upsert {movie field: value} for a user in one statement -> ({movie id: value}, errors)"""
+    from .views import rating_movie_id
+    saved, errors = {}, []
+    for movie, value in values.items():
+        try:
+            saved[rating_movie_id(movie)] = value
+        except Exception as e:
+            errors.append({"movie": movie, "error": str(e)})
+    known = set(Movie.objects.filter(id__in=list(saved)).values_list('id', flat=True))
+    for movie_id in [m for m in saved if m not in known]:
+        errors.append({"movie": movie_id, "error": "unknown movie"})
+        del saved[movie_id]
+    if not saved:
+        return saved, errors
+    now = timezone.now()
+    with transaction.atomic():
+        Rating.objects.bulk_create([Rating(user_id=user_id, movie_id=m, value=v, created_at=now) for m, v in saved.items()],
+                                   update_conflicts=True, unique_fields=['user', 'movie'],
+                                   update_fields=['value', 'created_at'])
+        # bulk_create skips the Rating signals, so their work is done once for the whole batch
+        ratings_changed(user_id)
+    return saved, errors
+
+
+def recommendation_push(user_id, k):
+    from .views import _recommendation_cards
+    cards, artifacts = _recommendation_cards(user_id, k, explain=True)
+    return {"items": cards, "version": artifacts.get('version') or ''}
+
+
 class RatingsConsumer(AsyncJsonWebsocketConsumer):
-    async def connect(self): await self.accept()
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.user_id = user.id
+        self.group = f'ratings.user.{user.id}'  # every open socket of this user
+        self.k = int((parse_qs(self.scope.get('query_string', b'').decode()).get('k') or ['12'])[0])
+        self.pending = {}
+        self._first = None
+        self._timer = None
+        self._flushing = asyncio.Lock()
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if not hasattr(self, 'group'):
+            return
+        if self.pending:
+            await self.flush()
+        if self.pending:
+            print(f"❌ Dropped {len(self.pending)} unsaved ratings of user {self.user_id} on disconnect")
+        await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        kind = content.get('type')
+        if kind == 'rate':
+            for item in content.get('ratings') or [content]:
+                try:
+                    movie, value = item['movie'], int(item['value'])
+                    if not isinstance(movie, int) and not (isinstance(movie, str) and movie.isdigit()):
+                        raise ValueError('movie must be a local id or a TMDB id string')
+                    if not 1 <= value <= 5:
+                        raise ValueError('value must be 1-5')
+                except (KeyError, TypeError, ValueError) as e:
+                    await self.send_json({"type": "error", "error": f"bad rating {item!r}: {e}"})
+                    continue
+                self.pending[movie] = value  # a re-click within the window replaces the value
+                await self.send_json({"type": "queued", "movie": movie, "value": value, "pending": len(self.pending)})
+            if len(self.pending) >= settings.RATINGS_WS_MAX_BATCH:
+                await self.flush()
+            elif self.pending:
+                self._schedule()
+        elif kind == 'flush':
+            await self.flush()
+        elif kind == 'refresh':
+            push = await database_sync_to_async(recommendation_push)(self.user_id, self.k)
+            await self.send_json(dict(push, type="recommendations"))
+        else:
+            await self.send_json({"type": "error", "error": f"unknown message type {kind!r}"})
+
+    def _schedule(self):
+        """(Re)start the debounce timer, capped at RATINGS_WS_MAX_WAIT after the first pending rating"""
+        loop = asyncio.get_running_loop()
+        if self._first is None:
+            self._first = loop.time()
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = min(settings.RATINGS_WS_DEBOUNCE, max(0.0, self._first + settings.RATINGS_WS_MAX_WAIT - loop.time()))
+        self._timer = asyncio.ensure_future(self._flush_after(delay))
+
+    async def _flush_after(self, delay):
+        await asyncio.sleep(delay)
+        await self.flush()
+
+    async def flush(self):
+        """Write the pending ratings as one batch and push the refreshed recommendations to the user's sockets"""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer, self._first = None, None
+        async with self._flushing:  # batches are written in the order they were taken
+            values, self.pending = self.pending, {}
+            if not values:
+                return
+            try:
+                saved, errors = await database_sync_to_async(save_ratings)(self.user_id, values)
+            except Exception as e:
+                print(f"❌ Saving {len(values)} ratings for user {self.user_id} failed: {e}")
+                self.pending = {**values, **self.pending}
+                await self.send_json({"type": "error", "error": f"ratings not saved: {e}", "pending": len(self.pending)})
+                return
+            for error in errors:
+                await self.send_json(dict(error, type="error"))
+            if not saved:
+                return
+            try:
+                push = await database_sync_to_async(recommendation_push)(self.user_id, self.k)
+            except Exception as e:
+                # The ratings are saved; the client can ask again with {"type": "refresh"}
+                print(f"❌ Recommendation push for user {self.user_id} failed: {e}")
+                await self.send_json({"type": "error", "error": f"recommendations not refreshed: {e}"})
+                return
+            await self.channel_layer.group_send(self.group, {
+                "type": "ratings.update", "saved": [{"movie": m, "value": v} for m, v in saved.items()], **push})
+
+    async def ratings_update(self, event):
+        await self.send_json({"type": "invalidate", "scope": ["recommendations", "explanations"],
+                              "saved": event["saved"]})
+        await self.send_json({"type": "recommendations", "items": event["items"], "version": event["version"]})
@@ -0,0 +1,107 @@
+"""
+Content-based scoring engine backed by a precomputed TF-IDF item matrix
+
+The matrix is tagged with the core.catalog_stats stamp it was built at. Movie
+saves and bulk ingests touch that stamp, so new movies and refreshed overviews,
+votes or popularity trigger a rebuild, and checking it costs one os.stat().
+"""
+import threading
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from core.catalog_stats import stamp
+from core.models import Movie
+
+
+class ContentMatrix:
+    """Immutable snapshot of the fitted catalog (swapped as a whole on rebuild)"""
+
+    def __init__(self, ids, X, quality, signature):
+        self.ids = ids            # np.int64 movie ids, row order of X
+        self.X = X                # CSR, rows L2-normalized by TfidfVectorizer
+        self.quality = quality    # vote*0.6 + popularity*0.4 per row
+        self.signature = signature
+        self.pos = {int(mid): i for i, mid in enumerate(ids)}
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    def rows_for(self, movie_ids):
+        return np.array([self.pos[m] for m in movie_ids if m in self.pos], dtype=np.int64)
+
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first (partial selection + small sort)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    # Ties are broken by row order so results stay deterministic
+    return part[np.lexsort((part, -scores[part]))]
+
+
+class ContentEngine:
+    def __init__(self):
+        self.matrix = None
+        self._lock = threading.Lock()
+
+    def build(self, signature=None):
+        """Fit the TF-IDF item matrix from the Movie columns it needs"""
+        if signature is None:
+            signature = stamp()
+        rows = list(Movie.objects.order_by('id').values_list('id', 'title', 'overview', 'vote', 'popularity'))
+
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        quality = np.array([(r[3] or 0) * 0.6 + (r[4] or 0) * 0.4 for r in rows], dtype=np.float64)
+        X = None
+        if rows:
+            vectorizer = TfidfVectorizer(max_features=5000, stop_words='english', ngram_range=(1, 2))
+            try:
+                X = vectorizer.fit_transform([f"{r[1]} {r[2] or ''}" for r in rows]).tocsr()
+            except ValueError as e:
+                # Empty vocabulary (e.g. only stop words); similarity is then zero everywhere
+                print(f"⚠️ Content matrix fit failed: {e}")
+
+        self.matrix = ContentMatrix(ids, X, quality, signature)
+        print(f"✅ Content matrix built with {len(rows)} movies")
+        return self.matrix
+
+    def ensure(self):
+        """Return the current matrix, rebuilding it if the catalog changed"""
+        signature = stamp()
+        matrix = self.matrix
+        if matrix is not None and matrix.signature == signature:
+            return matrix
+        with self._lock:
+            if self.matrix is None or self.matrix.signature != signature:
+                self.build(signature)
+            return self.matrix
+
+    def invalidate(self):
+        self.matrix = None
+
+    def popular(self, k):
+        """Cold-start ordering by quality score"""
+        matrix = self.ensure()
+        return [int(matrix.ids[i]) for i in _top_k(matrix.quality, k)]
+
+    def similar_to(self, liked_ids, k):
+        """
+        Rank the catalog against the centroid of the liked movies.
+        Rows are unit length, so X @ mean(X[liked]) is the mean cosine similarity
+        to the liked movies, computed for every item in one sparse product.
+        """
+        matrix = self.ensure()
+        rows = matrix.rows_for(liked_ids)
+        if not len(rows) or matrix.X is None:
+            return self.popular(k)
+
+        centroid = np.asarray(matrix.X[rows].mean(axis=0)).ravel()
+        scores = matrix.X.dot(centroid) * matrix.quality
+        scores[rows] = -np.inf  # skip movies the user already rated highly
+        order = _top_k(scores, min(k, matrix.size - len(np.unique(rows))))
+        return [int(matrix.ids[i]) for i in order]
+
+
+# Global engine instance, shared across requests in a worker
+content_engine = ContentEngine()
@@ -0,0 +1,209 @@
+"""
+Stages behind the natural-language explanation endpoints
+
+The XAI (SHAP/LIME/LightFM), RAG and user-context stages do not depend on each
+other, so gather_inputs runs them concurrently on a shared thread pool. Each
+stage has its own time budget (EXPLAIN_STAGE_TIMEOUTS). A stage that overruns is
+left to finish in the background and its usual empty result is used instead, so
+a slow stage degrades the explanation rather than delaying it.
+
+Abandoned stages still hold a pool thread, so they are capped: while
+EXPLAIN_STAGE_OVERRUNS runs of one stage are still going past their budget, new
+requests skip that stage. The pool has room for those runs on top of
+EXPLAIN_WORKERS, so a hanging backend cannot starve the other stages. A stage
+that only gets a thread after its budget has passed returns without running.
+"""
+import contextvars, threading, time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from django.conf import settings
+from django.db import connections
+from core.models import Movie
+from core.profiles import get_profile
+from core.metrics import traced
+
+_pool = ThreadPoolExecutor(max_workers=settings.EXPLAIN_WORKERS + 3 * settings.EXPLAIN_STAGE_OVERRUNS,
+                           thread_name_prefix='explain')
+_overruns = {'xai': 0, 'rag': 0, 'user': 0}  # abandoned runs per stage that are still going
+_overruns_lock = threading.Lock()
+
+
+@traced('explain.xai')
+def xai_stage(user_id, movie):
+    """SHAP/LIME/LightFM explanation and the model version it came from"""
+    from .xai_explainer import get_comprehensive_xai_explanation
+    from .lightfm_pipeline import load_artifacts
+    
+    xai_explanation = None
+    model_version = None
+    try:
+        artifacts = load_artifacts()
+        model_version = artifacts.get('version')
+        model = artifacts.get('model') if artifacts.get('mode') == 'lightfm' else None
+        items = artifacts.get('items', [])
+        
+        xai_explanation = get_comprehensive_xai_explanation(
+            user_id=user_id,
+            movie_id=movie.id,
+            model=model,
+            items=items,
+            user_index=artifacts.get('user_index'),
+            item_index=artifacts.get('item_index')
+        )
+    except Exception as e:
+        print(f"XAI explanation failed: {e}")
+    return xai_explanation, model_version
+
+
+@traced('explain.rag')
+def rag_stage(movie):
+    """Similar movies from the RAG index, as prompt text and display strings"""
+    rag_context = ""
+    similar_movies = []
+    try:
+        from rag.embeddings import store
+        query = f"{movie.title} {movie.overview or ''}"
+        hits = store.search(query, k=3)
+        
+        if hits:
+            movie_ids = [i for i, _ in hits]
+            similar_movies_objs = Movie.objects.filter(id__in=movie_ids)
+            similar_movies = [
+                f"{m.title} ({m.vote}/10)" for m in similar_movies_objs
+            ]
+            rag_context = f"Similar movies: {', '.join(similar_movies)}. "
+    except Exception as e:
+        print(f"RAG retrieval failed: {e}")
+    return rag_context, similar_movies
+
+
+@traced('explain.user_context')
+def user_context_stage(user_id):
+    profile = get_profile(user_id, only=['total_ratings', 'liked'])
+    
+    user_context = ""
+    if profile.total_ratings:
+        if profile.liked:
+            first = profile.liked[:3]
+            titles = dict(Movie.objects.filter(id__in=[m for m, _ in first]).values_list('id', 'title'))
+            liked_titles = [f"{titles[m]} ({v}/5)" for m, v in first if m in titles]
+            user_context = f"User liked: {', '.join(liked_titles)}. "
+    else:
+        user_context = "New user with no rating history. "
+    return user_context
+
+
+# Result used when a stage times out or crashes
+STAGE_DEFAULTS = {
+    'xai': (None, None),
+    'rag': ("", []),
+    'user': "",
+}
+
+
+def _run_stage(deadline, fn, *args):
+    if time.perf_counter() > deadline:
+        return None  # queued past its budget; the caller has already used the default
+    try:
+        return fn(*args)
+    finally:
+        # Pool threads keep their own DB connections; don't leave them open
+        connections.close_all()
+
+
+def _abandon(name, future):
+    """Count an overrunning stage until its thread is free again"""
+    def finished(_):
+        with _overruns_lock:
+            _overruns[name] -= 1
+    with _overruns_lock:
+        _overruns[name] += 1
+    future.add_done_callback(finished)
+
+
+def run_stages(user_id, movie):
+    """Run the three stages concurrently -> (results by stage name, timings in ms)"""
+    started = time.perf_counter()
+    stages = {'xai': (xai_stage, user_id, movie), 'rag': (rag_stage, movie), 'user': (user_context_stage, user_id)}
+    futures = {}
+    for name, (fn, *args) in stages.items():
+        if _overruns[name] >= settings.EXPLAIN_STAGE_OVERRUNS:
+            print(f"⏱️ Explanation stage '{name}' skipped, {_overruns[name]} earlier runs still overrunning")
+            continue
+        deadline = started + settings.EXPLAIN_STAGE_TIMEOUTS[name]
+        # Stages run in the caller's context, so core.db.reading() carries over to the pool threads
+        futures[name] = _pool.submit(contextvars.copy_context().run, _run_stage, deadline, fn, *args)
+    results, timings = {}, {}
+    for name in stages:
+        results[name] = STAGE_DEFAULTS[name]
+        if name not in futures:
+            continue
+        budget = settings.EXPLAIN_STAGE_TIMEOUTS[name]
+        try:
+            results[name] = futures[name].result(timeout=max(0.0, started + budget - time.perf_counter()))
+        except TimeoutError:
+            print(f"⏱️ Explanation stage '{name}' exceeded {budget}s, using fallback")
+            _abandon(name, futures[name])
+        except Exception as e:
+            print(f"❌ Explanation stage '{name}' failed: {e}")
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    return results, timings
+
+
+def build_prompt(movie, user_context, rag_context, xai_explanation):
+    prompt_parts = [
+        f"Movie: '{movie.title}' (Rating: {movie.vote}/10, Popularity: {movie.popularity}).",
+        f"Overview: {movie.overview[:200] if movie.overview else 'N/A'}.",
+        user_context,
+        rag_context
+    ]
+    
+    # Add SHAP values to prompt
+    if xai_explanation and xai_explanation.get('shap_values'):
+        shap = xai_explanation['shap_values']
+        prompt_parts.append(
+            f"Feature importance: Genre ({shap['genre_weight']}), "
+            f"Rating ({shap['rating_weight']}), "
+            f"Popularity ({shap['popularity_weight']}), "
+            f"User preference ({shap['user_preference_weight']})."
+        )
+    
+    # Add LIME explanation to prompt
+    if xai_explanation and xai_explanation.get('lime_explanation'):
+        lime_features = [f"{e['feature']} ({e['impact']})" for e in xai_explanation['lime_explanation'][:2]]
+        prompt_parts.append(f"Key factors: {', '.join(lime_features)}.")
+    
+    full_prompt = " ".join(prompt_parts)
+    full_prompt += " Explain in 40 words why this movie is recommended."
+    return full_prompt
+
+
+def gather_inputs(user_id, movie):
+    """Everything the LLM call and the fallbacks need for one explanation"""
+    results, timings = run_stages(user_id, movie)
+    print(f"⏱️ Explanation stages (ms): {timings}")
+    xai_explanation, model_version = results['xai']
+    rag_context, similar_movies = results['rag']
+    user_context = results['user']
+    return {
+        "xai_explanation": xai_explanation,
+        "model_version": model_version,
+        "rag_context": rag_context,
+        "similar_movies": similar_movies,
+        "user_context": user_context,
+        "prompt": build_prompt(movie, user_context, rag_context, xai_explanation),
+        "timings": timings
+    }
+
+
+def llm_payload(movie, explanation, inputs):
+    xai_explanation = inputs['xai_explanation']
+    return {
+        "movie": movie.title,
+        "explanation": explanation,
+        "type": "llm_with_xai_and_rag",
+        "model_version": inputs['model_version'],
+        "xai_details": xai_explanation,
+        "similar_movies": inputs['similar_movies'],
+        "shap_values": xai_explanation.get('shap_values') if xai_explanation else None,
+        "lime_explanation": xai_explanation.get('lime_explanation') if xai_explanation else None
+    }
@@ -0,0 +1,141 @@
+"""
+Background precomputation of LLM explanations
+
+Explanations for a user's current top-N recommendations are generated ahead of
+the "Why?" click and written to the explanation cache, where natural_explanation
+picks them up as long as the rating profile they were built for is unchanged.
+
+Work runs on in-process daemon threads fed by a bounded priority queue, so no
+broker is needed. Jobs are deduplicated per (user, movie) while pending. Lower
+priorities run first: jobs triggered by a user's own rating beat the post-training
+sweep, and within a batch the cards shown first beat those further down. When
+the queue is full new jobs are dropped; they are recomputed on demand anyway.
+
+enqueue_top() only queues the user: ranking their top-N is itself a job, so a
+rating request does not wait for topn_for_user.
+"""
+import itertools, queue, threading
+from django.conf import settings
+from django.db import connections
+from core import explain_cache
+from core.models import Movie
+
+# Priority bands
+INTERACTIVE, BATCH = 0, 1
+
+
+class ExplainWorker:
+    def __init__(self, workers=1, maxsize=500):
+        self.workers = workers
+        self.queue = queue.PriorityQueue(maxsize=maxsize)
+        self.pending = set()
+        self.counters = {'enqueued': 0, 'deduplicated': 0, 'dropped': 0, 'ranked': 0, 'skipped': 0, 'computed': 0, 'failed': 0}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._loop, name=f'explain-precompute-{len(self._threads)}', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _put(self, job, priority, block):
+        """Queue one job unless it is already pending -> whether it was added"""
+        with self._lock:
+            if job in self.pending:
+                self.counters['deduplicated'] += 1
+                return False
+            self.pending.add(job)
+        try:
+            self.queue.put((priority, job), block=block)
+        except queue.Full:
+            with self._lock:
+                self.pending.discard(job)
+                self.counters['dropped'] += 1
+            return False
+        self._count('enqueued')
+        return True
+
+    def enqueue(self, user_id, movie_ids, band=INTERACTIVE, block=False):
+        """Queue explanations for movie_ids, in display order. block waits for room instead of dropping."""
+        self._start()
+        return sum(self._put((user_id, movie_id), (band, rank, next(self._seq)), block)
+                   for rank, movie_id in enumerate(movie_ids))
+
+    def enqueue_top(self, user_id, k=None, band=INTERACTIVE, block=False):
+        """
+        Queue the user's current top-k recommendations. The ranking runs on a
+        worker thread, except with block: a worker cannot wait for room in its
+        own queue, so blocking callers (batch sweeps) rank here.
+        """
+        k = settings.EXPLAIN_PRECOMPUTE_TOP if k is None else k
+        if k <= 0:
+            return 0
+        if block:
+            from .lightfm_pipeline import topn_for_user
+            return self.enqueue(user_id, [m.id for m in topn_for_user(user_id, k)], band, block)
+        self._start()
+        # (user, None, k) ranks the user's top-k; it runs before the band's explanation jobs
+        return int(self._put((user_id, None, k), (band, -1, next(self._seq)), block))
+
+    def _rank(self, user_id, k, band):
+        from .lightfm_pipeline import topn_for_user
+        movie_ids = [m.id for m in topn_for_user(user_id, k)]
+        self._count('ranked')
+        return self.enqueue(user_id, movie_ids, band)
+
+    def _loop(self):
+        while True:
+            (band, _, _), job = self.queue.get()
+            try:
+                if job[1] is None:
+                    self._rank(job[0], job[2], band)
+                else:
+                    self.precompute(*job)
+            except Exception as e:
+                self._count('failed')
+                target = 'ranking' if job[1] is None else f"movie {job[1]}"
+                print(f"❌ Explanation precompute failed for user {job[0]}, {target}: {e}")
+            finally:
+                with self._lock:
+                    self.pending.discard(job)
+                connections.close_all()
+                self.queue.task_done()
+
+    def precompute(self, user_id, movie_id):
+        from core.services import openrouter_service, PROMPT_VERSION
+        from .explain_pipeline import gather_inputs, llm_payload
+        movie_key = f"movie:{movie_id}"
+        key = explain_cache.cache_key(user_id, movie_key, explain_cache.profile_hash(user_id), openrouter_service.model, PROMPT_VERSION)
+        if explain_cache.contains(user_id, key):
+            self._count('skipped')
+            return
+        movie = Movie.objects.filter(id=movie_id).first()
+        if movie is None:
+            self._count('skipped')
+            return
+        inputs = gather_inputs(user_id, movie)
+        explanation = openrouter_service.generate_explanation(inputs['user_context'], inputs['prompt'])
+        if not explanation:
+            self._count('failed')
+            return
+        payload = dict(llm_payload(movie, explanation, inputs), precomputed=True)
+        explain_cache.put(user_id, key, payload, movie_key, openrouter_service.model, PROMPT_VERSION)
+        self._count('computed')
+
+    def wait(self):
+        """Block until every queued job has run"""
+        self.queue.join()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, queued=self.queue.qsize(), workers=len(self._threads))
+
+
+worker = ExplainWorker(workers=settings.EXPLAIN_PRECOMPUTE_WORKERS, maxsize=settings.EXPLAIN_PRECOMPUTE_QUEUE)
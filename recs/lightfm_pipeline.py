@@ -1,78 +1,76 @@
-import os, joblib
+import os, time, threading, joblib
+from contextlib import contextmanager
 import numpy as np
 from django.conf import settings
+from django.db.models import Max
 from core.models import Movie, Rating
 from django.contrib.auth.models import User
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from .topn_store import topn_store, top_k_rows
+from core.metrics import traced
+from core.catalog_stats import catalog
+from core.profiles import get_profile
 ART=os.path.join(settings.MODEL_DIR,'lightfm_artifacts.pkl')
 
+# Process-level artifact cache: (file stamp, artifacts), replaced as one object
+_loaded = (None, None)
+_load_lock = threading.Lock()
+
+def _movies_in_order(ids):
+    """Fetch Movie rows for ids, preserving the given ranking"""
+    rank = {mid: i for i, mid in enumerate(ids)}
+    movies = list(Movie.objects.filter(id__in=ids))
+    movies.sort(key=lambda m: rank[m.id])
+    return movies
+
+@traced('content_based_recommendations')
 def content_based_recommendations(user_id, k=12):
     """Content-based recommendations using movie overviews and user preferences"""
-    # Get all movies
-    all_movies = list(Movie.objects.all())
-    if not all_movies:
+    from .content_engine import content_engine
+
+    matrix = content_engine.ensure()
+    if not matrix.size:
         return []
     
-    # Get user's rating history
-    user_ratings = Rating.objects.filter(user_id=user_id)
-    if not user_ratings:
-        # Cold start: return top rated movies
-        return sorted(all_movies, key=lambda m: (m.vote or 0) * 0.6 + (m.popularity or 0) * 0.4, reverse=True)[:k]
-    
-    # Build text corpus from movie titles and overviews
-    movie_texts = []
-    for movie in all_movies:
-        text = f"{movie.title} {movie.overview or ''}"
-        movie_texts.append(text)
-    
-    # Create TF-IDF vectors
-    vectorizer = TfidfVectorizer(max_features=5000, stop_words='english', ngram_range=(1, 2))
-    tfidf_matrix = vectorizer.fit_transform(movie_texts)
-    
-    # Get user's preferred movies (high ratings >= 4)
-    preferred_movies = [r.movie for r in user_ratings if r.value >= 4]
-    
-    if not preferred_movies:
-        return sorted(all_movies, key=lambda m: (m.vote or 0) * 0.6 + (m.popularity or 0) * 0.4, reverse=True)[:k]
-    
-    # Find indices of preferred movies
-    preferred_indices = [all_movies.index(movie) for movie in preferred_movies if movie in all_movies]
-    
-    # Calculate similarity scores for each movie
-    movie_scores = {}
-    
-    for i, movie in enumerate(all_movies):
-        if movie in preferred_movies:
-            continue  # Skip movies user has already rated highly
-        
-        # Calculate similarity with user's preferred movies
-        similarities = []
-        for pref_idx in preferred_indices:
-            similarity = cosine_similarity(tfidf_matrix[i], tfidf_matrix[pref_idx])[0][0]
-            similarities.append(similarity)
-        
-        # Use average similarity as score
-        avg_similarity = np.mean(similarities) if similarities else 0
-        
-        # Boost score with movie quality
-        quality_score = (movie.vote or 0) * 0.6 + (movie.popularity or 0) * 0.4
-        
-        # Final score: similarity weighted by quality
-        final_score = avg_similarity * quality_score
-        movie_scores[movie.id] = final_score
-    
-    # Sort by score and return top k
-    sorted_movies = sorted(all_movies, key=lambda m: movie_scores.get(m.id, 0), reverse=True)
-    return sorted_movies[:k]
+    # Get user's preferred movies (high ratings >= 4) from their profile
+    preferred_ids = get_profile(user_id, only=['liked']).liked_ids
+    
+    if not preferred_ids:
+        # Cold start or no likes: return top rated movies
+        return _movies_in_order(content_engine.popular(k))
+    
+    # Average similarity to the liked movies, boosted by movie quality
+    return _movies_in_order(content_engine.similar_to(preferred_ids, k))
 
+def _save_artifacts(artifacts):
+    """Stamp a new version and replace the artifact file atomically"""
+    artifacts['version'] = f"{artifacts['mode']}-{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**6:06d}"
+    tmp = f"{ART}.{os.getpid()}.tmp"
+    joblib.dump(artifacts, tmp)
+    os.replace(tmp, ART)
+    print(f"💾 Saved artifacts version {artifacts['version']}")
+    return ART
 def _train_fallback():
-    movies=list(Movie.objects.all())
-    if not movies:
-        joblib.dump({'model':None,'items':[],'mode':'fallback'}, ART); return ART
-    maxp=max([m.popularity or 0 for m in movies]) or 1.0
-    scores={m.id: 0.6*((m.vote or 0)/10.0) + 0.4*((m.popularity or 0)/maxp) for m in movies}
-    joblib.dump({'model':scores,'items':[m.id for m in movies],'mode':'fallback'}, ART); return ART
+    stats=catalog.get()
+    if not stats.size:
+        return _save_artifacts({'model':None,'items':[],'mode':'fallback'})
+    scores=stats.fallback_scores()
+    items=[int(i) for i in stats.ids]
+    ranked=[items[i] for i in np.lexsort((stats.ids, -scores))]  # best first, ties by id
+    return _save_artifacts({'model':dict(zip(items, scores.tolist())),'items':items,'ranked':ranked,'mode':'fallback'})
+class _StageTimer:
+    """Wall-clock timing per training stage, printed as it goes"""
+    def __init__(self):
+        self.timings = {}
+    @contextmanager
+    def __call__(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - t0, 4)
+            print(f"⏱️  {name}: {self.timings[name]:.3f}s")
+def _rating_watermark():
+    return Rating.objects.aggregate(w=Max('created_at'))['w']
 def train_and_save(epochs=8):
     try:
         from lightfm import LightFM
@@ -82,8 +80,11 @@ def train_and_save(epochs=8):
         print(f"❌ LightFM import failed: {e}")
         return _train_fallback()
     
-    users=list(User.objects.values_list('id', flat=True)) or [1]
-    items=list(Movie.objects.values_list('id', flat=True))
+    stage = _StageTimer()
+    with stage('load_ids'):
+        users=list(User.objects.values_list('id', flat=True)) or [1]
+        items=list(Movie.objects.values_list('id', flat=True))
+        watermark=_rating_watermark()
     
     if not items:
         print("⚠️  No movies found in database, using fallback")
@@ -93,16 +94,17 @@ def train_and_save(epochs=8):
     
     ds=Dataset(); ds.fit(users, items)
     
-    if Rating.objects.exists():
+    if watermark is not None:
         rating_count = Rating.objects.count()
         print(f"📊 Using {rating_count} existing ratings")
-        triples=((r.user_id or 1, r.movie_id, float(r.value)) for r in Rating.objects.all())
+        triples=((u or 1, m, float(v)) for u, m, v in Rating.objects.filter(created_at__lte=watermark).values_list('user_id', 'movie_id', 'value'))
     else:
         print("📊 No ratings found, using popularity as proxy")
         triples=((1, m.id, float(m.popularity or 1.0)) for m in Movie.objects.all())
     
     try:
-        (mat,_)=ds.build_interactions(triples)
+        with stage('build_interactions'):
+            (mat,_)=ds.build_interactions(triples)
         print(f"✅ Built interaction matrix: {mat.shape}")
     except Exception as e:
         print(f"❌ Failed to build interactions: {e}")
@@ -111,22 +113,131 @@ def train_and_save(epochs=8):
     try:
         model=LightFM(loss='warp')
         print("🔄 Training LightFM model...")
-        model.fit(mat, epochs=epochs, num_threads=2)
+        with stage('fit'):
+            model.fit(mat, epochs=epochs, num_threads=2)
         print("✅ LightFM training completed")
     except Exception as e:
         print(f"❌ LightFM training failed: {e}")
         return _train_fallback()
     
-    import numpy as np
-    joblib.dump({'model':model,'items':items,'mode':'lightfm'}, ART)
+    # Persist the Dataset id mappings so serving never re-derives positions from live tables
+    user_index, _, item_index, _ = ds.mapping()
+    with stage('save'):
+        _save_artifacts({'model':model,'items':items,'users':users,'mode':'lightfm',
+                         'user_index':dict(user_index),'item_index':dict(item_index),
+                         'dataset':ds,'watermark':watermark,'timings':stage.timings,'training':'full'})
     print(f"💾 Saved LightFM model to {ART}")
     return ART
+def _grow_model(model, n_users, n_items):
+    """Append freshly initialised parameter rows for users/items added since the checkpoint"""
+    adagrad = model.learning_schedule == 'adagrad'
+    for prefix, n in (('user', n_users), ('item', n_items)):
+        emb = getattr(model, f'{prefix}_embeddings')
+        extra = n - emb.shape[0]
+        if extra <= 0:
+            continue
+        # Same initialisation as LightFM._initialize
+        rows = ((model.random_state.rand(extra, model.no_components) - 0.5) / model.no_components).astype(np.float32)
+        ones = np.ones((extra, model.no_components), dtype=np.float32)
+        zeros = np.zeros((extra, model.no_components), dtype=np.float32)
+        setattr(model, f'{prefix}_embeddings', np.ascontiguousarray(np.vstack([emb, rows])))
+        for name, fill in (('embedding_gradients', ones if adagrad else zeros), ('embedding_momentum', zeros)):
+            setattr(model, f'{prefix}_{name}', np.ascontiguousarray(np.vstack([getattr(model, f'{prefix}_{name}'), fill])))
+        for name, fill in (('biases', 0.0), ('bias_gradients', 1.0 if adagrad else 0.0), ('bias_momentum', 0.0)):
+            current = getattr(model, f'{prefix}_{name}')
+            setattr(model, f'{prefix}_{name}', np.concatenate([current, np.full(extra, fill, dtype=np.float32)]))
+def train_incremental(epochs=8):
+    """
+    Continue training the last checkpoint with fit_partial on ratings created
+    after its watermark, extending the id mappings with new users and movies.
+    Falls back to a full retrain when there is no usable checkpoint.
+    """
+    stage = _StageTimer()
+    with stage('load_checkpoint'):
+        artifacts = joblib.load(ART) if os.path.exists(ART) else {}
+    if artifacts.get('mode') != 'lightfm' or 'dataset' not in artifacts or artifacts.get('watermark') is None:
+        print("⚠️  No incremental checkpoint (needs a LightFM model trained on ratings), running full training")
+        return train_and_save(epochs=epochs)
+    
+    model, ds, watermark = artifacts['model'], artifacts['dataset'], artifacts['watermark']
+    with stage('load_ratings'):
+        new_ratings = list(Rating.objects.filter(created_at__gt=watermark).values_list('user_id', 'movie_id', 'value', 'created_at'))
+    if not new_ratings:
+        print(f"✅ No ratings since {watermark}, model {artifacts.get('version')} is current")
+        return ART
+    print(f"📊 {len(new_ratings)} new ratings since {watermark}")
+    
+    with stage('extend_mappings'):
+        known_users = artifacts['user_index']
+        new_users = list(dict.fromkeys(u or 1 for u, _, _, _ in new_ratings if (u or 1) not in known_users))
+        known_items = artifacts['item_index']
+        new_items = [m for m in Movie.objects.values_list('id', flat=True) if m not in known_items]
+        ds.fit_partial(users=new_users, items=new_items)
+        user_index, _, item_index, _ = ds.mapping()
+        _grow_model(model, len(user_index), len(item_index))
+    print(f"📊 Added {len(new_users)} users and {len(new_items)} items")
+    
+    with stage('build_interactions'):
+        (mat, _) = ds.build_interactions((u or 1, m, float(v)) for u, m, v, _ in new_ratings)
+    
+    with stage('fit_partial'):
+        model.fit_partial(mat, epochs=epochs, num_threads=2)
+    
+    users = sorted(user_index, key=user_index.get)
+    items = sorted(item_index, key=item_index.get)
+    with stage('save'):
+        _save_artifacts({'model':model,'items':items,'users':users,'mode':'lightfm',
+                         'user_index':dict(user_index),'item_index':dict(item_index),
+                         'dataset':ds,'watermark':max(r[3] for r in new_ratings),
+                         'timings':stage.timings,'training':'incremental','parent':artifacts.get('version')})
+    print(f"💾 Saved incremental LightFM model to {ART}")
+    return ART
+def _ensure_index_maps(artifacts):
+    """Fill in id->index dicts for artifacts saved before they were persisted"""
+    items = artifacts.get('items') or []
+    if 'item_index' not in artifacts:
+        artifacts['item_index'] = {mid: i for i, mid in enumerate(items)}
+    if 'user_index' not in artifacts and artifacts.get('mode') == 'lightfm':
+        # Legacy artifacts: the model was trained on the user table's order at the time
+        users = list(User.objects.values_list('id', flat=True)) or [1]
+        artifacts['users'] = users
+        artifacts['user_index'] = {uid: i for i, uid in enumerate(users)}
+@traced('load_artifacts')
 def load_artifacts():
+    """
+    Artifacts from the in-process cache. The file is only re-read when its
+    mtime/size change (e.g. after train_lightfm), and the new artifacts are
+    swapped in as one object so concurrent requests see either version whole.
+    """
+    global _loaded
     if not os.path.exists(ART): train_and_save(epochs=4)
-    return joblib.load(ART)
+    st = os.stat(ART)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached_stamp, artifacts = _loaded
+    if cached_stamp == stamp:
+        return artifacts
+    with _load_lock:
+        if _loaded[0] != stamp:
+            artifacts = joblib.load(ART)
+            artifacts.setdefault('version', f"{artifacts.get('mode', 'unknown')}-{st.st_mtime_ns}")
+            _ensure_index_maps(artifacts)
+            _loaded = (stamp, artifacts)
+            print(f"🔄 Loaded model artifacts version {artifacts['version']}")
+        return _loaded[1]
+def model_version():
+    """Version stamp of the artifacts currently serving requests"""
+    return load_artifacts().get('version')
+def precompute_recommendations(k=50, block=1024):
+    """Batch top-k for every user from the saved LightFM artifacts"""
+    from .topn_store import precompute_topn
+    artifacts = load_artifacts()
+    if artifacts.get('mode') != 'lightfm' or artifacts.get('model') is None:
+        print("⚠️  No LightFM model in artifacts, skipping top-N precompute")
+        return None
+    return precompute_topn(artifacts['model'], artifacts['users'], artifacts['items'], artifacts['version'], k=k, block=block)
+@traced('topn_for_user')
 def topn_for_user(user_id=1, k=12):
     """Get top N recommendations for user using LightFM when available"""
-    import numpy as np
     artifacts = load_artifacts()
     mode = artifacts.get('mode', 'fallback')
 
@@ -139,14 +250,17 @@ def topn_for_user(user_id=1, k=12):
             if not items:
                 return []
 
-            # Map DB user_id to a stable index (0-based)
-            all_users = list(User.objects.values_list('id', flat=True)) or [1]
-            if user_id not in all_users:
+            # Serve the row written by the batch precompute when it matches this model
+            precomputed = topn_store.lookup(user_id, k, artifacts['version'])
+            if precomputed is not None:
+                return _movies_in_order(precomputed)
+
+            # Map DB user_id to the LightFM index saved at training time
+            user_index = artifacts['user_index'].get(user_id)
+            if user_index is None:
                 # If user not in training set, fallback
                 return content_based_recommendations(user_id, k)
 
-            user_index = all_users.index(user_id)
-
             # LightFM uses item indices from 0..len(items)-1
             item_indices = np.arange(len(items))
 
@@ -155,15 +269,11 @@ def topn_for_user(user_id=1, k=12):
                 item_ids=item_indices
             )
 
-            order = np.argsort(-scores)[:k]
-            chosen_db_ids = [items[i] for i in order]
-
-            movies = list(Movie.objects.filter(id__in=chosen_db_ids))
-            movies.sort(key=lambda m: chosen_db_ids.index(m.id))
-            return movies
+            order, _ = top_k_rows(scores[np.newaxis, :], k)
+            return _movies_in_order([items[i] for i in order[0]])
 
         except Exception as e:
-            print(f"LightFM prediction failed: {e}, falling back to content-based")
+            print(f"LightFM prediction failed ({artifacts.get('version')}): {e}, falling back to content-based")
             return content_based_recommendations(user_id, k)
 
     # Fallback branch
@@ -173,11 +283,8 @@ def topn_for_user(user_id=1, k=12):
             items = artifacts['items']
             if not items:
                 return []
-            sorted_items = sorted(items, key=lambda i: scores.get(i, 0), reverse=True)
-            chosen = sorted_items[:k]
-            movies = list(Movie.objects.filter(id__in=chosen))
-            movies.sort(key=lambda m: chosen.index(m.id))
-            return movies
+            sorted_items = artifacts.get('ranked') or sorted(items, key=lambda i: scores.get(i, 0), reverse=True)
+            return _movies_in_order(sorted_items[:k])
         except Exception as e:
             print(f"Fallback prediction failed: {e}, using content-based")
             return content_based_recommendations(user_id, k)
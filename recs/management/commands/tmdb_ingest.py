@@ -1,8 +1,16 @@
 # recs/management/commands/tmdb_ingest.py
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.core.management.base import BaseCommand
-from time import sleep
-from recs.tmdb import discover, detail, IMG, get_genres
+from time import sleep, monotonic
+from recs import tmdb
+from recs.tmdb import discover, detail
+from recs.catalog import movie_fields, sync_relations
+from core.catalog_stats import touch
+from core.features import fill
 from core.models import Movie
+from rag.embeddings import store
+
+MOVIE_FIELDS = ['title', 'overview', 'year', 'poster', 'popularity', 'vote', 'original_language', 'token_codes', 'genre_mask']
 
 class Command(BaseCommand):
     help = "Ingest TMDB popular movies into local DB"
@@ -10,13 +18,20 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--pages', type=int, default=3)
         parser.add_argument('--sleep', type=float, default=0.5)  # polite delay
+        parser.add_argument('--workers', type=int, default=1,
+                            help='concurrent TMDB requests; >1 enables the rate-limited concurrent mode')
+        parser.add_argument('--rps', type=float, default=40.0, help='shared request budget per second (concurrent mode)')
+        parser.add_argument('--batch-size', type=int, default=200, help='movies per bulk upsert (concurrent mode)')
 
     def handle(self, *a, **kw):
+        if kw['workers'] > 1:
+            return self.handle_concurrent(kw['pages'], kw['workers'], kw['rps'], kw['batch_size'])
+
         pages = kw['pages']; delay = kw['sleep']
-        count = 0
+        count = 0; touched = []
         for p in range(1, pages + 1):
             try:
-                results = discover(page=p)
+                results = discover(page=p, cache=False)
             except Exception as e:
                 self.stderr.write(self.style.WARNING(f"[page {p}] discover failed: {e} — skipping"))
                 continue
@@ -24,23 +39,81 @@ class Command(BaseCommand):
             for m in results:
                 mid = m.get('id')
                 try:
-                    det = detail(mid)
+                    det = detail(mid, cache=False)
                 except Exception as e:
                     self.stderr.write(self.style.WARNING(f"detail({mid}) failed: {e} — skipping"))
                     continue
 
-                Movie.objects.update_or_create(
-                    tmdb_id=mid,
-                    defaults=dict(
-                        title=det.get('title') or '',
-                        overview=det.get('overview') or '',
-                        year=(det.get('release_date') or '')[:4],
-                        poster=(IMG + det['poster_path']) if det.get('poster_path') else '',
-                        popularity=det.get('popularity') or 0.0,
-                        vote=det.get('vote_average') or 0.0,
-                    )
-                )
-                count += 1
+                movie, _ = Movie.objects.update_or_create(tmdb_id=mid, defaults=movie_fields(det))
+                sync_relations({movie.id: det})
+                count += 1; touched.append(movie.id)
                 if delay: sleep(delay)
 
+        self.sync_rag(touched)
         self.stdout.write(self.style.SUCCESS(f"Ingested/updated {count} movies."))
+
+    def handle_concurrent(self, pages, workers, rps, batch_size):
+        """
+        Fan discover/detail calls out over a bounded thread pool behind one
+        token bucket (429 Retry-After pauses every worker), and write movies
+        from the main thread in bulk upserts.
+        """
+        tmdb.limiter = tmdb.TokenBucket(rps)
+        started = monotonic()
+        pending, written_tmdb_ids = [], []
+        details = {}  # tmdb id -> detail payload of the pending movies
+        done = failed = 0
+
+        def flush():
+            if not pending:
+                return
+            Movie.objects.bulk_create(pending, batch_size=batch_size, update_conflicts=True,
+                                      unique_fields=['tmdb_id'], update_fields=MOVIE_FIELDS)
+            ids = Movie.objects.filter(tmdb_id__in=details).values_list('tmdb_id', 'id')
+            sync_relations({movie_id: details[tmdb_id] for tmdb_id, movie_id in ids})
+            touch()  # bulk_create skips the post_save that refreshes catalog stats
+            written_tmdb_ids.extend(m.tmdb_id for m in pending)
+            pending.clear(); details.clear()
+            elapsed = monotonic() - started
+            self.stdout.write(f"  {done}/{total} movies, {len(written_tmdb_ids)} written, {failed} failed, "
+                              f"{done / elapsed:.1f} movies/s, {tmdb.limiter.throttled} throttled")
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                page_futures = {pool.submit(discover, page=p, cache=False): p for p in range(1, pages + 1)}
+                ids = []
+                for fut in as_completed(page_futures):
+                    try:
+                        ids.extend(m.get('id') for m in fut.result())
+                    except Exception as e:
+                        self.stderr.write(self.style.WARNING(f"[page {page_futures[fut]}] discover failed: {e} — skipping"))
+                ids = list(dict.fromkeys(i for i in ids if i))
+                total = len(ids)
+                self.stdout.write(f"Discovered {total} movies on {pages} pages, fetching details with {workers} workers")
+
+                detail_futures = {pool.submit(detail, mid, cache=False): mid for mid in ids}
+                for fut in as_completed(detail_futures):
+                    mid = detail_futures[fut]
+                    done += 1
+                    try:
+                        details[mid] = fut.result()
+                        pending.append(fill(Movie(tmdb_id=mid, **movie_fields(details[mid]))))  # bulk_create skips pre_save
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(self.style.WARNING(f"detail({mid}) failed: {e} — skipping"))
+                    if len(pending) >= batch_size:
+                        flush()
+                flush()
+        finally:
+            tmdb.limiter = None
+
+        elapsed = monotonic() - started
+        self.sync_rag(list(Movie.objects.filter(tmdb_id__in=written_tmdb_ids).values_list('id', flat=True)))
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested/updated {len(written_tmdb_ids)} movies in {elapsed:.1f}s "
+            f"({len(written_tmdb_ids) / max(elapsed, 1e-9):.1f} movies/s)."))
+
+    def sync_rag(self, movie_ids):
+        # Keep a prebuilt RAG index in sync without refitting it
+        if movie_ids and store.index is not None:
+            store.upsert(movie_ids)
@@ -1,7 +1,27 @@
+import os
 from django.core.management.base import BaseCommand
-from recs.lightfm_pipeline import train_and_save
+from recs.lightfm_pipeline import ART, train_and_save, train_incremental, precompute_recommendations, load_artifacts
 class Command(BaseCommand):
     help='Train LightFM if available; else fallback'
-    def add_arguments(self, parser): parser.add_argument('--epochs', type=int, default=8)
+    def add_arguments(self, parser):
+        parser.add_argument('--epochs', type=int, default=8)
+        parser.add_argument('--incremental', action='store_true', help='fit_partial on ratings since the last checkpoint')
+        parser.add_argument('--topn', type=int, default=50, help='precompute top-N per user after training (0 disables)')
+        parser.add_argument('--explain-top', type=int, default=0, help='precompute LLM explanations for each user\'s top-N (0 disables)')
     def handle(self, *a, **kw):
-        p=train_and_save(epochs=kw['epochs']); self.stdout.write(self.style.SUCCESS(f'Saved model to {p}'))
+        train = train_incremental if kw['incremental'] else train_and_save
+        before=os.stat(ART).st_mtime_ns if os.path.exists(ART) else None
+        p=train(epochs=kw['epochs']); self.stdout.write(self.style.SUCCESS(f'Saved model to {p}'))
+        artifacts=load_artifacts()
+        if artifacts.get('timings') and os.stat(ART).st_mtime_ns != before:
+            stages=', '.join(f'{k}={v:.3f}s' for k, v in artifacts['timings'].items())
+            self.stdout.write(f"{artifacts.get('training', 'full')} training {artifacts.get('version')}: {stages} (total {sum(artifacts['timings'].values()):.3f}s)")
+        if kw['topn']:
+            t=precompute_recommendations(k=kw['topn'])
+            if t: self.stdout.write(self.style.SUCCESS(f'Saved top-{kw["topn"]} recommendations to {t}'))
+        if kw['explain_top']:
+            from recs.explain_worker import worker, BATCH
+            from core.models import Rating
+            user_ids=Rating.objects.exclude(user=None).values_list('user_id', flat=True).distinct()
+            for uid in user_ids: worker.enqueue_top(uid, kw['explain_top'], BATCH, block=True)
+            worker.wait(); self.stdout.write(self.style.SUCCESS(f"Precomputed explanations: {worker.stats()}"))
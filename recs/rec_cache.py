@@ -0,0 +1,85 @@
+"""
+Per-user cache of ranked recommendation ids
+
+Every app page load calls /api/recommendations/, but a user's ranking only
+changes when the model or their ratings do. topn() therefore caches the ranked
+movie ids under (user, k, model version, rating watermark). The watermark
+(core.profiles.watermark) moves with every rating write, in any worker, and never
+repeats, so shared entries cannot go stale. An in-process LRU (REC_CACHE_SIZE)
+sits in front of an optional Django cache backend shared by workers
+(REC_CACHE_BACKEND, entries expire after REC_CACHE_TTL). The Rating signals in
+core.signals drop the user's in-process entries, and serving a new artifact
+version clears them all.
+
+Only LightFM scoring is worth caching: a hit still reads the watermark and the
+movie rows, which costs more than the fallback ranking, so without a LightFM
+model topn() calls topn_for_user directly.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from core.cache import LRUCache
+from core.metrics import register_cache, traced
+from core.profiles import watermark
+from .lightfm_pipeline import _movies_in_order, load_artifacts, topn_for_user
+
+memory = LRUCache(settings.REC_CACHE_SIZE, name='recommendations')
+counters = {'hits': 0, 'misses': 0, 'shared_hits': 0, 'bypassed': 0, 'invalidations': 0, 'reloads': 0}
+_serving = [None]  # artifact version the in-process entries were computed with
+
+
+def _shared():
+    return caches[settings.REC_CACHE_BACKEND] if settings.REC_CACHE_BACKEND else None
+
+
+def _lookup(key):
+    ids = memory.get(key)
+    if ids is None and (shared := _shared()) is not None:
+        ids = shared.get('recs:%s:%s:%s:%s' % key)
+        if ids is not None:
+            counters['shared_hits'] += 1
+            memory.set(key, ids)
+    return ids
+
+
+def _store(key, ids):
+    memory.set(key, ids)
+    if (shared := _shared()) is not None:
+        shared.set('recs:%s:%s:%s:%s' % key, ids, settings.REC_CACHE_TTL)
+
+
+@traced('rec_cache.topn')
+def topn(user_id, k=12):
+    """topn_for_user(user_id, k) through the cache -> Movie rows in rank order"""
+    artifacts = load_artifacts()
+    if artifacts.get('mode') != 'lightfm' or artifacts.get('model') is None:
+        counters['bypassed'] += 1
+        return topn_for_user(user_id, k)
+    version = artifacts.get('version')
+    if version != _serving[0]:
+        # New artifacts: every cached ranking came from the previous model
+        memory.clear()
+        _serving[0] = version
+        counters['reloads'] += 1
+    key = (user_id, k, version, watermark(user_id))
+    ids = _lookup(key)
+    if ids is not None:
+        counters['hits'] += 1
+        return _movies_in_order(ids)
+    counters['misses'] += 1
+    movies = topn_for_user(user_id, k)
+    _store(key, [m.id for m in movies])
+    return movies
+
+
+def invalidate_user(user_id):
+    counters['invalidations'] += memory.discard_where(lambda key: key[0] == user_id)
+
+
+def stats():
+    lookups = counters['hits'] + counters['misses']
+    return dict(counters, size=len(memory), memory=memory.stats(),
+                hit_ratio=round(counters['hits'] / lookups, 4) if lookups else 0.0)
+
+
+register_cache('recommendations', stats)
+register_cache('recommendations_memory', memory.stats)
@@ -1,31 +1,101 @@
 # recs/tmdb.py
+import threading, time
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from django.conf import settings
+from .tmdb_cache import ResponseCache
+from core import metrics
 
-BASE_URL = "https://api.themoviedb.org/3"
+BASE_URL = getattr(settings, 'TMDB_BASE_URL', "https://api.themoviedb.org/3")
 IMG = "https://image.tmdb.org/t/p/w342"
+MAX_429_RETRIES = 5
 
 def _session():
     s = requests.Session()
     retries = Retry(
         total=5,                # up to 5 attempts
         backoff_factor=0.8,     # 0.8, 1.6, 2.4, …
-        status_forcelist=[429, 500, 502, 503, 504],
+        status_forcelist=[500, 502, 503, 504],  # 429 is handled in api() so all threads back off together
+        respect_retry_after_header=False,
         allowed_methods=["GET"],
         raise_on_status=False,
     )
-    s.mount("https://", HTTPAdapter(max_retries=retries))
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=32)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
     return s
 
 _session = _session()
 
-def api(path, **params):
+class TokenBucket:
+    """Thread-safe token bucket shared by every caller of api()"""
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0  # 429 responses seen
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds` (e.g. a 429 Retry-After)"""
+        with self._lock:
+            self.throttled += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+# Optional process-wide limiter; set by callers that fan out requests (e.g. tmdb_ingest --workers)
+limiter = None
+
+def _retry_after(response, attempt):
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return 0.8 * (2 ** attempt)
+
+response_cache = ResponseCache(maxsize=settings.TMDB_CACHE_SIZE, db_path=settings.TMDB_CACHE_DB or None)
+metrics.register_cache('tmdb', response_cache.stats)
+
+@metrics.traced('tmdb.api')
+def api(path, cache=True, **params):
+    """GET a TMDB endpoint; cache=False bypasses the response cache (e.g. bulk ingest)"""
+    if cache:
+        return response_cache.get_or_fetch(path, params, lambda: _get(path, dict(params)))
+    return _get(path, params)
+
+@metrics.traced('tmdb.fetch')
+def _get(path, params):
     params['api_key'] = settings.TMDB_API_KEY
     url = f"{BASE_URL}{path}"
-    # 60s timeout (connect, read)
-    r = _session.get(url, params=params, timeout=60)
+    for attempt in range(MAX_429_RETRIES + 1):
+        if limiter:
+            limiter.acquire()
+        # 60s timeout (connect, read)
+        r = _session.get(url, params=params, timeout=60)
+        if r.status_code != 429 or attempt == MAX_429_RETRIES:
+            break
+        wait = _retry_after(r, attempt)
+        if limiter:
+            limiter.pause(wait)
+        else:
+            time.sleep(wait)
     r.raise_for_status()
     return r.json()
 
@@ -35,10 +105,10 @@ def get_genres():
 def search_person(name):
     return api('/search/person', query=name, include_adult=False).get('results', [])
 
-def discover(**kwargs):
+def discover(cache=True, **kwargs):
     params = {'sort_by': 'popularity.desc', 'include_adult': False, 'language': 'en-US', 'page': 1}
     params.update(kwargs)
-    return api('/discover/movie', **params).get('results', [])
+    return api('/discover/movie', cache=cache, **params).get('results', [])
 
 def get_tmdb_trending(time_window='week', **kwargs):
     """Fetches trending movies directly from TMDB's /trending endpoint."""
@@ -46,5 +116,5 @@ def get_tmdb_trending(time_window='week', **kwargs):
     params.update(kwargs)
     return api(f'/trending/movie/{time_window}', **params).get('results', [])
 
-def detail(mid):
-    return api(f'/movie/{mid}', append_to_response='credits')
+def detail(mid, cache=True):
+    return api(f'/movie/{mid}', cache=cache, append_to_response='credits')
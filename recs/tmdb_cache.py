@@ -0,0 +1,137 @@
+"""
+Response cache for the TMDB client
+
+Entries live in a bounded in-memory LRU, optionally backed by a SQLite file so
+they survive restarts and are shared between workers. Each endpoint has its own
+TTL. Once an entry is older than its TTL it is still served for one more TTL
+while a background refresh fetches the new value (stale-while-revalidate), so a
+slow upstream never blocks a request that has a cached answer. When a fetch
+fails, any cached value is served instead of the error.
+"""
+import json, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from core.cache import LRUCache
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+
+# First matching path prefix wins
+TTLS = (
+    ('/genre/', 3 * DAY),
+    ('/trending/', 10 * MINUTE),
+    ('/search/', DAY),
+    ('/discover/', 30 * MINUTE),
+    ('/movie/', 6 * HOUR),
+)
+DEFAULT_TTL = 10 * MINUTE
+
+
+def ttl_for(path):
+    for prefix, ttl in TTLS:
+        if path.startswith(prefix):
+            return ttl
+    return DEFAULT_TTL
+
+
+def cache_key(path, params):
+    return path + '?' + json.dumps({k: v for k, v in params.items() if k != 'api_key'}, sort_keys=True, default=str)
+
+
+class _DiskStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, fetched_at REAL, body TEXT)')
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT fetched_at, body FROM responses WHERE key=?', (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def set(self, key, fetched_at, body):
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?)', (key, fetched_at, json.dumps(body)))
+
+    def prune(self, older_than):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM responses WHERE fetched_at < ?', (older_than,))
+
+
+class ResponseCache:
+    def __init__(self, maxsize=2048, db_path=None):
+        self.memory = LRUCache(maxsize, name='tmdb')
+        self.disk = None
+        if db_path:
+            try:
+                self.disk = _DiskStore(db_path)
+                self.disk.prune(time.time() - 2 * max(t for _, t in TTLS))
+            except sqlite3.Error as e:
+                print(f"⚠️ TMDB disk cache disabled: {e}")
+        self.stale_served = 0
+        self.refreshes = 0
+        self.errors_served = 0
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tmdb-refresh')
+
+    def _lookup(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    def _store(self, key, body):
+        entry = (time.time(), body)
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, *entry)
+            except sqlite3.Error as e:
+                print(f"⚠️ TMDB disk cache write failed: {e}")
+        return body
+
+    def _refresh(self, key, fetch):
+        try:
+            self._store(key, fetch())
+            self.refreshes += 1
+        except Exception as e:
+            print(f"⚠️ TMDB background refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+    def get_or_fetch(self, path, params, fetch):
+        """Cached body for (path, params); fetch() performs the real request"""
+        key = cache_key(path, params)
+        ttl = ttl_for(path)
+        entry = self._lookup(key)
+        if entry is not None:
+            fetched_at, body = entry
+            age = time.time() - fetched_at
+            if age < ttl:
+                return body
+            if age < 2 * ttl:
+                with self._lock:
+                    start = key not in self._inflight
+                    self._inflight.add(key)
+                if start:
+                    self._refresher.submit(self._refresh, key, fetch)
+                self.stale_served += 1
+                return body
+        try:
+            return self._store(key, fetch())
+        except Exception:
+            if entry is not None:
+                self.errors_served += 1
+                return entry[1]
+            raise
+
+    def clear(self):
+        self.memory.clear()
+
+    def stats(self):
+        return dict(self.memory.stats(), stale_served=self.stale_served, refreshes=self.refreshes,
+                    errors_served=self.errors_served)
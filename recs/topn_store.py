@@ -0,0 +1,94 @@
+"""
+Offline top-N recommendations for every user
+
+After training, the dense user x item score matrix is computed from the LightFM
+embeddings and biases in user blocks, the top K items per user are selected with
+argpartition and the result is written to a compact .npz file. Requests then
+serve a user's row with a binary search instead of a full model.predict.
+"""
+import os, threading, time
+import numpy as np
+from django.conf import settings
+
+TOPN = os.path.join(settings.MODEL_DIR, 'topn.npz')
+
+
+def score_block(model, user_rows):
+    """LightFM scores (embedding dot product + biases) for a block of user indices"""
+    scores = model.user_embeddings[user_rows] @ model.item_embeddings.T
+    scores += model.item_biases[np.newaxis, :]
+    scores += model.user_biases[user_rows][:, np.newaxis]
+    return scores
+
+
+def top_k_rows(scores, k):
+    """Row-wise top-k column indices (best first) and their scores"""
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def precompute_topn(model, user_ids, items, model_version, k=50, block=1024, path=TOPN):
+    """
+    Write top-k item ids for every user. user_ids[i] is the Django id of
+    LightFM user index i, items[j] the movie id of item index j.
+    """
+    t0 = time.time()
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    items = np.asarray(items, dtype=np.int64)
+    k = min(k, len(items))
+    top_items = np.empty((len(user_ids), k), dtype=np.int32)
+    top_scores = np.empty((len(user_ids), k), dtype=np.float32)
+
+    for start in range(0, len(user_ids), block):
+        rows = np.arange(start, min(start + block, len(user_ids)))
+        idx, scores = top_k_rows(score_block(model, rows), k)
+        top_items[rows], top_scores[rows] = idx, scores
+
+    # Sort by Django user id so lookups are a binary search
+    order = np.argsort(user_ids, kind='stable')
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, user_ids=user_ids[order], top_items=top_items[order], top_scores=top_scores[order],
+             items=items, model_version=np.str_(model_version))
+    os.replace(tmp, path)
+    print(f"💾 Precomputed top-{k} for {len(user_ids)} users in {time.time() - t0:.2f}s -> {path}")
+    return path
+
+
+class TopNStore:
+    """Process-level view of the precomputed file, reloaded when it changes"""
+
+    def __init__(self, path=TOPN):
+        self.path = path
+        self.data = None
+        self.mtime = None
+        self._lock = threading.Lock()
+
+    def _current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self.mtime:
+            with self._lock:
+                if mtime != self.mtime:
+                    with np.load(self.path) as f:
+                        self.data = {name: f[name] for name in f.files}
+                    self.mtime = mtime
+        return self.data
+
+    def lookup(self, user_id, k, model_version):
+        """Top-k movie ids for user_id, or None if there is no valid precomputed row"""
+        data = self._current()
+        if data is None or str(data['model_version']) != model_version or k > data['top_items'].shape[1]:
+            return None
+        user_ids = data['user_ids']
+        pos = np.searchsorted(user_ids, user_id)
+        if pos >= len(user_ids) or user_ids[pos] != user_id:
+            return None
+        return [int(i) for i in data['items'][data['top_items'][pos, :k]]]
+
+
+topn_store = TopNStore()
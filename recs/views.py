@@ -1,19 +1,44 @@
+import json
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.conf import settings
+from django.utils import timezone
+from core.catalog_stats import catalog
+from core.db import read_only
 from core.models import Movie, Rating
 from .serializers import MovieSer, RatingSer
 from .tmdb import discover, search_person, get_genres, IMG, detail
+from .explain_pipeline import gather_inputs, llm_payload
+from .catalog import discover_local, movie_fields, sync_relations
+from . import rec_cache
 
 LANG_ALIASES = {"hindi":"hi","hin":"hi","english":"en","eng":"en","urdu":"ur","turkish":"tr","spanish":"es","german":"de","french":"fr","japanese":"ja","korean":"ko","tamil":"ta","telugu":"te","marathi":"mr","kannada":"kn","bengali":"bn","gujarati":"gu","punjabi":"pa","malayalam":"ml"}
 
 def _user_specific_explain(movie, user_id, max_popularity):
     """Generate highly user-specific explanations based on rating history"""
-    from core.models import Rating
-    
-    # Get user's rating history
-    user_ratings = Rating.objects.filter(user_id=user_id)
-    
+    return _user_specific_explain_batch([movie], user_id, max_popularity)[0]
+
+def _user_specific_explain_batch(movies, user_id, max_popularity):
+    """_user_specific_explain for many movies: one profile read, word overlaps for the whole batch at once"""
+    from core.features import mask_genres, max_shared_counts, movie_features, real_genres
+    from core.profiles import get_profile
+    
+    # Get user's rating profile
+    profile = get_profile(user_id)
+    features = [movie_features(m) for m in movies]
+    similar_counts = max_shared_counts(profile.terms, [codes for codes, _ in features])
+    # TMDB genres are only needed for movies without word overlap
+    ids = [m.pk for m, n in zip(movies, similar_counts) if m.pk and not n] if profile.high_ratings else []
+    genres = real_genres(ids) if ids else {}
+    return [_user_reasons(m, profile, max_popularity, int(n), genres.get(m.pk) or mask_genres(mask))
+            for m, (_, mask), n in zip(movies, features, similar_counts)]
+
+def _user_reasons(movie, profile, max_popularity, similar_count, movie_genres):
     # Start with always-true quality explanations
     explanations = []
     vote01 = (movie.vote or 0) / 10.0
@@ -37,24 +62,11 @@ def _user_specific_explain(movie, user_id, max_popularity):
         })
     
     # Add highly user-specific explanations if we have rating history
-    if user_ratings.exists():
-        # Find movies the user liked (rating >= 4)
-        liked_movies = [r.movie for r in user_ratings if r.value >= 4]
-        
-        if liked_movies:
-            # Check for title/overview similarity
-            movie_text = f"{movie.title} {movie.overview or ''}".lower()
-            similar_count = 0
-            
-            for liked_movie in liked_movies:
-                liked_text = f"{liked_movie.title} {liked_movie.overview or ''}".lower()
-                # Check for common meaningful words (length > 3)
-                common_words = set(movie_text.split()) & set(liked_text.split())
-                significant_words = [word for word in common_words if len(word) > 3]
-                if significant_words:
-                    similar_count += 1
-            
-            # If we found similarities, highlight them
+    if profile.total_ratings:
+        # Movies the user liked (rating >= 4)
+        if profile.high_ratings:
+            # Title/overview similarity: similar_count liked movies share a meaningful word (length > 3);
+            # if we found similarities, highlight them
             if similar_count > 0:
                 explanations.append({
                     "feature": f"Based on your likes",
@@ -64,27 +76,9 @@ def _user_specific_explain(movie, user_id, max_popularity):
                 })
             else:
                 # Look for genre/theme matching
-                genre_keywords = {
-                    'action': ['action', 'fight', 'battle', 'war', 'combat', 'violence'],
-                    'comedy': ['funny', 'humor', 'comedy', 'laugh', 'comic', 'hilarious'],
-                    'drama': ['drama', 'emotional', 'family', 'relationship', 'life', 'drama'],
-                    'thriller': ['suspense', 'mystery', 'crime', 'detective', 'killer', 'threat'],
-                    'romance': ['romance', 'love', 'romantic', 'heart', 'wedding', 'couple'],
-                    'horror': ['horror', 'scary', 'frightening', 'monster', 'ghost', 'death']
-                }
-                
-                movie_genres = []
-                for genre, keywords in genre_keywords.items():
-                    if any(keyword in movie_text for keyword in keywords):
-                        movie_genres.append(genre)
-                
                 if movie_genres:
-                    # Count how many liked movies match this genre
-                    matching_likes = 0
-                    for liked_movie in liked_movies:
-                        liked_text_lower = f"{liked_movie.title} {liked_movie.overview or ''}".lower()
-                        if any(keyword in liked_text_lower for keyword in genre_keywords[movie_genres[0]]):
-                            matching_likes += 1
+                    # How many liked movies match this genre
+                    matching_likes = profile.liked_genres.get(movie_genres[0], 0)
                     
                     explanations.append({
                         "feature": f"Your {movie_genres[0]} taste",
@@ -94,30 +88,24 @@ def _user_specific_explain(movie, user_id, max_popularity):
                     })
                 else:
                     # General taste analysis
-                    avg_user_rating = sum([r.value for r in user_ratings]) / len(user_ratings)
                     explanations.append({
                         "feature": "Matches your taste",
-                        "value": f"Similar to movies you rated {avg_user_rating:.1f}/5",
+                        "value": f"Similar to movies you rated {profile.average_rating:.1f}/5",
                         "weight": 0.4,
                         "contribution": 0.4
                     })
         
         # Add detailed rating history insights
-        total_ratings = user_ratings.count()
-        high_ratings = user_ratings.filter(value__gte=4).count()
-        low_ratings = user_ratings.filter(value__lte=2).count()
-        
-        if total_ratings > 0:
-            explanations.append({
-                "feature": f"Your movie profile",
-                "value": f"You rate movies {high_ratings} high, {low_ratings} low out of {total_ratings}",
-                "weight": 0.1,
-                "contribution": 0.1
-            })
+        explanations.append({
+            "feature": f"Your movie profile",
+            "value": f"You rate movies {profile.high_ratings} high, {profile.low_ratings} low out of {profile.total_ratings}",
+            "weight": 0.1,
+            "contribution": 0.1
+        })
     
     # Ensure we have comprehensive explanations
     if len(explanations) < 2:
-        if user_ratings.exists():
+        if profile.total_ratings:
             explanations.append({
                 "feature": "Personalized match",
                 "value": "Based on your viewing patterns",
@@ -142,13 +130,36 @@ def _simple_explain(vote, popularity, max_popularity):
     score=0.6*vote01 + 0.4*pop01
     return score,[{"feature":"TMDB rating","value":vote,"weight":0.6,"contribution":round(0.6*vote01,3)},{"feature":"Popularity","value":popularity,"weight":0.4,"contribution":round(0.4*pop01,3)}]
 
+def _local_discover(actor, genre, lang):
+    movies=discover_local(actor=actor, genre=genre, lang=lang)
+    maxp=max([m.popularity or 0 for m in movies] or [1.0])
+    out=[]
+    for m in movies:
+        score,reasons=_simple_explain(m.vote,m.popularity,maxp)
+        out.append({"id":m.id,"tmdb_id":m.tmdb_id,"title":m.title,"overview":m.overview,"poster":m.poster or None,"vote":m.vote,"year":m.year,"popularity":m.popularity,"xai":{"score":round(score,3),"reasons":reasons}})
+    return out
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def tmdb_discover(request):
     actor=(request.GET.get('actor') or '').strip()
     genre=(request.GET.get('genre') or '').strip()
     lang=(request.GET.get('lang') or '').strip().lower()
+    if lang and len(lang)>2: lang=LANG_ALIASES.get(lang,'')
+
+    # source: tmdb (falls back to the local catalog when TMDB fails), local, or auto (local first, TMDB if empty)
+    source=(request.GET.get('source') or settings.DISCOVER_SOURCE).lower()
+    if source in ('local','auto'):
+        out=_local_discover(actor,genre,lang)
+        if out or source=='local':
+            return Response({"results":out,"source":"local"})
+    try:
+        return Response({"results":_tmdb_discover(actor,genre,lang),"source":"tmdb"})
+    except Exception as e:
+        print(f"⚠️ TMDB discover failed, serving the local catalog: {e}")
+        return Response({"results":_local_discover(actor,genre,lang),"source":"local"})
 
+def _tmdb_discover(actor, genre, lang):
     person_id=None
     if actor:
         res=search_person(actor); person_id=res[0]['id'] if res else None
@@ -156,8 +167,6 @@ def tmdb_discover(request):
     gmap={g['name'].lower(): g['id'] for g in get_genres()}
     gid=gmap.get(genre.lower()) if genre else None
 
-    if lang and len(lang)>2: lang=LANG_ALIASES.get(lang,'')
-
     params={}
     if person_id: params['with_cast']=person_id
     if gid: params['with_genres']=gid
@@ -170,10 +179,11 @@ def tmdb_discover(request):
         vote=i.get('vote_average'); pop=i.get('popularity')
         score,reasons=_simple_explain(vote,pop,maxp)
         out.append({"tmdb_id":i.get("id"),"title":i.get("title"),"overview":i.get("overview"),"poster":(IMG+i["poster_path"]) if i.get("poster_path") else None,"vote":vote,"year":(i.get("release_date") or "")[:4],"popularity":pop,"xai":{"score":round(score,3),"reasons":reasons}})
-    return Response({"results":out})
+    return out
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@read_only
 def explain_any(request):
     movie_id=request.GET.get('movie_id'); tmdb_id=request.GET.get('tmdb_id')
     user_id=request.user.id if request.user.is_authenticated else 1
@@ -181,8 +191,7 @@ def explain_any(request):
     if movie_id:
         try: m=Movie.objects.get(id=int(movie_id))
         except Movie.DoesNotExist: return Response({"error":"movie not found"}, status=404)
-        from django.db.models import Max
-        maxp=Movie.objects.aggregate(Max('popularity'))['popularity__max'] or 1.0
+        maxp=catalog.get().max_popularity or 1.0
         score,reasons=_user_specific_explain(m, user_id, maxp)
         return Response({"movie":m.title,"score":round(score,3),"reasons":reasons})
     if tmdb_id:
@@ -191,12 +200,71 @@ def explain_any(request):
         return Response({"movie":d.get('title'),"score":round(score,3),"reasons":reasons})
     return Response({"error":"provide movie_id or tmdb_id"}, status=400)
 
-@api_view(['POST'])
-def rate_movie(request):
-    user=request.user if request.user.is_authenticated else None
-    movie_data=request.data.get('movie')  # Can be either local movie ID or TMDB ID
-    value=int(request.data.get('value',5))
-    
+def _id_list(request, key):
+    """
+    Ids from a JSON body (a list, or a comma-separated string) or a comma-separated
+    query parameter. Surrounding whitespace and empty items are ignored; anything
+    else that is not a non-negative integer raises ValueError.
+    """
+    values = request.data.get(key) if request.method == 'POST' else request.GET.get(key)
+    if values is None:
+        return []
+    if isinstance(values, str):
+        values = [v for v in values.split(',') if v.strip()]
+    elif not isinstance(values, list):
+        raise ValueError(f"{key} must be a list or a comma-separated string")
+    ids = []
+    for v in values:
+        if isinstance(v, int) and not isinstance(v, bool) and v >= 0:
+            ids.append(v)
+        elif isinstance(v, str) and v.strip().isdecimal():
+            ids.append(int(v))
+        else:
+            raise ValueError(f"invalid id in {key}: {v!r}")
+    return ids
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+@read_only
+def explain_batch(request):
+    """Reasons for many movies at once: movie_ids / tmdb_ids as lists (POST JSON) or comma-separated (GET)"""
+    try:
+        movie_ids=_id_list(request,'movie_ids'); tmdb_ids=_id_list(request,'tmdb_ids')
+    except ValueError as e:
+        return Response({"error":str(e)}, status=400)
+    if not movie_ids and not tmdb_ids:
+        return Response({"error":"provide movie_ids or tmdb_ids"}, status=400)
+    if len(movie_ids)+len(tmdb_ids) > settings.EXPLAIN_BATCH_MAX:
+        return Response({"error":f"at most {settings.EXPLAIN_BATCH_MAX} movies per batch"}, status=400)
+    user_id=request.user.id if request.user.is_authenticated else 1
+
+    results=[]
+    if movie_ids:
+        maxp=catalog.get().max_popularity or 1.0
+        movies=Movie.objects.in_bulk(movie_ids)
+        found=[movies[i] for i in movie_ids if i in movies]
+        explained=dict(zip([m.id for m in found], _user_specific_explain_batch(found, user_id, maxp)))
+        for i in movie_ids:
+            if i not in explained:
+                results.append({"movie_id":i,"error":"movie not found"}); continue
+            score,reasons=explained[i]
+            results.append({"movie_id":i,"movie":movies[i].title,"score":round(score,3),"reasons":reasons})
+    if tmdb_ids:
+        from concurrent.futures import ThreadPoolExecutor
+        def one(tmdb_id):
+            try:
+                d=detail(tmdb_id)
+            except Exception as e:
+                return {"tmdb_id":tmdb_id,"error":f"Failed to fetch movie: {e}"}
+            vote=d.get('vote_average') or 0.0; pop=d.get('popularity') or 0.0
+            score,reasons=_simple_explain(vote,pop,max(1.0,pop))
+            return {"tmdb_id":tmdb_id,"movie":d.get('title'),"score":round(score,3),"reasons":reasons}
+        with ThreadPoolExecutor(max_workers=min(8,len(tmdb_ids))) as pool:
+            results.extend(pool.map(one, tmdb_ids))
+    return Response({"results":results})
+
+def rating_movie_id(movie_data):
+    """Local movie id for a rating's movie field (shared with RatingsConsumer)"""
     # Handle TMDB ID (for onboarding) or local movie ID
     if isinstance(movie_data, str) and movie_data.isdigit():
         # This is likely a TMDB ID from onboarding
@@ -204,50 +272,44 @@ def rate_movie(request):
         
         # Check if movie already exists in our database
         try:
-            movie = Movie.objects.get(tmdb_id=tmdb_id)
+            return Movie.objects.get(tmdb_id=tmdb_id).id
         except Movie.DoesNotExist:
             # Get movie details from TMDB and create the movie
-            try:
-                movie_detail = detail(tmdb_id)
-                movie = Movie.objects.create(
-                    tmdb_id=tmdb_id,
-                    title=movie_detail.get('title', ''),
-                    overview=movie_detail.get('overview', ''),
-                    year=(movie_detail.get('release_date') or '')[:4],
-                    poster=(IMG + movie_detail['poster_path']) if movie_detail.get('poster_path') else '',
-                    popularity=movie_detail.get('popularity', 0.0),
-                    vote=movie_detail.get('vote_average', 0.0)
-                )
-            except Exception as e:
-                return Response({"error": f"Failed to fetch movie details: {str(e)}"}, status=400)
-        
-        movie_id = movie.id
-    else:
-        # This is a local movie ID
-        movie_id = int(movie_data)
+            movie_detail = detail(tmdb_id)
+            movie = Movie.objects.create(tmdb_id=tmdb_id, **movie_fields(movie_detail))
+            sync_relations({movie.id: movie_detail})
+            return movie.id
+    # This is a local movie ID
+    return int(movie_data)
+
+@api_view(['POST'])
+def rate_movie(request):
+    user=request.user if request.user.is_authenticated else None
+    movie_data=request.data.get('movie')  # Can be either local movie ID or TMDB ID
+    value=int(request.data.get('value',5))
+    
+    try:
+        movie_id = rating_movie_id(movie_data)
+    except Exception as e:
+        return Response({"error": f"Failed to fetch movie details: {str(e)}"}, status=400)
     
-    r=Rating.objects.create(user=user, movie_id=movie_id, value=value)
+    if user:
+        # One rating per user and movie: re-rating replaces the value and counts as a new rating for training
+        r,_=Rating.objects.update_or_create(user=user, movie_id=movie_id, defaults={'value': value, 'created_at': timezone.now()})
+    else:
+        r=Rating.objects.create(user=None, movie_id=movie_id, value=value)
     return Response(RatingSer(r).data)
 
-@api_view(['GET'])
-def natural_explanation(request):
-    """
-    Generate natural language explanations using:
-    1. SHAP/LIME from LightFM model
-    2. RAG for context retrieval
-    3. LLM for natural language generation
-    """
-    movie_id = request.GET.get('movie_id')
-    tmdb_id = request.GET.get('tmdb_id')
-    user_id = request.user.id if request.user.is_authenticated else 1
-    
-    # Get movie information
+def _explanation_movie(params):
+    """Movie named by movie_id/tmdb_id -> (movie, cache key part, (error, status) or None)"""
+    movie_id = params.get('movie_id')
+    tmdb_id = params.get('tmdb_id')
     if movie_id:
         try:
-            movie = Movie.objects.get(id=int(movie_id))
+            return Movie.objects.get(id=int(movie_id)), f"movie:{movie_id}", None
         except Movie.DoesNotExist:
-            return Response({"error": "Movie not found"}, status=404)
-    elif tmdb_id:
+            return None, None, ("Movie not found", 404)
+    if tmdb_id:
         try:
             movie_detail = detail(int(tmdb_id))
             movie = Movie(
@@ -256,155 +318,178 @@ def natural_explanation(request):
                 vote=movie_detail.get('vote_average', 0.0),
                 popularity=movie_detail.get('popularity', 0.0)
             )
+            return movie, f"tmdb:{tmdb_id}", None
         except Exception as e:
-            return Response({"error": f"Failed to fetch movie: {str(e)}"}, status=400)
-    else:
-        return Response({"error": "Provide movie_id or tmdb_id"}, status=400)
-    
-    # ===== STEP 1: Get XAI Explanations (SHAP + LIME + LightFM) =====
-    from .xai_explainer import get_comprehensive_xai_explanation
-    from .lightfm_pipeline import load_artifacts
-    
-    xai_explanation = None
-    try:
-        artifacts = load_artifacts()
-        model = artifacts.get('model') if artifacts.get('mode') == 'lightfm' else None
-        items = artifacts.get('items', [])
-        
-        xai_explanation = get_comprehensive_xai_explanation(
-            user_id=user_id,
-            movie_id=movie.id if movie_id else None,
-            model=model,
-            items=items
-        )
-    except Exception as e:
-        print(f"XAI explanation failed: {e}")
-    
-    # ===== STEP 2: Get RAG Context =====
-    rag_context = ""
-    similar_movies = []
-    try:
-        from rag.embeddings import store
-        query = f"{movie.title} {movie.overview or ''}"
-        hits = store.search(query, k=3)
-        
-        if hits:
-            movie_ids = [i for i, _ in hits]
-            similar_movies_objs = Movie.objects.filter(id__in=movie_ids)
-            similar_movies = [
-                f"{m.title} ({m.vote}/10)" for m in similar_movies_objs
-            ]
-            rag_context = f"Similar movies: {', '.join(similar_movies)}. "
-    except Exception as e:
-        print(f"RAG retrieval failed: {e}")
-    
-    # ===== STEP 3: Build User Context =====
-    from core.models import Rating
-    user_ratings = Rating.objects.filter(user_id=user_id)
-    
-    user_context = ""
-    if user_ratings.exists():
-        liked_movies = [r for r in user_ratings if r.value >= 4]
-        if liked_movies:
-            liked_titles = [f"{r.movie.title} ({r.value}/5)" for r in liked_movies[:3]]
-            user_context = f"User liked: {', '.join(liked_titles)}. "
-    else:
-        user_context = "New user with no rating history. "
-    
-    # ===== STEP 4: Build Enhanced LLM Prompt with XAI + RAG =====
-    prompt_parts = [
-        f"Movie: '{movie.title}' (Rating: {movie.vote}/10, Popularity: {movie.popularity}).",
-        f"Overview: {movie.overview[:200] if movie.overview else 'N/A'}.",
-        user_context,
-        rag_context
-    ]
-    
-    # Add SHAP values to prompt
-    if xai_explanation and xai_explanation.get('shap_values'):
-        shap = xai_explanation['shap_values']
-        prompt_parts.append(
-            f"Feature importance: Genre ({shap['genre_weight']}), "
-            f"Rating ({shap['rating_weight']}), "
-            f"Popularity ({shap['popularity_weight']}), "
-            f"User preference ({shap['user_preference_weight']})."
-        )
-    
-    # Add LIME explanation to prompt
-    if xai_explanation and xai_explanation.get('lime_explanation'):
-        lime_features = [f"{e['feature']} ({e['impact']})" for e in xai_explanation['lime_explanation'][:2]]
-        prompt_parts.append(f"Key factors: {', '.join(lime_features)}.")
-    
-    full_prompt = " ".join(prompt_parts)
-    full_prompt += " Explain in 40 words why this movie is recommended."
-    
-    # ===== STEP 5: Generate LLM Explanation =====
-    try:
-        from core.services import openrouter_service
-        print("🔍 Calling LLM with XAI + RAG prompt...")
-        explanation = openrouter_service.generate_explanation(user_context, full_prompt)
-        print("✅ LLM returned:", (explanation[:120] + '...') if isinstance(explanation, str) else explanation)
-        
-        if explanation:
-            return Response({
-                "movie": movie.title,
-                "explanation": explanation,
-                "type": "llm_with_xai_and_rag",
-                "xai_details": xai_explanation,
-                "similar_movies": similar_movies,
-                "shap_values": xai_explanation.get('shap_values') if xai_explanation else None,
-                "lime_explanation": xai_explanation.get('lime_explanation') if xai_explanation else None
-            })
-        else:
-            print("⚠️ LLM returned empty explanation, falling back to RAG")
-    except Exception as e:
-        print(f"❌ LLM generation failed: {e}")
-    
-    # ===== STEP 6: Fallback to RAG-only explanation =====
-    if rag_context:
+            return None, None, (f"Failed to fetch movie: {str(e)}", 400)
+    return None, None, ("Provide movie_id or tmdb_id", 400)
+
+def _fallback_payload(movie, inputs):
+    """RAG-only explanation, or a simple numeric one when RAG has nothing either"""
+    xai_explanation = inputs['xai_explanation']
+    similar_movies = inputs['similar_movies']
+    if inputs['rag_context']:
         rag_explanation = f"This movie is similar to {similar_movies[0] if similar_movies else 'highly rated films'}. "
         if xai_explanation and xai_explanation.get('shap_values'):
             shap = xai_explanation['shap_values']
             top_feature = max(shap, key=shap.get)
             rag_explanation += f"Recommended primarily based on {top_feature.replace('_', ' ')}."
         
-        return Response({
+        return {
             "movie": movie.title,
             "explanation": rag_explanation,
             "type": "rag_with_xai_fallback",
+            "model_version": inputs['model_version'],
             "xai_details": xai_explanation,
             "similar_movies": similar_movies
-        })
+        }
     
-    # ===== STEP 7: Final Simple Fallback =====
-    from django.db.models import Max
-    maxp = Movie.objects.aggregate(Max('popularity'))['popularity__max'] or 1.0
+    maxp = catalog.get().max_popularity or 1.0
     score, reasons = _simple_explain(movie.vote, movie.popularity, maxp)
     
     simple_explanation = f"Rated {movie.vote or 'N/A'}/10 with popularity {movie.popularity or 'N/A'}."
     if xai_explanation and xai_explanation.get('combined_score'):
         simple_explanation += f" XAI confidence score: {xai_explanation['combined_score']:.2f}."
     
-    return Response({
+    return {
         "movie": movie.title,
         "explanation": simple_explanation,
         "type": "simple_with_xai_fallback",
+        "model_version": inputs['model_version'],
         "xai_details": xai_explanation
-    })
+    }
 
 @api_view(['GET'])
+@read_only
+def natural_explanation(request):
+    """
+    Generate natural language explanations using:
+    1. SHAP/LIME from LightFM model
+    2. RAG for context retrieval
+    3. LLM for natural language generation
+    """
+    user_id = request.user.id if request.user.is_authenticated else 1
+    movie, movie_key, error = _explanation_movie(request.GET)
+    if error:
+        return Response({"error": error[0]}, status=error[1])
+    
+    # ===== Reuse an explanation generated for the same rating profile =====
+    from core import explain_cache
+    from core.services import openrouter_service, PROMPT_VERSION
+    cache_key = explain_cache.cache_key(user_id, movie_key, explain_cache.profile_hash(user_id), openrouter_service.model, PROMPT_VERSION)
+    cached = explain_cache.get(user_id, cache_key)
+    if cached is not None:
+        return Response(dict(cached, cached=True))
+    
+    # ===== XAI (SHAP + LIME + LightFM), RAG context, user context -> prompt =====
+    inputs = gather_inputs(user_id, movie)
+    
+    # ===== Generate LLM Explanation =====
+    try:
+        print("🔍 Calling LLM with XAI + RAG prompt...")
+        explanation = openrouter_service.generate_explanation(inputs['user_context'], inputs['prompt'])
+        print("✅ LLM returned:", (explanation[:120] + '...') if isinstance(explanation, str) else explanation)
+        
+        if explanation:
+            payload = llm_payload(movie, explanation, inputs)
+            explain_cache.put(user_id, cache_key, payload, movie_key, openrouter_service.model, PROMPT_VERSION)
+            return Response(dict(payload, cached=False))
+        else:
+            print("⚠️ LLM returned empty explanation, falling back to RAG")
+    except Exception as e:
+        print(f"❌ LLM generation failed: {e}")
+    
+    # ===== Fallback to RAG-only, then simple numeric explanation =====
+    return Response(_fallback_payload(movie, inputs))
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _async_events(events):
+    """
+    Serve a blocking event generator to the ASGI handler, which would otherwise
+    buffer a sync iterator whole. Each step runs in the request's sync thread.
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    end = object()
+    try:
+        while (event := await step(events, end)) is not end:
+            yield event
+    finally:
+        await sync_to_async(events.close, thread_sensitive=True)()
+
+@require_GET
+def natural_explanation_stream(request):
+    """
+    Server-Sent Events version of natural_explanation. Emits a `meta` event
+    with the XAI/RAG details, a `token` event per LLM chunk as it is
+    generated, and a final `done` event with the same payload
+    natural_explanation returns (plus ttft_ms for streamed answers).
+    """
+    user_id = request.user.id if request.user.is_authenticated else 1
+    movie, movie_key, error = _explanation_movie(request.GET)
+    if error:
+        return JsonResponse({"error": error[0]}, status=error[1])
+    
+    from core import explain_cache
+    from core.services import openrouter_service, PROMPT_VERSION
+    cache_key = explain_cache.cache_key(user_id, movie_key, explain_cache.profile_hash(user_id), openrouter_service.model, PROMPT_VERSION)
+    
+    def events():
+        cached = explain_cache.get(user_id, cache_key)
+        if cached is not None:
+            yield _sse('done', dict(cached, cached=True))
+            return
+        
+        inputs = gather_inputs(user_id, movie)
+        yield _sse('meta', {
+            "movie": movie.title,
+            "model_version": inputs['model_version'],
+            "similar_movies": inputs['similar_movies'],
+            "xai_details": inputs['xai_explanation']
+        })
+        
+        info = {}
+        for kind, data in openrouter_service.stream_explanation(inputs['user_context'], inputs['prompt']):
+            if kind == 'token':
+                yield _sse('token', {"text": data})
+            else:
+                info = data
+        
+        if info.get('explanation'):
+            payload = llm_payload(movie, info['explanation'], inputs)
+            explain_cache.put(user_id, cache_key, payload, movie_key, openrouter_service.model, PROMPT_VERSION)
+            yield _sse('done', dict(payload, cached=False, ttft_ms=info['ttft_ms'], total_ms=info['total_ms']))
+        else:
+            print("⚠️ LLM stream returned nothing, falling back to RAG")
+            yield _sse('done', _fallback_payload(movie, inputs))
+    
+    # WSGI iterates the generator directly; ASGI needs an async iterator to stream
+    stream = _async_events(events()) if isinstance(request, ASGIRequest) else events()
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let proxies pass tokens through unbuffered
+    return response
+
+@api_view(['GET'])
+@read_only
 def recommendations(request):
-    """Get personalized recommendations for the current user"""
+    """Get personalized recommendations for the current user; ?explain=1 adds reasons per card"""
     k = int(request.GET.get('k', 12))
     user_id = request.user.id if request.user.is_authenticated else 1
+    recs, artifacts = _recommendation_cards(user_id, k, explain=request.GET.get('explain') in ('1', 'true'))
+    return Response(recs, headers={"X-Model-Version": artifacts.get('version') or ''})
+
+def _recommendation_cards(user_id, k, explain=False):
+    """Top-k recommendation cards for a user (also pushed by RatingsConsumer) -> (cards, artifacts)"""
+    from .lightfm_pipeline import load_artifacts
     
-    from .lightfm_pipeline import topn_for_user, load_artifacts
-    
-    movies = topn_for_user(user_id, k)
-    
-    # Get the mode to determine source
+    # Get the mode to determine source (cached in-process, so this is cheap)
     artifacts = load_artifacts()
     source = artifacts.get('mode', 'content')  # 'lightfm' or 'fallback'
     
+    # Ranked ids are cached per user until the model or their ratings change
+    movies = rec_cache.topn(user_id, k)
+    
     recs = []
     for m in movies:
         recs.append({
@@ -416,7 +501,31 @@ def recommendations(request):
             "source": source  # NEW: add source
         })
     
-    return Response(recs)
+    if explain:
+        _attach_reasons(recs, movies, user_id, artifacts)
+    
+    return recs, artifacts
+
+def _attach_reasons(recs, movies, user_id, artifacts):
+    """Add user-specific reasons and, for LightFM, top embedding dimensions to every card in one pass"""
+    from .xai_explainer import lightfm_top_dimensions
+    maxp = catalog.get().max_popularity or 1.0
+    for rec, (score, reasons) in zip(recs, _user_specific_explain_batch(movies, user_id, maxp)):
+        rec["score"] = round(score, 3)
+        rec["reasons"] = reasons
+    
+    # Reuse the embeddings already loaded for scoring
+    if artifacts.get('mode') != 'lightfm' or artifacts.get('model') is None:
+        return
+    user_idx = artifacts['user_index'].get(user_id)
+    if user_idx is None:
+        return
+    item_idxs = [artifacts['item_index'].get(m.id) for m in movies]
+    known = [i for i, idx in enumerate(item_idxs) if idx is not None]
+    if known:
+        dims = lightfm_top_dimensions(artifacts['model'], user_idx, [item_idxs[i] for i in known])
+        for i, d in zip(known, dims):
+            recs[i]["lightfm"] = d
 
 @api_view(['GET'])
 def trending(request):
@@ -470,6 +579,7 @@ def complete_onboarding(request):
 
 
 @api_view(['GET'])
+@read_only
 def get_user_ratings(request):
     """Get user's ratings for a list of movies (by movie_id or tmdb_id)"""
     user = request.user
@@ -499,6 +609,7 @@ def get_user_ratings(request):
     return Response(ratings_map)
 
 @api_view(['GET'])
+@read_only
 def counterfactual_explanation(request):
     """
     Explain why a poorly-rated movie is *not* recommended.
@@ -525,7 +636,8 @@ def counterfactual_explanation(request):
     model = artifacts.get('model') if artifacts.get('mode') == 'lightfm' else None
     items = artifacts.get('items', [])
     
-    explanation = get_comprehensive_xai_explanation(user_id, movie.id, model, items)
+    explanation = get_comprehensive_xai_explanation(user_id, movie.id, model, items,
+                                                    artifacts.get('user_index'), artifacts.get('item_index'))
     
     # Build negative framing
     shap = explanation.get('shap_values') or {}
@@ -548,5 +660,6 @@ def counterfactual_explanation(request):
         "rating": low_rating.value,
         "explanation": text,
         "type": "counterfactual",
+        "model_version": artifacts.get('version'),
         "xai_details": explanation
     })
\ No newline at end of file
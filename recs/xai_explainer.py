@@ -3,26 +3,34 @@ XAI Explainer for LightFM Model
 Integrates SHAP and LIME for model interpretability
 """
 import numpy as np
-from core.models import Movie, Rating
+from core.models import Movie
 from django.contrib.auth.models import User
+from core.metrics import traced
+from core.catalog_stats import catalog
+from core.features import min_code, movie_features, shared_counts
+from core.profiles import get_profile
 
-def get_lightfm_feature_importance(user_id, movie_id, model, items):
+@traced('xai.lightfm_feature_importance')
+def get_lightfm_feature_importance(user_id, movie_id, model, items, user_index=None, item_index=None):
     """
     Extract feature importance from LightFM model using approximation.
-    Maps Django user_id to LightFM user index safely.
+    Maps Django ids to LightFM indices with the mappings saved at training time.
     """
     try:
+        if item_index is None:
+            item_index = {mid: i for i, mid in enumerate(items)}
+        if user_index is None:
+            # Artifacts without saved mappings: training used the user table's order
+            user_index = {uid: i for i, uid in enumerate(User.objects.values_list('id', flat=True))}
+
         # Ensure movie exists in items
-        if movie_id not in items:
+        item_idx = item_index.get(movie_id)
+        if item_idx is None:
             return None
 
-        item_idx = items.index(movie_id)
-
-        # Map user_id to consecutive index (same logic as in topn_for_user)
-        all_users = list(User.objects.values_list('id', flat=True)) or [1]
-        if user_id not in all_users:
+        user_index = user_index.get(user_id)
+        if user_index is None:
             return None
-        user_index = all_users.index(user_id)
 
         user_embedding = model.user_embeddings[user_index]
         item_embedding = model.item_embeddings[item_idx]
@@ -52,16 +60,32 @@ def get_lightfm_feature_importance(user_id, movie_id, model, items):
         return None
 
 
+@traced('xai.lightfm_top_dimensions')
+def lightfm_top_dimensions(model, user_idx, item_idxs, k=5):
+    """
+    Top embedding-dimension contributions (as in get_lightfm_feature_importance)
+    of one user's score for many items, computed for all of them at once.
+    """
+    contributions = model.item_embeddings[np.asarray(item_idxs, dtype=np.int64)] * model.user_embeddings[user_idx]
+    k = min(k, contributions.shape[1])
+    top = np.argsort(np.abs(contributions), axis=1)[:, ::-1][:, :k]
+    values = np.take_along_axis(contributions, top, axis=1)
+    scores = contributions.sum(axis=1)
+    return [{'top_dimensions': [int(i) for i in t], 'top_values': [float(v) for v in vals], 'prediction_score': float(score)}
+            for t, vals, score in zip(top, values, scores)]
+
+
+@traced('xai.shap')
 def compute_shap_like_values(user_id, movie_id, model, items):
     """
     Compute SHAP-like values for LightFM recommendations
     This approximates feature importance using embedding analysis
     """
     try:
-        # Get user's rating history
-        user_ratings = Rating.objects.filter(user_id=user_id)
+        # Get user's rating profile
+        profile = get_profile(user_id)
         
-        if not user_ratings.exists():
+        if not profile.total_ratings:
             return {
                 'genre_weight': 0.3,
                 'rating_weight': 0.3,
@@ -75,25 +99,17 @@ def compute_shap_like_values(user_id, movie_id, model, items):
         except Movie.DoesNotExist:
             return None
         
-        # Calculate feature weights based on user history
-        liked_movies = [r.movie for r in user_ratings if r.value >= 4]
-        
         # Genre similarity weight
         genre_weight = 0.0
-        if liked_movies:
-            # Simple text-based genre matching
-            movie_text = (movie.overview or '').lower()
-            genre_matches = 0
-            for liked in liked_movies:
-                liked_text = (liked.overview or '').lower()
-                common_words = set(movie_text.split()) & set(liked_text.split())
-                if len([w for w in common_words if len(w) > 4]) > 2:
-                    genre_matches += 1
-            genre_weight = min(0.5, genre_matches / len(liked_movies))
+        if profile.high_ratings:
+            # Simple text-based genre matching: long words (length > 4) shared with liked movies,
+            # counted once per liked movie; a liked movie used to match with more than 2 of them
+            codes, _ = movie_features(movie)
+            shared = int(shared_counts(profile.terms, codes[codes >= min_code(5)]).sum())
+            genre_weight = min(0.5, shared / (3 * profile.high_ratings))
         
         # Rating weight (how much user values high ratings)
-        avg_user_rating = sum([r.value for r in user_ratings]) / len(user_ratings)
-        rating_weight = 0.3 if avg_user_rating >= 4 else 0.2
+        rating_weight = 0.3 if profile.average_rating >= 4 else 0.2
         
         # Popularity weight
         popularity_weight = 0.2
@@ -112,22 +128,22 @@ def compute_shap_like_values(user_id, movie_id, model, items):
         return None
 
 
+@traced('xai.lime')
 def get_lime_explanation(user_id, movie_id):
     """
     Generate LIME-style local explanations
     Explains individual prediction by perturbing features
     """
     try:
-        from django.db.models import Avg
-        
         movie = Movie.objects.get(id=movie_id)
-        user_ratings = Rating.objects.filter(user_id=user_id)
+        profile = get_profile(user_id)
         
         explanations = []
+        stats = catalog.get()
         
         # Feature 1: Movie Quality
         if movie.vote:
-            avg_vote = Movie.objects.aggregate(Avg('vote'))['vote__avg'] or 5.0
+            avg_vote = stats.avg_vote or 5.0
             quality_impact = (movie.vote - avg_vote) / 10.0
             explanations.append({
                 'feature': 'Movie Quality',
@@ -138,7 +154,7 @@ def get_lime_explanation(user_id, movie_id):
         
         # Feature 2: Popularity
         if movie.popularity:
-            avg_pop = Movie.objects.aggregate(Avg('popularity'))['popularity__avg'] or 1.0
+            avg_pop = stats.avg_popularity or 1.0
             pop_impact = (movie.popularity - avg_pop) / avg_pop
             explanations.append({
                 'feature': 'Popularity',
@@ -148,26 +164,18 @@ def get_lime_explanation(user_id, movie_id):
             })
         
         # Feature 3: User History Match
-        if user_ratings.exists():
-            liked_movies = [r.movie for r in user_ratings if r.value >= 4]
-            if liked_movies:
-                # Calculate content similarity
-                movie_words = set((movie.overview or '').lower().split())
-                similarity_scores = []
-                for liked in liked_movies[:5]:
-                    liked_words = set((liked.overview or '').lower().split())
-                    common = len(movie_words & liked_words)
-                    similarity_scores.append(common)
-                
-                avg_similarity = np.mean(similarity_scores) if similarity_scores else 0
-                history_impact = min(0.5, avg_similarity / 10.0)
-                
-                explanations.append({
-                    'feature': 'User History Match',
-                    'value': f'{len(liked_movies)} liked movies',
-                    'impact': round(history_impact, 3),
-                    'direction': 'positive'
-                })
+        if profile.high_ratings:
+            # Content similarity: average number of words shared with each liked movie
+            codes, _ = movie_features(movie)
+            avg_similarity = int(shared_counts(profile.terms, codes).sum()) / profile.high_ratings
+            history_impact = min(0.5, avg_similarity / 10.0)
+            
+            explanations.append({
+                'feature': 'User History Match',
+                'value': f'{profile.high_ratings} liked movies',
+                'impact': round(history_impact, 3),
+                'direction': 'positive'
+            })
         
         return explanations
     except Exception as e:
@@ -175,7 +183,8 @@ def get_lime_explanation(user_id, movie_id):
         return []
 
 
-def get_comprehensive_xai_explanation(user_id, movie_id, model=None, items=None):
+@traced('xai.comprehensive')
+def get_comprehensive_xai_explanation(user_id, movie_id, model=None, items=None, user_index=None, item_index=None):
     """
     Combines SHAP, LIME, and LightFM feature importance
     Returns a comprehensive explanation dictionary
@@ -201,7 +210,7 @@ def get_comprehensive_xai_explanation(user_id, movie_id, model=None, items=None)
     
     # Get LightFM feature importance if model available
     if model and items:
-        lightfm_features = get_lightfm_feature_importance(user_id, movie_id, model, items)
+        lightfm_features = get_lightfm_feature_importance(user_id, movie_id, model, items, user_index, item_index)
         if lightfm_features:
             explanation['lightfm_features'] = lightfm_features
             explanation['combined_score'] += lightfm_features['prediction_score'] * 0.3
@@ -154,7 +154,7 @@ async function loadForYou() {
   forYouGrid.innerHTML = '<div class="text-center py-5"><div class="spinner-border text-primary"></div><div class="mt-2">Loading your recommendations...</div></div>';
   
   try {
-    const res = await fetch('/api/recommendations/?k=12');
+    const res = await fetch('/api/recommendations/?k=12&explain=1');
     const data = await res.json();
     
     // Check if user has insufficient ratings for meaningful personalization
@@ -185,17 +185,31 @@ async function loadForYou() {
       return;
     }
     
-    const movieIds = data.map(m => m.id);
-    const userRatings = await fetchUserRatings(movieIds, 'movie_id');
-
-    forYouGrid.innerHTML = '';
-    data.forEach(m => forYouGrid.appendChild(card(m, true, userRatings[m.id] || 0)));
-    wireButtons(forYouGrid);
+    await renderForYou(data);
   } catch (error) {
     forYouGrid.innerHTML = '<div class="col-12"><div class="text-center text-danger py-5">Failed to load recommendations.</div></div>';
   }
 }
 
+async function renderForYou(data) {
+  const movieIds = data.map(m => m.id);
+  const userRatings = await fetchUserRatings(movieIds, 'movie_id');
+
+  forYouGrid.innerHTML = '';
+  data.forEach(m => forYouGrid.appendChild(card(m, true, userRatings[m.id] || 0)));
+  wireButtons(forYouGrid);
+  annotateReasons(forYouGrid, data);
+}
+
+// Put each card's top personal reason (inline with ?explain=1) on its "Why?" button
+function annotateReasons(grid, items) {
+  items.forEach(m => {
+    const btn = grid.querySelector(`.btn-expl-local[data-id="${m.id}"]`);
+    const top = (m.reasons || []).reduce((best, e) => (!best || e.contribution > best.contribution ? e : best), null);
+    if (btn && top) btn.title = `${top.feature}: ${top.value}`;
+  });
+}
+
 async function loadTrending() {
   if (!trendingGrid) return;
   trendingGrid.innerHTML = '<div class="text-center py-5"><div class="spinner-border text-primary"></div><div class="mt-2">Loading trending movies...</div></div>';
@@ -225,7 +239,59 @@ async function trending() {
   loadTrending();
 }
 
+// While ws/ratings/ is open, ratings go over it: the server batches a burst of clicks
+// into one write and pushes the refreshed recommendations back. Otherwise they are POSTed.
+let ratingsSocket = null;
+
+function connectRatingsSocket() {
+  if (!forYouGrid || !window.WebSocket) return;
+  const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+  const ws = new WebSocket(`${scheme}://${location.host}/ws/ratings/?k=12`);
+  ws.onopen = () => { ratingsSocket = ws; };
+  ws.onmessage = (event) => {
+    const msg = JSON.parse(event.data);
+    if (msg.type === 'recommendations') {
+      renderForYou(msg.items);
+    } else if (msg.type === 'error') {
+      console.error('Rating failed:', msg.error);
+    }
+  };
+  ws.onclose = (event) => {
+    ratingsSocket = null;
+    if (event.code !== 4401) setTimeout(connectRatingsSocket, 5000);  // 4401: not logged in
+  };
+}
+
+function markRated(movieId, rating) {
+  showRatingConfirmation(movieId, rating);
+
+  // Find the card's interactive star container
+  const interactiveStarContainer = document.querySelector(`.star-rating[data-movie-id="${movieId}"], .star-rating[data-tmdb-id="${movieId}"]`);
+  if (interactiveStarContainer) {
+    // Update the interactive stars
+    interactiveStarContainer.dataset.currentRating = rating;
+    interactiveStarContainer.innerHTML = generateInteractiveStarRating(rating);
+    wireStarRating(interactiveStarContainer, movieId, rating);
+
+    // Update the numerical rating text
+    let ratingValueSpan = interactiveStarContainer.querySelector(`#user-rating-value-${movieId}`);
+    if (!ratingValueSpan) {
+      // If the span doesn't exist, create it
+      ratingValueSpan = document.createElement('span');
+      ratingValueSpan.className = 'rating-value ms-2';
+      ratingValueSpan.id = `user-rating-value-${movieId}`;
+      interactiveStarContainer.appendChild(ratingValueSpan);
+    }
+    ratingValueSpan.textContent = `${rating}/5`;
+  }
+}
+
 async function rateMovie(movieId, rating) {
+  if (ratingsSocket && ratingsSocket.readyState === WebSocket.OPEN) {
+    ratingsSocket.send(JSON.stringify({ type: 'rate', movie: movieId, value: rating }));
+    markRated(movieId, rating);
+    return;
+  }
   try {
     const response = await fetch('/api/ratings/', {
       method: 'POST',
@@ -240,27 +306,7 @@ async function rateMovie(movieId, rating) {
     });
     
     if (response.ok) {
-      showRatingConfirmation(movieId, rating);
-      
-      // Find the card's interactive star container
-      const interactiveStarContainer = document.querySelector(`.star-rating[data-movie-id="${movieId}"], .star-rating[data-tmdb-id="${movieId}"]`);
-      if (interactiveStarContainer) {
-        // Update the interactive stars
-        interactiveStarContainer.dataset.currentRating = rating;
-        interactiveStarContainer.innerHTML = generateInteractiveStarRating(rating);
-        wireStarRating(interactiveStarContainer, movieId, rating);
-
-        // Update the numerical rating text
-        let ratingValueSpan = interactiveStarContainer.querySelector(`#user-rating-value-${movieId}`);
-        if (!ratingValueSpan) {
-          // If the span doesn't exist, create it
-          ratingValueSpan = document.createElement('span');
-          ratingValueSpan.className = 'rating-value ms-2';
-          ratingValueSpan.id = `user-rating-value-${movieId}`;
-          interactiveStarContainer.appendChild(ratingValueSpan);
-        }
-        ratingValueSpan.textContent = `${rating}/5`;
-      }
+      markRated(movieId, rating);
 
       // Removed setTimeout to immediately reload recommendations
       // Recommendations will be updated periodically or on next login
@@ -351,6 +397,37 @@ async function discover() {
   }
 }
 
+// Stream the LLM explanation over SSE, showing tokens as they arrive, and
+// resolve with the final payload. Falls back to the plain JSON endpoint.
+function streamExplanation(query) {
+  const fallback = (resolve) => fetch(`/api/natural-explanation/?${query}`)
+    .then(r => r.json())
+    .then(resolve, () => resolve({ error: 'Error contacting server.' }));
+
+  return new Promise((resolve) => {
+    if (!window.EventSource) return fallback(resolve);
+
+    const es = new EventSource(`/api/natural-explanation/stream/?${query}`);
+    let text = '';
+    let done = false;
+
+    es.addEventListener('token', (ev) => {
+      text += JSON.parse(ev.data).text;
+      modalBody.innerHTML = '<div class="alert alert-info mb-0"></div>';
+      modalBody.firstChild.textContent = text;
+    });
+    es.addEventListener('done', (ev) => {
+      done = true;
+      es.close();
+      resolve(JSON.parse(ev.data));
+    });
+    es.onerror = () => {
+      es.close();
+      if (!done) fallback(resolve);
+    };
+  });
+}
+
 async function explainLocal(id) {
   const currentModal = infoModalElem ? new bootstrap.Modal(infoModalElem) : null;
   if (!currentModal || !modalTitle || !modalBody) return;
@@ -360,8 +437,7 @@ async function explainLocal(id) {
   currentModal.show();
 
   try {
-    const res = await fetch(`/api/natural-explanation/?movie_id=${id}`);
-    const j = await res.json();
+    const j = await streamExplanation(`movie_id=${id}`);
 
     if (j.error) {
       modalBody.textContent = j.error;
@@ -494,8 +570,7 @@ async function explainTmdb(tmdb_id, title) {
   currentModal.show();
 
   try {
-    const res = await fetch(`/api/natural-explanation/?tmdb_id=${tmdb_id}`);
-    const j = await res.json();
+    const j = await streamExplanation(`tmdb_id=${tmdb_id}`);
 
     if (j.error) {
       modalBody.textContent = j.error;
@@ -865,4 +940,5 @@ async function fetchUserRatings(ids, idType) {
 if (forYouGrid && trendingGrid) {
   loadForYou();
   loadTrending();
+  connectRatingsSocket();
 }
\ No newline at end of file